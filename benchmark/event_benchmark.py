@@ -0,0 +1,53 @@
+# Memory per pending event and event throughput on a torus3D topology.
+#
+# usage: python benchmark/event_benchmark.py [arrivals [event_pool]]
+
+import sys
+import time
+from flowsim import Simulation
+from flowsim.physical_layer.topology import torus3D
+
+
+def event_size(event):
+    size = sys.getsizeof(event)
+    if hasattr(event, '__dict__'):
+        size += sys.getsizeof(event.__dict__)
+    return size
+
+
+def main(argv):
+    arrivals = int(argv[1]) if len(argv) > 1 else 100000
+    options = {'event_pool': True} if len(argv) > 2 and argv[2] == '1'\
+        else dict()
+    nodes, edges = torus3D(8, 8, 8)
+    sim = Simulation(1., 0.05, 1, warm_up_metric=None, **options)
+    sim.init_simulation(nodes, [edge + (50,) for edge in edges],
+                        compact=True)
+    # No convergence check: fixed number of arrivals
+    sim.event_manager.convergence_check_interval = float('inf')
+
+    # Pending events are measured when the last arrival is generated
+    pending = []
+    end = sim.end
+
+    def sampling_end():
+        finished = end()
+        if finished and len(pending) == 0:
+            pending.extend(sim.event_manager.event_list)
+        return finished
+    sim.end = sampling_end
+
+    start = time.time()
+    results = sim.launch_simulation(arrivals)
+    elapsed = time.time() - start
+    events = sum(value for key, value in results.iteritems()
+                 if not isinstance(key, str))
+
+    print 'pending events: %d' % len(pending)
+    print 'bytes per pending event: %.1f' %\
+        (sum(event_size(event) for event in pending) / float(len(pending)))
+    print 'events/s: %.0f' % (events / elapsed)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,62 @@
+# Hold-model micro-benchmark of the pending-event structures: the queue is
+# filled with n events, then each operation pops the earliest event and
+# pushes a new one further in time (as an Arrival_Event does).
+#
+# usage: python benchmark/event_queue_benchmark.py [max_exponent [holds]]
+
+import random
+import sys
+import time
+from flowsim.event.event_queue import create_event_queue, event_queues
+
+
+class Bench_event(object):
+
+    def __init__(self, handling_time, sequence):
+        self.handling_time = handling_time
+        self.sequence = sequence
+
+
+def hold_benchmark(name, size, holds, rand_seed=0):
+    rand = random.Random(rand_seed)
+    queue = create_event_queue(name)
+    sequence = 0
+
+    start = time.time()
+    for i in xrange(size):
+        queue.push(Bench_event(rand.expovariate(1.), sequence))
+        sequence += 1
+    fill_time = time.time() - start
+
+    # Lazy structures (ladder) sort on the first dequeue
+    start = time.time()
+    queue.push(queue.pop())
+    first_pop_time = time.time() - start
+
+    start = time.time()
+    for i in xrange(holds):
+        event = queue.pop()
+        queue.push(Bench_event(event.handling_time + rand.expovariate(1.),
+                               sequence))
+        sequence += 1
+    hold_time = time.time() - start
+    return fill_time / size, first_pop_time, hold_time / holds
+
+
+def main(argv):
+    max_exponent = int(argv[1]) if len(argv) > 1 else 6
+    holds = int(argv[2]) if len(argv) > 2 else 100000
+    print '%-10s %10s %12s %16s %12s' % ('queue', 'pending', 'push (us)',
+                                         'first pop (ms)', 'hold (us)')
+    for exponent in xrange(3, max_exponent + 1):
+        for name in sorted(event_queues):
+            push, first_pop, hold = hold_benchmark(name, 10 ** exponent,
+                                                   holds)
+            print '%-10s %10d %12.3f %16.3f %12.3f' % (name, 10 ** exponent,
+                                                       push * 1e6,
+                                                       first_pop * 1e3,
+                                                       hold * 1e6)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
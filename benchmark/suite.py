@@ -0,0 +1,193 @@
+# Standard scenarios measuring the event loop, routing and result
+# collection. Each scenario runs in its own process (peak RSS) and
+# reports events/s, arrivals/s, peak pending events, peak RSS and, from a
+# second profiled run, the share of time spent in each subsystem.
+#
+# usage: python benchmark/suite.py [-a arrivals] [-s scenario,...]
+#                                  [-o results.json] [-c baseline.json]
+#                                  [--compact] [-e generic|fast]
+
+import argparse
+import cProfile
+import json
+import multiprocessing
+import platform
+import pstats
+import resource
+import subprocess
+import sys
+import time
+from flowsim import Simulation
+from flowsim.event.event_types import Arrival_Event
+from flowsim.physical_layer.topology import torus2D, torus3D
+
+
+def triangle():
+    return [0, 1, 2], [(0, 1), (1, 2), (2, 0)]
+
+
+# name -> (topology function, its arguments, capacity, arrival_rate,
+# service_rate). Topologies are built in the process measuring them
+scenarios = {
+    'triangle_high': (triangle, (), 1, 0.9, 0.9),
+    'triangle_low': (triangle, (), 1, 0.1, 0.9),
+    'torus2D_high': (torus2D, (10, 10), 5, 1., 0.2),
+    'torus2D_low': (torus2D, (10, 10), 5, 0.1, 0.2),
+    'torus3D_high': (torus3D, (8, 8, 8), 50, 1., 0.05),
+    'torus3D_low': (torus3D, (8, 8, 8), 50, 0.1, 0.05),
+}
+
+# Subsystem of the functions, by file name
+subsystems = [('event_queue', ['event_queue.py']),
+              ('routing', ['topology.py', 'compact_graph.py', 'node.py',
+                           'networkx']),
+              ('flows', ['flow_controller.py', 'flow.py', 'edge.py']),
+              ('results', ['result.py', 'statistics.py']),
+              ('random', ['random_generator.py', 'random.py']),
+              ('events', ['event_types.py', 'event.py'])]
+
+
+def get_subsystem(filename):
+    for subsystem, patterns in subsystems:
+        if any(pattern in filename for pattern in patterns):
+            return subsystem
+    return 'other'
+
+
+def create_simulation(name, compact, engine):
+    topology, arguments, capacity, arrival_rate, service_rate =\
+        scenarios[name]
+    nodes, edges = topology(*arguments)
+    # Fixed number of arrivals, every event counted
+    sim = Simulation(arrival_rate, service_rate, 1, precision_targets={},
+                     warm_up_metric=None, engine=engine)
+    sim.init_simulation(nodes, [edge + (capacity,) for edge in edges],
+                        compact=compact)
+    return sim
+
+
+def measure(task):
+    name, arrivals, compact, engine = task
+    sim = create_simulation(name, compact, engine)
+    event_list = sim.event_manager.event_list
+    peak_pending = [0]
+    end = sim.end
+
+    def sampling_end():
+        peak_pending[0] = max(peak_pending[0], len(event_list))
+        return end()
+    sim.end = sampling_end
+
+    start = time.time()
+    results = sim.launch_simulation(arrivals)
+    elapsed = time.time() - start
+    events = sum(value for key, value in results.iteritems()
+                 if not isinstance(key, str))
+    handled_arrivals = results.get(Arrival_Event, 0)
+    # kB on Linux. Scenario and timed run only, on top of the interpreter
+    # and modules inherited from the parent process
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Second run for the time split, profiling slows everything down
+    sim = create_simulation(name, compact, engine)
+    profile = cProfile.Profile()
+    profile.runcall(sim.launch_simulation, max(arrivals / 5, 1))
+    split = dict()
+    stats = pstats.Stats(profile).stats
+    for (filename, line, function), values in stats.iteritems():
+        callers = values[4]
+        if filename == '~' and len(callers) > 0:
+            # Built-in (heappush, dict.get...): charged to its callers
+            calls = float(sum(caller[1] for caller in callers.itervalues()))
+            for caller, caller_values in callers.iteritems():
+                subsystem = get_subsystem(caller[0])
+                split[subsystem] = split.get(subsystem, 0.) +\
+                    values[2] * caller_values[1] / calls
+        else:
+            subsystem = get_subsystem(filename)
+            split[subsystem] = split.get(subsystem, 0.) + values[2]
+    total = sum(split.itervalues())
+
+    return {'scenario': name,
+            'arrivals': handled_arrivals,
+            'events': events,
+            'seconds': elapsed,
+            'events_per_second': events / elapsed,
+            'arrivals_per_second': handled_arrivals / elapsed,
+            'peak_pending_events': peak_pending[0],
+            'peak_rss_kb': peak_rss,
+            'time_split': dict((subsystem, value / total)
+                               for subsystem, value in split.iteritems()),
+            'Blocking_rate': results.get('Blocking_rate')}
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       stderr=subprocess.STDOUT).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    previous = dict((scenario['scenario'], scenario)
+                    for scenario in baseline['scenarios'])
+    print '%-16s %14s %14s %8s' % ('scenario', 'events/s', 'baseline',
+                                   'ratio')
+    for scenario in report['scenarios']:
+        if scenario['scenario'] not in previous:
+            continue
+        old = previous[scenario['scenario']]['events_per_second']
+        print '%-16s %14.0f %14.0f %8.2f' % (
+            scenario['scenario'], scenario['events_per_second'], old,
+            scenario['events_per_second'] / old)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-a', '--arrivals', type=int, default=20000)
+    parser.add_argument('-s', '--scenarios', default=','.join(
+        sorted(scenarios)))
+    parser.add_argument('-o', '--output')
+    parser.add_argument('-c', '--compare')
+    parser.add_argument('--compact', action='store_true',
+                        help='route on the compact graph')
+    parser.add_argument('-e', '--engine', default='generic',
+                        choices=['generic', 'fast'])
+    options = parser.parse_args(argv[1:])
+
+    report = {'commit': get_commit(),
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'arrivals': options.arrivals,
+              'compact': options.compact,
+              'engine': options.engine,
+              'scenarios': []}
+    for name in options.scenarios.split(','):
+        # A fresh process per scenario: peak RSS is not shared
+        pool = multiprocessing.Pool(1)
+        try:
+            scenario = pool.apply(measure, ((name, options.arrivals,
+                                             options.compact,
+                                             options.engine),))
+        finally:
+            pool.close()
+            pool.join()
+        report['scenarios'].append(scenario)
+        print >> sys.stderr, '%-16s %10.0f events/s %10.0f arrivals/s' %\
+            (name, scenario['events_per_second'],
+             scenario['arrivals_per_second'])
+
+    if options.output is not None:
+        with open(options.output, 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+    else:
+        print json.dumps(report, indent=2, sort_keys=True)
+    if options.compare is not None:
+        with open(options.compare) as baseline:
+            compare(report, json.load(baseline))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
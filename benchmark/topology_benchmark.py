@@ -0,0 +1,59 @@
+# Loading time of a random topology from GraphML, from Python lists
+# (build_topology_from_int) and from the binary topology file.
+#
+# usage: python benchmark/topology_benchmark.py [nodes [edges]]
+
+import os
+import random
+import sys
+import tempfile
+import time
+import networkx
+from flowsim.physical_layer.topology import Topology
+from flowsim.physical_layer.topology_file import graphml_to_topology_file
+
+
+def timed(function, *args):
+    start = time.time()
+    function(*args)
+    return time.time() - start
+
+
+def main(argv):
+    nodes = int(argv[1]) if len(argv) > 1 else 20000
+    edges = int(argv[2]) if len(argv) > 2 else 100000  # Both ways
+    rand = random.Random(0)
+    edge_list = set()
+    while len(edge_list) < edges:
+        node1, node2 = rand.randrange(nodes), rand.randrange(nodes)
+        if node1 != node2 and (node2, node1) not in edge_list:
+            edge_list.add((node1, node2))
+    edge_list = [edge + (rand.randint(1, 10),) for edge in edge_list]
+
+    directory = tempfile.mkdtemp()
+    graphml = os.path.join(directory, 'topology.graphml')
+    binary = os.path.join(directory, 'topology.bin')
+    graph = networkx.Graph()
+    graph.add_nodes_from(xrange(nodes))
+    graph.add_edges_from((node1, node2, {'capacity': capacity})
+                         for node1, node2, capacity in edge_list)
+    networkx.write_graphml(graph, graphml)
+    try:
+        print 'graphml to binary: %.2f s' % timed(graphml_to_topology_file,
+                                                  graphml, binary)
+        print 'import_topology:   %.2f s' % timed(
+            Topology().import_topology, graphml, 1., 1.)
+        print 'build_from_int:    %.2f s' % timed(
+            Topology().build_topology_from_int, range(nodes), edge_list,
+            1., 1.)
+        print 'load_topology:     %.2f s' % timed(
+            Topology().load_topology, binary, 1., 1.)
+        print 'binary file: %.1f MB' % (os.path.getsize(binary) / 1e6)
+    finally:
+        os.remove(graphml)
+        os.remove(binary)
+        os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,164 @@
+import networkx
+import numpy
+
+
+def erlang_b(loads, capacities):
+    # Blocking probability of Erlang loss systems, element-wise, by the
+    # recursion B(0) = 1, B(c) = a B(c - 1) / (c + a B(c - 1))
+    loads = numpy.asarray(loads, dtype=numpy.float64)
+    capacities = numpy.asarray(capacities, dtype=numpy.int64)
+    blocking = numpy.ones(numpy.broadcast(loads, capacities).shape)
+    for capacity in xrange(1, int(capacities.max()) + 1
+                           if capacities.size > 0 else 1):
+        step = loads * blocking
+        blocking = numpy.where(capacities >= capacity,
+                               step / (capacity + step), blocking)
+    return blocking
+
+
+class Reduced_load(object):
+    # Erlang fixed point approximation of the blocking rate: links block
+    # independently, each one is an Erlang loss system offered the load of
+    # its routes thinned by the blocking of their other links. Flows
+    # follow the shortest route of the empty network (no rerouting around
+    # full links, unlike the simulation) and destinations are uniform
+    # among the exit nodes. Node rates are read at each solve, routes are
+    # computed once.
+
+    def __init__(self, topology):
+        self.topology = topology
+        sources = topology.get_entry_nodes()
+        exits = topology.exit_nodes if len(topology.exit_nodes) > 0 else\
+            topology.nodes()
+        link_ids = dict()
+        capacities = []
+        # One route per (source, destination) pair, as (route, link)
+        # incidence entries
+        self.route_sources = []
+        self.route_shares = []  # Of the arrivals of the source
+        route_lengths = []
+        route_entries = []
+        link_entries = []
+        unreachable = []
+        for source in sources:
+            destinations = [node for node in exits if node != source]
+            paths = self.get_paths(source, destinations)
+            for destination in destinations:
+                route = len(self.route_sources)
+                self.route_sources.append(source)
+                self.route_shares.append(1. / len(destinations))
+                path = paths.get(destination)
+                if path is None:
+                    unreachable.append(route)
+                    route_lengths.append(0)
+                    continue
+                route_lengths.append(len(path))
+                for i in xrange(len(path) - 1):
+                    key = (path[i], path[i + 1])
+                    if key not in link_ids:
+                        link_ids[key] = len(capacities)
+                        capacities.append(topology.get_edge_object(
+                            *key).max_flows)
+                    route_entries.append(route)
+                    link_entries.append(link_ids[key])
+        self.links = sorted(link_ids, key=link_ids.get)
+        self.capacities = numpy.array(capacities, dtype=numpy.int64)
+        self.route_shares = numpy.array(self.route_shares)
+        self.route_lengths = numpy.array(route_lengths, dtype=numpy.float64)
+        self.route_entries = numpy.array(route_entries, dtype=numpy.int64)
+        self.link_entries = numpy.array(link_entries, dtype=numpy.int64)
+        self.unreachable = numpy.array(unreachable, dtype=numpy.int64)
+
+        self.link_blocking = None
+        self.route_blocking = None
+        self.iterations = 0
+
+    def get_paths(self, source, destinations):
+        # destination -> path, one shortest path tree per source unless
+        # routes come from a path table
+        topology = self.topology
+        if topology.path_table is not None:
+            return dict((destination, topology.table_path(source,
+                                                          destination))
+                        for destination in destinations
+                        if (source, destination) in topology.path_table)
+        return networkx.single_source_dijkstra_path(topology, source,
+                                                    weight='weight')
+
+    def get_route_rates(self):
+        # Arrival rate and offered load (Erlang) of every route
+        arrival_rates = numpy.array([source.get_arrival_rate() for source in
+                                     self.route_sources], dtype=numpy.float64)
+        service_rates = numpy.array([source.get_service_rate() for source in
+                                     self.route_sources], dtype=numpy.float64)
+        arrival_rates *= self.route_shares
+        return arrival_rates, arrival_rates / service_rates
+
+    def get_route_log_free(self, link_blocking):
+        # log of the probability that no link of the route blocks
+        with numpy.errstate(divide='ignore'):
+            log_free = numpy.log1p(-link_blocking)
+        route_log_free = numpy.bincount(self.route_entries,
+                                        log_free[self.link_entries],
+                                        len(self.route_sources))
+        return log_free, route_log_free
+
+    def solve(self, tolerance=1e-10, max_iterations=1000, damping=0.5):
+        # damping: fraction of the new link blocking taken at each
+        # iteration, plain repeated substitution (1) oscillates under heavy
+        # load
+        arrival_rates, loads = self.get_route_rates()
+        number_of_links = len(self.capacities)
+        # Links without capacity always block
+        link_blocking = erlang_b(numpy.zeros(number_of_links),
+                                 self.capacities)
+        entry_loads = loads[self.route_entries]
+        self.iterations = 0
+        while self.iterations < max_iterations:
+            self.iterations += 1
+            log_free, route_log_free = self.get_route_log_free(link_blocking)
+            # Load reaching each link: blocked by none of the other links
+            # of the route (a link that always blocks contributes 0)
+            with numpy.errstate(invalid='ignore'):
+                others = route_log_free[self.route_entries] -\
+                    log_free[self.link_entries]
+            others[numpy.isnan(others)] = -numpy.inf
+            link_loads = numpy.bincount(self.link_entries,
+                                        entry_loads * numpy.exp(others),
+                                        number_of_links)
+            change = erlang_b(link_loads, self.capacities) - link_blocking
+            link_blocking = link_blocking + damping * change
+            if numpy.all(numpy.abs(change) <= tolerance):
+                break
+        self.link_blocking = link_blocking
+        log_free, route_log_free = self.get_route_log_free(link_blocking)
+        self.route_blocking = -numpy.expm1(route_log_free)
+        self.route_blocking[self.unreachable] = 1.
+        return self.get_results(arrival_rates)
+
+    def get_results(self, arrival_rates):
+        # Same keys as Simulation.launch_simulation
+        results = dict()
+        total = arrival_rates.sum()
+        if total > 0:
+            results['Blocking_rate'] =\
+                float(numpy.dot(arrival_rates, self.route_blocking) / total)
+        accepted = arrival_rates * (1. - self.route_blocking)
+        if accepted.sum() > 0:
+            results['mean_nodes_per_flow'] =\
+                float(numpy.dot(accepted, self.route_lengths) /
+                      accepted.sum())
+        return results
+
+
+def screen(topology, points, **options):
+    # Analytic results at every (arrival_rate, service_rate) point, set on
+    # every node of topology (see Topology.reset). options: see
+    # Reduced_load.solve
+    solver = Reduced_load(topology)
+    results = []
+    for arrival_rate, service_rate in points:
+        topology.reset(arrival_rate, service_rate)
+        results.append(((arrival_rate, service_rate),
+                        solver.solve(**options)))
+    return results
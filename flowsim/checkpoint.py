@@ -0,0 +1,143 @@
+import contextlib
+import os
+import time
+import zlib
+import cPickle
+import cStringIO
+from flowsim.flowsim_exception import InvalidCheckpoint
+from flowsim.utilities import gc_disabled
+
+checkpoint_version = 1
+
+
+@contextlib.contextmanager
+def instrumentation_detached(simulation):
+    # Timing wrappers (see instrumentation) are closures, they are removed
+    # while pickling and attached again afterwards
+    instrumentation = getattr(simulation, 'instrumentation', None)
+    if instrumentation is not None:
+        instrumentation.detach()
+    try:
+        yield
+    finally:
+        if instrumentation is not None:
+            instrumentation.attach(simulation)
+
+
+@contextlib.contextmanager
+def outputs_detached(simulation):
+    # In-memory copies neither record the trace nor save checkpoints: they
+    # would write to the files of the original (and truncate the trace
+    # when loaded, see trace.Trace_recorder). Checkpoints keep both
+    event_manager = getattr(simulation, 'event_manager', None)
+    if event_manager is None:
+        yield
+        return
+    outputs = (event_manager.trace_recorder, event_manager.checkpointer)
+    event_manager.trace_recorder = event_manager.checkpointer = None
+    try:
+        yield
+    finally:
+        event_manager.trace_recorder, event_manager.checkpointer = outputs
+
+
+def attach_instrumentation(simulation):
+    if getattr(simulation, 'instrumentation', None) is not None:
+        simulation.instrumentation.attach(simulation)
+
+
+def save_checkpoint(simulation, filename, compression_level=1):
+    # The whole object graph (pending events, random streams, flows, edge
+    # capacities, results) as a binary pickle, zlib compressed. Written to
+    # a temporary file first so that a crash never leaves a truncated
+    # checkpoint behind
+    with gc_disabled(), instrumentation_detached(simulation):
+        data = cPickle.dumps((checkpoint_version, simulation),
+                             cPickle.HIGHEST_PROTOCOL)
+    data = zlib.compress(data, compression_level)
+    temporary_filename = filename + '.tmp'
+    with open(temporary_filename, 'wb') as checkpoint_file:
+        checkpoint_file.write(data)
+        checkpoint_file.flush()
+        os.fsync(checkpoint_file.fileno())
+    os.rename(temporary_filename, filename)
+
+
+def dump_simulation(simulation, shared=()):
+    # In-memory pickle of simulation for load_simulation, the objects of
+    # shared are not copied (e.g. random streams replaced in the copies)
+    shared_ids = set(id(item) for item in shared)
+    data = cStringIO.StringIO()
+    with gc_disabled(), instrumentation_detached(simulation),\
+            outputs_detached(simulation):
+        pickler = cPickle.Pickler(data, cPickle.HIGHEST_PROTOCOL)
+        if shared_ids:
+            pickler.inst_persistent_id =\
+                lambda item: id(item) if id(item) in shared_ids else None
+        pickler.dump(simulation)
+    return data.getvalue()
+
+
+def load_simulation(data, shared=()):
+    # Independent copy, sharing nothing with the dumped simulation but the
+    # objects of shared (same as given to dump_simulation)
+    unpickler = cPickle.Unpickler(cStringIO.StringIO(data))
+    unpickler.persistent_load = dict((id(item), item)
+                                     for item in shared).__getitem__
+    with gc_disabled():
+        copy = unpickler.load()
+    attach_instrumentation(copy)
+    return copy
+
+
+def copy_simulation(simulation):
+    # Independent in-memory copy, sharing nothing with simulation
+    return load_simulation(dump_simulation(simulation))
+
+
+def load_checkpoint(filename):
+    with open(filename, 'rb') as checkpoint_file:
+        data = checkpoint_file.read()
+    try:
+        data = zlib.decompress(data)
+        with gc_disabled():
+            version, simulation = cPickle.loads(data)
+    except (zlib.error, cPickle.UnpicklingError, EOFError, ValueError):
+        raise InvalidCheckpoint(filename)
+    if version != checkpoint_version:
+        raise InvalidCheckpoint(filename)
+    attach_instrumentation(simulation)
+    checkpointer = simulation.event_manager.checkpointer
+    if checkpointer is not None:
+        checkpointer.last_save = time.time()
+    return simulation
+
+
+class Checkpointer(object):
+    # Saves the simulation every every_events handled events and/or every
+    # every_seconds of wall-clock time
+    clock_check_interval = 1000  # Events between two clock reads
+
+    def __init__(self, simulation, filename, every_events=None,
+                 every_seconds=None):
+        self.simulation = simulation
+        self.filename = filename
+        self.every_events = every_events
+        self.every_seconds = every_seconds
+        self.events = 0  # Since the last save
+        self.last_save = time.time()
+
+    def is_due(self):
+        self.events += 1
+        if self.every_events is not None and\
+                self.events >= self.every_events:
+            return True
+        if self.every_seconds is not None and\
+                self.events % self.clock_check_interval == 0:
+            return time.time() - self.last_save >= self.every_seconds
+        return False
+
+    def save(self):
+        self.events = 0
+        save_checkpoint(self.simulation, self.filename)
+        self.last_save = time.time()
@@ -1,21 +1,40 @@
 from flowsim.result import Result
 from flowsim.random_generator import Random_generator
 from flowsim.event.event_types import *
+from flowsim.event.event_queue import create_event_queue
 
 
 class Event_manager:
 
-    def __init__(self, simulation, random_generator):
+    def __init__(self, simulation, random_generator, event_queue='heap',
+                 event_pool=False):
         self.simulation = simulation
         self.flow_controller = None
         self.EOS = False  # End of simulation
 
-        # reverse sorted list of event (sort key delay_before_handling)
-        self.event_list = []
+        # Pending events ordered by (handling_time, sequence)
+        self.event_list = create_event_queue(event_queue)
+        self.current_time = 0.
+        self.sequence = 0  # Tie-breaker keeping insertion order
+        self.event_pool = Event_pool() if event_pool else None
 
         self.result = self.simulation.result
         self.random_generator = random_generator
         self.convergence_check_interval = 100
+        self.warm_up_check_interval = 10
+        self.check_counter = 0  # Events since the last check
+        self.has_converged = False
+        self.checkpointer = None  # Periodic checkpoint.Checkpointer
+        # Arrivals written to a trace.Trace_recorder, or read from a
+        # trace.Trace_replay instead of being drawn
+        self.trace_recorder = None
+        self.trace_replay = None
+        self.sampler = None  # Time series, see sampler.Sampler
+        # Event types of the arrivals and ends of flows, and the splitting
+        # trial they report to (see rare_event)
+        self.arrival_event_type = Arrival_Event
+        self.end_flow_event_type = End_flow_Event
+        self.rare_event = None
 
     def handle_next_event(self):
         try:
@@ -23,50 +42,110 @@ class Event_manager:
         except IndexError:
             self.EOS = True
             return
-        # Substracting duration of current event to
-        # all other events' durations
-        time_elapsed = event.delay_before_handling if\
-            event.delay_before_handling != float('-inf') else 0.
-
-        for x in self.event_list:
-            x.delay_before_handling -= time_elapsed
-        self.result.update_computed_value('time_elapsed',
-                                          time_elapsed,
-                                          update_function=self.result.sum)
+        # Immediate events (handling_time = -inf) do not move the clock
+        time_elapsed = 0.
+        if event.handling_time > self.current_time:
+            if self.sampler is not None:
+                self.sampler.sample_until(event.handling_time)
+            time_elapsed = event.handling_time - self.current_time
+            self.current_time = event.handling_time
+        self.result.add_to_sum('time_elapsed', time_elapsed)
 
         event.handle_event()
         event.automated_update_result()
+        if self.event_pool is not None:
+            self.event_pool.release(event)
 
     def add_event(self, Event_type, event_issuer, **kwargs):
+        self.schedule_event(self.new_event(Event_type, event_issuer,
+                                           **kwargs))
+
+    def new_event(self, Event_type, event_issuer, **kwargs):
         if not issubclass(Event_type, Event):
             raise TypeError
-        self.event_list.append(Event_type(self, event_issuer, **kwargs))
-        self.event_list.sort(key=lambda x: x.get_delay(), reverse=True)
+        if self.event_pool is not None:
+            event = self.event_pool.acquire(Event_type)
+            event.__init__(self, event_issuer, **kwargs)
+        else:
+            event = Event_type(self, event_issuer, **kwargs)
+        return event
+
+    def schedule_event(self, event, handling_time=None):
+        # Events still express their delay relative to the time they are
+        # created, convert it once to an absolute simulation time.
+        # handling_time: absolute time given instead (e.g. read from a
+        # trace), not rebuilt from a delay
+        if handling_time is None:
+            handling_time = self.current_time + event.get_delay()
+        event.handling_time = handling_time
+        event.sequence = self.sequence
+        self.sequence += 1
+        self.event_list.push(event)
+
+    def get_current_time(self):
+        return self.current_time
 
     def start_event_processing(self):
         # print("Starting event processing")
-        has_converged = False
-        counter = 0
-        for node in self.flow_controller.get_entry_nodes():
-            self.add_event(Arrival_Event,
-                           node,
-                           arrival_rate=node.get_arrival_rate(),
-                           service_rate=node.get_service_rate())
-            self.result.\
-                add_computed_value('Blocking_rate',
-                                   self.result.event_division,
-                                   {'key_numerator':
-                                    Flow_allocation_failure_Event,
-                                    'key_denominator':
-                                    Arrival_Event})
-        while not self.EOS and not has_converged:
+        self.init_event_processing()
+        self.process_events()
+
+    def init_event_processing(self):
+        self.result.init_nodes(self.flow_controller.get_entry_nodes())
+        if self.trace_replay is not None:
+            self.trace_replay.start(self)
+        else:
+            for node in self.flow_controller.get_entry_nodes():
+                self.add_event(self.arrival_event_type,
+                               node,
+                               arrival_rate=node.get_arrival_rate(),
+                               service_rate=node.get_service_rate())
+        self.result.add_computed_value('Blocking_rate',
+                                       self.result.event_division,
+                                       {'key_numerator':
+                                        Flow_allocation_failure_Event,
+                                        'key_denominator':
+                                        Arrival_Event})
+        # Stopping once the confidence interval of each target metric is
+        # narrow enough
+        for key, relative_precision in\
+                self.simulation.precision_targets.iteritems():
+            self.result.set_precision_target(
+                key, relative_precision, self.simulation.confidence,
+                zero_precision=self.simulation.zero_precision)
+        # Statistics of the transient from the empty network are dropped
+        if self.simulation.warm_up_metric is not None:
+            self.result.set_warm_up_detection(self.simulation.warm_up_metric)
+
+    def process_events(self, until_warm_up=False):
+        # Resumable: the loop state lives in the manager, so that a
+        # checkpoint taken between two events can be processed further.
+        # until_warm_up: returns as soon as the warm-up is over, the
+        # simulation can then be forked (see Simulation.fork)
+        counter = self.check_counter
+        while not self.EOS and not self.has_converged:
             self.handle_next_event()
 
-            if counter == self.convergence_check_interval:
-                has_converged =\
-                    self.result.check_mean_convergence('Blocking_rate')
+            if self.result.warm_up is not None:
+                if counter % self.warm_up_check_interval == 0 and\
+                        self.result.update_warm_up():
+                    # Clock at the truncation: time_elapsed restarts from 0
+                    # there, so warm_up_time + time_elapsed is the clock
+                    self.result.add_to_sum('warm_up_time', self.current_time)
+                    counter = 0
+                    if until_warm_up:
+                        self.check_counter = counter + 1
+                        return
+            elif counter == self.convergence_check_interval:
+                self.has_converged = self.result.has_converged()
                 counter = 0
             counter = counter + 1
+            if self.checkpointer is not None and self.checkpointer.is_due():
+                self.check_counter = counter
+                self.checkpointer.save()
+        self.check_counter = counter
+        if self.trace_recorder is not None:
+            self.trace_recorder.flush()
         self.process_results()
 
     def set_EOS(self):
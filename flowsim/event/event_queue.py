@@ -0,0 +1,268 @@
+import bisect
+import heapq
+from collections import deque
+from flowsim.flowsim_exception import NoSuchEventQueue
+
+
+class Event_queue(object):
+    # Pending events ordered by (handling_time, sequence). Immediate events
+    # (handling_time = -inf) are kept apart in insertion order so that
+    # subclasses only deal with finite times.
+
+    def __init__(self):
+        self.immediate_events = deque()
+        self.size = 0  # Number of timed events
+
+    def push(self, event):
+        if event.handling_time == float('-inf'):
+            self.immediate_events.append(event)
+        else:
+            self.push_timed((event.handling_time, event.sequence, event))
+            self.size += 1
+
+    def pop(self):
+        if self.immediate_events:
+            return self.immediate_events.popleft()
+        if self.size == 0:
+            raise IndexError('pop from empty event queue')
+        self.size -= 1
+        return self.pop_timed()[2]
+
+    def __len__(self):
+        return len(self.immediate_events) + self.size
+
+    def __iter__(self):
+        # Unordered
+        for event in self.immediate_events:
+            yield event
+        for entry in self.timed_entries():
+            yield entry[2]
+
+    def push_timed(self, entry):  # To specialize in child class
+        pass
+
+    def pop_timed(self):  # To specialize in child class
+        pass
+
+    def timed_entries(self):  # To specialize in child class
+        pass
+
+
+class Heap_event_queue(Event_queue):
+
+    def __init__(self):
+        super(Heap_event_queue, self).__init__()
+        self.heap = []
+
+    def push_timed(self, entry):
+        heapq.heappush(self.heap, entry)
+
+    def pop_timed(self):
+        return heapq.heappop(self.heap)
+
+    def timed_entries(self):
+        return iter(self.heap)
+
+
+class Calendar_event_queue(Event_queue):
+    # R. Brown, "Calendar queues: a fast O(1) priority queue implementation
+    # for the simulation event set problem", CACM 1988.
+    min_buckets = 2
+    width_sample = 25
+
+    def __init__(self, buckets=2, width=1.):
+        super(Calendar_event_queue, self).__init__()
+        self.last_time = 0.
+        self.build(max(buckets, self.min_buckets), width, [])
+
+    def build(self, nbuckets, width, entries):
+        self.nbuckets = nbuckets
+        self.width = width
+        self.buckets = [[] for i in xrange(nbuckets)]
+        # Virtual bucket index (time // width) of the last dequeued event
+        self.current = int(self.last_time / width)
+        for entry in entries:
+            self.buckets[int(entry[0] / width) % nbuckets].append(entry)
+        for bucket in self.buckets:
+            bucket.sort()
+
+    def resize(self, nbuckets):
+        entries = [entry for bucket in self.buckets for entry in bucket]
+        entries.sort()
+        sample = entries[:self.width_sample]
+        width = self.width
+        if len(sample) > 1:
+            separation = (sample[-1][0] - sample[0][0]) / (len(sample) - 1)
+            # Discarding outliers as in the original paper
+            gaps = [b[0] - a[0] for a, b in zip(sample, sample[1:])
+                    if b[0] - a[0] <= 2. * separation]
+            if len(gaps) > 0 and sum(gaps) > 0.:
+                width = 3. * sum(gaps) / len(gaps)
+        self.build(nbuckets, width, entries)
+
+    def push_timed(self, entry):
+        bisect.insort(self.buckets[int(entry[0] / self.width) %
+                                   self.nbuckets],
+                      entry)
+        if self.size + 1 > 2 * self.nbuckets:
+            self.resize(2 * self.nbuckets)
+
+    def pop_timed(self):
+        buckets = self.buckets
+        nbuckets = self.nbuckets
+        width = self.width
+        current = self.current
+        entry = None
+        for i in xrange(nbuckets):
+            bucket = buckets[current % nbuckets]
+            if bucket and int(bucket[0][0] / width) <= current:
+                entry = bucket.pop(0)
+                break
+            current += 1
+        else:
+            # Nothing in the coming year: direct search of the minimum
+            bucket = min((bucket for bucket in buckets if bucket),
+                         key=lambda x: x[0])
+            entry = bucket.pop(0)
+            current = int(entry[0] / width)
+        self.current = current
+        self.last_time = entry[0]
+        if self.size < self.nbuckets / 2 and\
+                self.nbuckets > self.min_buckets:
+            self.resize(self.nbuckets // 2)
+        return entry
+
+    def timed_entries(self):
+        return (entry for bucket in self.buckets for entry in bucket)
+
+
+class Ladder_rung(object):
+
+    def __init__(self, start, width, nbuckets):
+        self.start = start
+        self.width = width
+        self.buckets = [[] for i in xrange(nbuckets)]
+        self.current = 0  # Index of the next bucket to dequeue
+
+    def current_start(self):
+        return self.start + self.current * self.width
+
+    def bucket_index(self, time):
+        index = int((time - self.start) / self.width)
+        return min(max(index, self.current), len(self.buckets) - 1)
+
+
+class Ladder_event_queue(Event_queue):
+    # W. T. Tang, R. S. M. Goh, I. L.-J. Thng, "Ladder queue: an O(1)
+    # priority queue structure for large-scale discrete event simulation",
+    # ACM TOMACS 2005.
+    threshold = 50
+    max_rungs = 8
+
+    def __init__(self):
+        super(Ladder_event_queue, self).__init__()
+        self.top = []
+        self.top_min = float('inf')
+        self.top_max = float('-inf')
+        self.top_start = float('-inf')  # Events >= top_start go to top
+        self.rungs = []
+        self.bottom = []  # Sorted
+
+    def push_timed(self, entry):
+        time = entry[0]
+        if time >= self.top_start:
+            self.top.append(entry)
+            if time < self.top_min:
+                self.top_min = time
+            if time > self.top_max:
+                self.top_max = time
+            return
+        for rung in self.rungs:
+            # An exhausted rung (all buckets dequeued, waiting to be
+            # removed) would clamp the entry into a consumed bucket
+            if rung.current < len(rung.buckets) and\
+                    time >= rung.current_start():
+                rung.buckets[rung.bucket_index(time)].append(entry)
+                return
+        bisect.insort(self.bottom, entry)
+
+    def pop_timed(self):
+        if not self.bottom:
+            self.fill_bottom()
+        return self.bottom.pop(0)
+
+    def fill_bottom(self):
+        if not self.rungs:
+            self.transfer_top()
+            if self.bottom:
+                return
+        while True:
+            rung = self.rungs[-1]
+            while rung.current < len(rung.buckets) and\
+                    not rung.buckets[rung.current]:
+                rung.current += 1
+            if rung.current == len(rung.buckets):
+                self.rungs.pop()
+                if not self.rungs:
+                    self.transfer_top()
+                    if self.bottom:
+                        return
+                continue
+            bucket = rung.buckets[rung.current]
+            rung.buckets[rung.current] = []
+            rung.current += 1
+            if len(bucket) > self.threshold and\
+                    len(self.rungs) < self.max_rungs:
+                low = min(bucket)[0]
+                high = max(bucket)[0]
+                if high > low:
+                    child = Ladder_rung(low,
+                                        (high - low) / len(bucket),
+                                        len(bucket) + 1)
+                    for entry in bucket:
+                        child.buckets[child.bucket_index(entry[0])].\
+                            append(entry)
+                    self.rungs.append(child)
+                    continue
+            bucket.sort()
+            self.bottom = bucket
+            return
+
+    def transfer_top(self):
+        top = self.top
+        self.top = []
+        self.top_start = self.top_max
+        if len(top) <= 1 or self.top_max == self.top_min:
+            top.sort()
+            self.bottom = top
+        else:
+            rung = Ladder_rung(self.top_min,
+                               (self.top_max - self.top_min) / len(top),
+                               len(top) + 1)
+            for entry in top:
+                rung.buckets[rung.bucket_index(entry[0])].append(entry)
+            self.rungs.append(rung)
+        self.top_min = float('inf')
+        self.top_max = float('-inf')
+
+    def timed_entries(self):
+        for entry in self.top:
+            yield entry
+        for rung in self.rungs:
+            for bucket in rung.buckets:
+                for entry in bucket:
+                    yield entry
+        for entry in self.bottom:
+            yield entry
+
+
+event_queues = {'heap': Heap_event_queue,
+                'calendar': Calendar_event_queue,
+                'ladder': Ladder_event_queue}
+
+
+def create_event_queue(name):
+    try:
+        return event_queues[name]()
+    except KeyError:
+        raise NoSuchEventQueue(name)
@@ -2,13 +2,63 @@ from flowsim.flowsim_exception import NoPathError
 from flowsim.physical_layer.node import Node
 
 
+slot_names_cache = dict()
+
+
+def get_slot_names(Event_type):
+    # Slots declared by Event_type and its bases, cached by type
+    try:
+        return slot_names_cache[Event_type]
+    except KeyError:
+        names = []
+        for base in reversed(Event_type.__mro__):
+            slots = base.__dict__.get('__slots__', ())
+            if isinstance(slots, basestring):
+                slots = (slots,)
+            names.extend(name for name in slots
+                         if name not in ('__dict__', '__weakref__'))
+        slot_names_cache[Event_type] = names
+        return names
+
+
 class Event(object):
+    # Built-in events are slotted: no per-instance __dict__. Subclasses
+    # without __slots__ get one back and work as before.
+    __slots__ = ('duration', 'delay_before_handling', 'handling_time',
+                 'sequence', 'event_issuer', 'event_manager')
+    # Index of the built-in event types (see event_types), also their
+    # event counter id in Result
+    type_code = -1
+
     def __init__(self, event_manager, event_issuer, **kwargs):
         self.duration = 0
-        self.delay_before_handling = 0
+        self.delay_before_handling = 0  # Relative to creation time
+        self.handling_time = None  # Absolute, set by Event_manager
+        self.sequence = 0
         self.event_issuer = event_issuer
         self.event_manager = event_manager
-        self.result = event_manager.get_result()
+
+    def __getstate__(self):
+        # Checkpoints: slot values as a tuple, cheaper to pickle than the
+        # default dict of slots
+        return (tuple([getattr(self, name, None)
+                       for name in get_slot_names(self.__class__)]),
+                getattr(self, '__dict__', None))
+
+    def __setstate__(self, state):
+        values, dictionary = state
+        for name, value in zip(get_slot_names(self.__class__), values):
+            setattr(self, name, value)
+        if dictionary is not None:
+            self.__dict__.update(dictionary)
+
+    @property
+    def result(self):
+        return self.event_manager.get_result()
+
+    def clear(self):
+        # Drops references before the event goes back to an Event_pool
+        self.event_issuer = None
 
     def get_duration(self):
         return self.duration
@@ -16,12 +66,20 @@ class Event(object):
     def get_delay(self):
         return self.delay_before_handling
 
+    def get_handling_time(self):
+        return self.handling_time
+
     def automated_update_result(self):
-        self.result.increase_event_counter(self.__class__)
+        result = self.event_manager.result
+        # Subclasses of built-in events are counted as the built-in type
+        # unless they reset type_code to -1
+        key_id = self.type_code if self.type_code >= 0 else\
+            result.get_key_id(self.__class__)
         # TODO : new class NodeEvent
         if isinstance(self.event_issuer, Node):
-            self.result.increase_event_counter(self.__class__,
-                                               self.event_issuer)
+            result.count_event(key_id, self.event_issuer)
+        else:
+            result.count_event(key_id)
         self.update_result()
 
     def update_result(self):  # To specialize in child class
@@ -31,14 +89,18 @@ class Event(object):
         pass
 
     def get_debug(self):
-        return [self.__class__, self.delay_before_handling, self.duration]
+        return [self.__class__, self.handling_time, self.duration]
 
 
 class Arrival_Event(Event):
-    def __init__(self, event_manager, event_issuer, **kwargs):
-        self.arrival_rate = kwargs.pop('arrival_rate')
-        self.service_rate = kwargs.pop('service_rate')
-        super(self.__class__, self).__init__(event_manager, event_issuer)
+    __slots__ = ('arrival_rate', 'service_rate')
+    type_code = 0
+
+    def __init__(self, event_manager, event_issuer, arrival_rate,
+                 service_rate, **kwargs):
+        self.arrival_rate = arrival_rate
+        self.service_rate = service_rate
+        Event.__init__(self, event_manager, event_issuer)
         self.delay_before_handling =\
             self.event_manager.random_generator.next_arrival(
                 self.arrival_rate)
@@ -55,9 +117,16 @@ class Arrival_Event(Event):
                                          service_rate=self.service_rate)
         #(src_node, dst_node) =\
         #    self.event_manager.random_generator.random_io_nodes()
-        src_node = self.event_issuer
         dst_node = self.event_manager.random_generator.\
             random_exit_node(self.event_issuer)
+        if self.event_manager.trace_recorder is not None:
+            self.event_manager.trace_recorder.record(self.handling_time,
+                                                     self.event_issuer,
+                                                     dst_node, self.duration)
+        self.start_flow(dst_node)
+
+    def start_flow(self, dst_node):
+        src_node = self.event_issuer
 
         assert src_node != dst_node
 
@@ -69,6 +138,7 @@ class Arrival_Event(Event):
             # Generating Flow_allocation_failure_Event
             self.event_manager.add_event(Flow_allocation_failure_Event,
                                          self.event_issuer)
+            return None
         else:
             # Generating End_flow_event
             assert flow is not None
@@ -76,27 +146,89 @@ class Arrival_Event(Event):
                                          self.event_issuer,
                                          delay=self.duration,
                                          flow=flow)
-            self.event_manager.add_event(End_flow_Event,
-                                         self.event_issuer,
-                                         delay=self.duration,
-                                         issuer_flow=flow)
+            self.event_manager.add_event(
+                self.event_manager.end_flow_event_type, self.event_issuer,
+                delay=self.duration, issuer_flow=flow)
+            return flow
+
+
+class Trace_arrival_Event(Arrival_Event):
+    # Arrival read from a trace (see trace.Trace_replay): no random draw,
+    # counted as an Arrival_Event
+    __slots__ = ('destination',)
+
+    def __init__(self, event_manager, event_issuer, delay, destination,
+                 duration, **kwargs):
+        Event.__init__(self, event_manager, event_issuer)
+        self.delay_before_handling = delay
+        self.destination = destination
+        self.duration = duration
+
+    def clear(self):
+        self.event_issuer = None
+        self.destination = None
+
+    def handle_event(self):
+        if self.event_manager.new_arrivals():
+            self.event_manager.trace_replay.schedule_next_arrival()
+        self.start_flow(self.destination)
 
 
 class End_flow_Event(Event):
-    def __init__(self, event_manager, event_issuer, **kwargs):
-        super(self.__class__, self).__init__(event_manager, event_issuer)
-        self.delay_before_handling = kwargs.pop('delay')
-        self.flow = kwargs.pop('issuer_flow')
+    __slots__ = ('flow',)
+    type_code = 1
+
+    def __init__(self, event_manager, event_issuer, delay, issuer_flow,
+                 **kwargs):
+        Event.__init__(self, event_manager, event_issuer)
+        self.delay_before_handling = delay
+        self.flow = issuer_flow
+
+    def clear(self):
+        self.event_issuer = None
+        self.flow = None
 
     def handle_event(self):
         self.event_manager.get_flow_controller().free_flow(self.flow)
 
 
+class Restart_arrival_Event(Arrival_Event):
+    # Arrival of a splitting run (see rare_event): reports the new flow or
+    # the blocking to the trial. Counted as an Arrival_Event
+    __slots__ = ()
+
+    def start_flow(self, dst_node):
+        trial = self.event_manager.rare_event
+        if trial is None:  # Pending after the splitting run
+            return Arrival_Event.start_flow(self, dst_node)
+        flows = self.event_manager.get_flow_controller().flows
+        trial.arrival(self.handling_time, len(flows) == 0)
+        flow = Arrival_Event.start_flow(self, dst_node)
+        if flow is None:
+            trial.blocked()
+        else:
+            trial.add_flow(flow)
+        return flow
+
+
+class Restart_end_flow_Event(End_flow_Event):
+    # Counted as an End_flow_Event
+    __slots__ = ()
+
+    def handle_event(self):
+        End_flow_Event.handle_event(self)
+        if self.event_manager.rare_event is not None:
+            self.event_manager.rare_event.remove_flow(self.flow)
+
+
 class End_of_simulation_Event(Event):
-    def __init__(self, event_manager, event_issuer, **kwargs):
-        super(self.__class__, self).__init__(event_manager, event_issuer)
+    __slots__ = ()
+    type_code = 2
+
+    def __init__(self, event_manager, event_issuer, delay, **kwargs):
+        Event.__init__(self, event_manager, event_issuer)
         #Not always: delay_before_handling = float('-inf')
-        self.delay_before_handling = kwargs.pop('delay')
+        self.delay_before_handling = delay
 
     def handle_event(self):
         self.event_manager.set_EOS()
@@ -104,22 +236,56 @@ class End_of_simulation_Event(Event):
 
 
 class Flow_allocation_success_event(Event):
+    __slots__ = ('flow',)
+    type_code = 3
 
-    def __init__(self, event_manager, event_issuer, **kwargs):
-        super(self.__class__, self).__init__(event_manager, event_issuer)
+    def __init__(self, event_manager, event_issuer, flow, **kwargs):
+        Event.__init__(self, event_manager, event_issuer)
         self.delay_before_handling = float('-inf')  # Immediate handling
-        self.flow = kwargs.pop('flow')
+        self.flow = flow
+
+    def clear(self):
+        self.event_issuer = None
+        self.flow = None
 
     def update_result(self):
-        self.result.update_computed_value('mean_nodes_per_flow',
-                                          self.flow.length(),
-                                          None,
-                                          None,
-                                          event_type=self.__class__)
+        self.event_manager.result.add_sample('mean_nodes_per_flow',
+                                             self.flow.length())
 
 
 class Flow_allocation_failure_Event(Event):
+    __slots__ = ()
+    type_code = 4
 
     def __init__(self, event_manager, event_issuer, **kwargs):
-        super(self.__class__, self).__init__(event_manager, event_issuer)
+        Event.__init__(self, event_manager, event_issuer)
         self.delay_before_handling = float('-inf')  # Immediate handling
+
+
+# Indexed by type_code
+event_types = [Arrival_Event,
+               End_flow_Event,
+               End_of_simulation_Event,
+               Flow_allocation_success_event,
+               Flow_allocation_failure_Event]
+
+
+class Event_pool(object):
+    # Free lists of handled events, recycled by Event_manager.add_event
+    # instead of allocating new objects
+
+    def __init__(self, max_free_events=100000):
+        self.max_free_events = max_free_events
+        self.free_events = dict()
+
+    def acquire(self, Event_type):
+        try:
+            return self.free_events[Event_type].pop()
+        except (KeyError, IndexError):
+            return Event_type.__new__(Event_type)
+
+    def release(self, event):
+        free_events = self.free_events.setdefault(type(event), [])
+        if len(free_events) < self.max_free_events:
+            event.clear()
+            free_events.append(event)
@@ -0,0 +1,190 @@
+from flowsim.event.event import Event_manager
+from flowsim.event.event_types import Arrival_Event, End_flow_Event,\
+    Flow_allocation_success_event, Flow_allocation_failure_Event
+from flowsim.flowsim_exception import NoPathError
+
+arrival_code = Arrival_Event.type_code
+end_flow_code = End_flow_Event.type_code
+success_code = Flow_allocation_success_event.type_code
+failure_code = Flow_allocation_failure_Event.type_code
+
+
+class Fast_event_manager(Event_manager):
+    # Same simulation as Event_manager, but arrivals and ends of flow are
+    # handled inline by process_events: no handle_event /
+    # automated_update_result calls, counters updated in place. The
+    # immediate allocation success/failure event following an arrival is
+    # not created either, its statistics are updated as the next loop
+    # iteration (see pending). Any other event type goes through the
+    # generic handling.
+
+    def process_events(self, until_warm_up=False):
+        if 'handle_next_event' in self.__dict__:
+            # Instrumented (see instrumentation): generic loop
+            return Event_manager.process_events(self, until_warm_up)
+
+        result = self.result
+        simulation = self.simulation
+        event_list = self.event_list
+        pop = event_list.pop
+        push = event_list.push
+        event_pool = self.event_pool
+        random_generator = self.random_generator
+        flow_controller = self.flow_controller
+        allocate_flow = flow_controller.allocate_flow
+        free_flow = flow_controller.free_flow
+        trace_recorder = self.trace_recorder
+        sampler = self.sampler
+        checkpointer = self.checkpointer
+        general_counters = result.counters[0]
+        counters = result.counters
+        node_ids = result.node_ids
+        new_event = object.__new__
+        warm_up_check_interval = self.warm_up_check_interval
+        convergence_check_interval = self.convergence_check_interval
+
+        result.add_to_sum('time_elapsed', 0.)
+        time_sums = result.sums['time_elapsed']
+        # (type code, issuer, flow, sequence) of the allocation outcome
+        # following the last arrival, if not handled yet
+        pending = None
+        event = None
+
+        counter = self.check_counter
+        while not self.EOS and not self.has_converged:
+            if pending is not None:
+                type_code, node, flow, sequence = pending
+                pending = None
+                general_counters[type_code] += 1
+                try:
+                    node_id = node_ids[node]
+                except KeyError:
+                    node_id = result.init_node_data(node)
+                counters[node_id][type_code] += 1
+                if flow is not None:
+                    result.add_sample('mean_nodes_per_flow',
+                                      len(flow.node_list))
+            else:
+                try:
+                    event = pop()
+                except IndexError:
+                    self.EOS = True
+                    event = None
+            if event is not None:
+                handling_time = event.handling_time
+                current_time = self.current_time
+                if handling_time > current_time:
+                    if sampler is not None:
+                        sampler.sample_until(handling_time)
+                    time_sums[0] += handling_time - current_time
+                    self.current_time = current_time = handling_time
+                event_type = type(event)
+                if event_type is Arrival_Event:
+                    node = event.event_issuer
+                    if not simulation.end():
+                        # Next arrival, drawn as in Arrival_Event.__init__
+                        if event_pool is not None:
+                            next_event = event_pool.acquire(Arrival_Event)
+                        else:
+                            next_event = new_event(Arrival_Event)
+                        arrival_rate = event.arrival_rate
+                        service_rate = event.service_rate
+                        next_event.arrival_rate = arrival_rate
+                        next_event.service_rate = service_rate
+                        next_event.event_issuer = node
+                        next_event.event_manager = self
+                        delay = random_generator.next_arrival(arrival_rate)
+                        next_event.delay_before_handling = delay
+                        next_event.duration =\
+                            random_generator.rand_duration(service_rate)
+                        next_event.handling_time = current_time + delay
+                        next_event.sequence = self.sequence
+                        self.sequence += 1
+                        push(next_event)
+                    destination = random_generator.random_exit_node(node)
+                    duration = event.duration
+                    if trace_recorder is not None:
+                        trace_recorder.record(handling_time, node,
+                                              destination, duration)
+                    try:
+                        flow = allocate_flow(node, destination)
+                    except NoPathError:
+                        pending = (failure_code, node, None, self.sequence)
+                        self.sequence += 1
+                    else:
+                        pending = (success_code, node, flow, self.sequence)
+                        if event_pool is not None:
+                            end_event = event_pool.acquire(End_flow_Event)
+                        else:
+                            end_event = new_event(End_flow_Event)
+                        end_event.flow = flow
+                        end_event.event_issuer = node
+                        end_event.event_manager = self
+                        end_event.duration = 0
+                        end_event.delay_before_handling = duration
+                        end_event.handling_time = current_time + duration
+                        end_event.sequence = self.sequence + 1
+                        self.sequence += 2
+                        push(end_event)
+                    general_counters[arrival_code] += 1
+                    try:
+                        node_id = node_ids[node]
+                    except KeyError:
+                        node_id = result.init_node_data(node)
+                    counters[node_id][arrival_code] += 1
+                elif event_type is End_flow_Event:
+                    free_flow(event.flow)
+                    node = event.event_issuer
+                    general_counters[end_flow_code] += 1
+                    try:
+                        node_id = node_ids[node]
+                    except KeyError:
+                        node_id = result.init_node_data(node)
+                    counters[node_id][end_flow_code] += 1
+                else:
+                    event.handle_event()
+                    event.automated_update_result()
+                if event_pool is not None:
+                    event_pool.release(event)
+                event = None
+
+            if result.warm_up is not None:
+                if counter % warm_up_check_interval == 0 and\
+                        result.update_warm_up():
+                    result.add_to_sum('warm_up_time', self.current_time)
+                    counter = 0
+                    if until_warm_up:
+                        self.check_counter = counter + 1
+                        self.schedule_pending(pending)
+                        return
+                    # Cleared with the statistics, time_elapsed is updated
+                    # by every event
+                    result.add_to_sum('time_elapsed', 0.)
+            elif counter == convergence_check_interval:
+                self.has_converged = result.has_converged()
+                counter = 0
+            counter = counter + 1
+            if checkpointer is not None and checkpointer.is_due():
+                self.check_counter = counter
+                self.schedule_pending(pending)
+                pending = None
+                checkpointer.save()
+        self.check_counter = counter
+        self.schedule_pending(pending)
+        if self.trace_recorder is not None:
+            self.trace_recorder.flush()
+        self.process_results()
+
+    def schedule_pending(self, pending):
+        # Creates the allocation outcome event not handled yet, as the
+        # generic Arrival_Event would have done
+        if pending is None:
+            return
+        type_code, node, flow, sequence = pending
+        if flow is not None:
+            event = Flow_allocation_success_event(self, node, flow=flow)
+        else:
+            event = Flow_allocation_failure_Event(self, node)
+        event.handling_time = float('-inf')
+        event.sequence = sequence
+        self.event_list.push(event)
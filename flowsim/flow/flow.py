@@ -1,7 +1,16 @@
 class Flow(object):
 
-    def __init__(self, node_list):
+    def __init__(self, node_list, edges=None):
         self.node_list = node_list
+        self.edges = edges  # Compact_graph edge ids
+
+    def __reduce__(self):
+        # Checkpoints: a constructor call is much cheaper to pickle than
+        # the default __dict__ state
+        return self.__class__, (self.node_list, self.edges)
+
+    def get_edges(self):
+        return self.edges
 
     def get_nodes(self):
         return self.node_list
@@ -1,7 +1,7 @@
 import flow as flow_module
 from flowsim.flowsim_exception import NoPathError,\
     NotRegisteredFlow,\
-    RessourceAllocationError
+    EdgeAllocationError
 
 
 class Flow_controller(object):
@@ -9,12 +9,15 @@ class Flow_controller(object):
         self.event_manager = event_manager
         self.simulation = simulation
         self.topology = topology
+        self.compact_graph = topology.compact_graph
 
-        self.flows = []
+        self.flows = set()
 
     def allocate_flow(self, node1, node2):
         if node1 is None or node2 is None:
             raise TypeError
+        if self.compact_graph is not None:
+            return self.allocate_compact_flow(node1, node2)
         try:
             nodes = self.topology.shortest_path(node1, node2)
         except NoPathError:
@@ -24,28 +27,41 @@ class Flow_controller(object):
         flow = flow_module.Flow(nodes)
 
         try:
-            for edge in edges:
+            for i, edge in enumerate(edges):
                 ret = edge.allocate_flow(flow)
                 if ret == edge.get_const_value('LAST_FLOW_AVAILABLE'):
-                    # TODO useless we already know i
-                    i = edges.index(edge)
                     self.topology.set_edge_unavailable(nodes[i], nodes[i+1])
 
         # If we except the node should be unavailable and
         # we need to free the first allocations of the flow
-        except RessourceAllocationError:
-            self.topology.set_edge_unavailable(node[i], node[i+1])
-            for edge in edges[:i-1]:
-                edge.free_flow()
+        except EdgeAllocationError:
+            self.topology.set_edge_unavailable(nodes[i], nodes[i+1])
+            for j in xrange(i):
+                self.topology.free_edge(nodes[j], nodes[j+1], flow)
+            raise NoPathError()
         else:
-            self.flows.append(flow)
+            self.flows.add(flow)
             return flow
 
+    def allocate_compact_flow(self, node1, node2):
+        graph = self.compact_graph
+        source = graph.node_ids[node1]
+        edges = graph.route(source, graph.node_ids[node2])
+        if edges is None:
+            raise NoPathError()
+        graph.allocate(edges)
+        flow = flow_module.Flow(graph.path_nodes(source, edges), edges)
+        self.flows.add(flow)
+        return flow
+
     def free_flow(self, flow):
         try:
             self.flows.remove(flow)
         except:
             raise NotRegisteredFlow()
+        if self.compact_graph is not None:
+            self.compact_graph.free(flow.get_edges())
+            return
         nodes = flow.get_nodes()
         for i in xrange(len(nodes) - 1):
             self.topology.free_edge(nodes[i], nodes[i + 1], flow)
@@ -28,3 +28,27 @@ class LoopError(Exception):
 
 class EdgeAllocationError(Exception):
     pass
+
+
+class NoSuchEventQueue(Exception):
+    pass
+
+
+class NoSuchEngine(Exception):
+    pass
+
+
+class InvalidPathTable(Exception):
+    pass
+
+
+class InvalidCheckpoint(Exception):
+    pass
+
+
+class InvalidTopologyFile(Exception):
+    pass
+
+
+class InvalidTrace(Exception):
+    pass
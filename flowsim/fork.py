@@ -0,0 +1,60 @@
+import multiprocessing
+
+# Warmed-up simulation and variants inherited by the forked workers
+fork_simulation = None
+fork_variants = None
+
+
+def run_variant(task):
+    index, max_arrivals = task
+    # Run in a fresh process forked from the parent: fork_simulation is a
+    # copy-on-write view of its state, it does not need to be copied. Its
+    # trace and checkpoint files are the parent's (see Simulation.fork)
+    fork_simulation.event_manager.trace_recorder = None
+    fork_simulation.event_manager.checkpointer = None
+    return run_fork(fork_simulation, fork_variants[index], max_arrivals)
+
+
+def run_fork(simulation, variant, max_arrivals):
+    # Results only cover the events handled after the fork
+    simulation.result.reset_statistics()
+    if max_arrivals is not None:
+        simulation.max_arrivals = max_arrivals
+    if variant is not None:
+        variant(simulation)
+    return simulation.resume_simulation()
+
+
+class Fork_runner(object):
+    # What-if runs from a common warmed-up state: every variant continues
+    # the same pending events, flows and random streams (common random
+    # numbers), so differences between variants are mostly due to the
+    # variants themselves.
+
+    def __init__(self, simulation, processes=None):
+        # simulation: initialized, see Simulation.warm_up_simulation
+        self.simulation = simulation
+        self.processes = processes if processes is not None else\
+            multiprocessing.cpu_count()
+
+    def run(self, variants, max_arrivals=None):
+        # variants: functions modifying the forked simulation (capacities,
+        # routing...), None keeps the simulation as it is.
+        # max_arrivals: arrivals of each fork, None: remaining ones
+        global fork_simulation, fork_variants
+        if self.processes <= 1:
+            return [run_fork(self.simulation.fork(), variant, max_arrivals)
+                    for variant in variants]
+        fork_simulation = self.simulation
+        fork_variants = variants
+        # One process per variant, forked from this one
+        pool = multiprocessing.Pool(min(self.processes, len(variants)),
+                                    maxtasksperchild=1)
+        try:
+            return pool.map(run_variant, [(index, max_arrivals)
+                                          for index in xrange(len(variants))],
+                            chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+            fork_simulation = fork_variants = None
@@ -0,0 +1,215 @@
+import json
+from timeit import default_timer as clock
+
+# Methods timed by Instrumentation: component (see get_component), method
+# name, subsystem. Event_list.pop and Event_manager.handle_next_event get
+# their own wrappers
+probes = [('event_list', 'push', 'queue'),
+          ('topology', 'shortest_path', 'routing'),
+          ('compact_graph', 'route', 'routing'),
+          ('flow_controller', 'allocate_flow', 'allocation'),
+          ('flow_controller', 'free_flow', 'free'),
+          ('result', 'count_event', 'statistics'),
+          ('result', 'add_sample', 'statistics'),
+          ('result', 'add_to_sum', 'statistics'),
+          ('result', 'update_computed_value', 'statistics'),
+          ('result', 'update_warm_up', 'statistics'),
+          ('result', 'has_converged', 'statistics'),
+          ('random_generator', 'next_arrival', 'random'),
+          ('random_generator', 'rand_duration', 'random'),
+          ('random_generator', 'random_exit_node', 'random')]
+
+
+class Instrumentation(object):
+    # Opt-in timing of the hot paths: the probed methods are replaced by
+    # timing wrappers on the component instances themselves, nothing is
+    # left behind (and nothing costs) once detached. Subsystem times are
+    # exclusive: routing done during an allocation is counted as routing
+    # only. Queue length and active flows are sampled every
+    # gauge_interval of simulated time.
+
+    def __init__(self, timeline=False, gauge_interval=1.,
+                 max_timeline_events=1000000):
+        self.gauge_interval = gauge_interval
+        self.max_timeline_events = max_timeline_events
+        self.timeline = [] if timeline else None
+        self.clear()
+        self.nested = 0.  # Time of the probes called by the current one
+        self.event_type = None  # Of the last popped event
+        self.attached = []  # (owner, name, previous instance attribute)
+        self.simulation = None
+
+    def clear(self):
+        # Drops everything measured so far, e.g. when the simulation is
+        # reset
+        self.times = dict()  # subsystem -> exclusive wall-clock seconds
+        self.calls = dict()
+        self.event_times = dict()  # Event type -> handling seconds
+        self.event_counts = dict()
+        # (simulated time, pending events, active flows)
+        self.gauges = []
+        self.next_gauge_time = 0.
+        # Chrome trace: (name, subsystem, start, duration) in seconds
+        if self.timeline is not None:
+            self.timeline = []
+        self.dropped_timeline_events = 0
+        self.origin = clock()
+
+    def __getstate__(self):
+        # Pickled detached (see checkpoint), the clock origin is restarted
+        state = self.__dict__.copy()
+        state['attached'] = []
+        state['simulation'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.origin = clock()
+
+    def attach(self, simulation):
+        # After init_simulation
+        self.detach()
+        self.simulation = simulation
+        event_manager = simulation.event_manager
+        for component, name, subsystem in probes:
+            owner = self.get_component(component)
+            if owner is not None:
+                self.wrap(owner, name, self.timed(subsystem, name,
+                                                  getattr(owner, name)))
+        self.wrap(event_manager.event_list, 'pop',
+                  self.popping(event_manager.event_list.pop))
+        self.wrap(event_manager, 'handle_next_event',
+                  self.dispatching(event_manager.handle_next_event))
+        self.wrap(simulation.result, 'get_results',
+                  self.summarizing(simulation.result.get_results))
+
+    def detach(self):
+        for owner, name, previous in reversed(self.attached):
+            if previous is None:
+                delattr(owner, name)
+            else:
+                setattr(owner, name, previous)
+        self.attached = []
+        self.simulation = None
+
+    def get_component(self, component):
+        if component == 'event_list':
+            return self.simulation.event_manager.event_list
+        if component == 'compact_graph':
+            return self.simulation.topology.compact_graph
+        return getattr(self.simulation, component)
+
+    def wrap(self, owner, name, wrapper):
+        self.attached.append((owner, name, owner.__dict__.get(name)))
+        setattr(owner, name, wrapper)
+
+    def add_time(self, name, subsystem, start, elapsed):
+        self.times[subsystem] = self.times.get(subsystem, 0.) +\
+            elapsed - self.nested
+        self.calls[subsystem] = self.calls.get(subsystem, 0) + 1
+        if self.timeline is not None:
+            if len(self.timeline) < self.max_timeline_events:
+                self.timeline.append((name, subsystem, start - self.origin,
+                                      elapsed))
+            else:
+                self.dropped_timeline_events += 1
+
+    def timed(self, subsystem, name, method):
+        def timed_method(*args, **kwargs):
+            outer = self.nested
+            self.nested = 0.
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                self.add_time(name, subsystem, start, elapsed)
+                self.nested = outer + elapsed
+        return timed_method
+
+    def popping(self, pop):
+        timed_pop = self.timed('queue', 'pop', pop)
+        event_list = self.simulation.event_manager.event_list
+        flows = self.simulation.flow_controller.flows
+
+        def popping_method():
+            event = timed_pop()
+            self.event_type = type(event)
+            # Gauges are taken before the clock moves to the popped event,
+            # which is still pending. Not counted as dispatch time
+            if event.handling_time > self.next_gauge_time:
+                start = clock()
+                state = (len(event_list) + 1, len(flows))
+                while self.next_gauge_time < event.handling_time:
+                    self.gauges.append((self.next_gauge_time,) + state)
+                    self.next_gauge_time += self.gauge_interval
+                self.nested += clock() - start
+            return event
+        return popping_method
+
+    def dispatching(self, handle_next_event):
+        def dispatching_method():
+            self.event_type = None
+            self.nested = 0.
+            start = clock()
+            handle_next_event()
+            elapsed = clock() - start
+            event_type = self.event_type
+            if event_type is None:  # Empty queue
+                return
+            name = event_type.__name__
+            self.event_times[name] = self.event_times.get(name, 0.) + elapsed
+            self.event_counts[name] = self.event_counts.get(name, 0) + 1
+            self.add_time(name, 'dispatch', start, elapsed)
+            self.nested = 0.
+        return dispatching_method
+
+    def summarizing(self, get_results):
+        def summarizing_method():
+            results = get_results()
+            results.update(self.get_summary())
+            return results
+        return summarizing_method
+
+    def get_summary(self):
+        # Flat, numeric: merged by replication like any other result
+        summary = dict()
+        for subsystem, seconds in self.times.iteritems():
+            summary['wall_time_' + subsystem] = seconds
+            summary['calls_' + subsystem] = self.calls[subsystem]
+        for name, seconds in self.event_times.iteritems():
+            summary['wall_time_' + name] = seconds
+            summary['mean_wall_time_' + name] =\
+                seconds / self.event_counts[name]
+        if len(self.gauges) > 0:
+            for index, key in [(1, 'pending_events'), (2, 'active_flows')]:
+                values = [gauge[index] for gauge in self.gauges]
+                summary[key + '_mean'] = float(sum(values)) / len(values)
+                summary[key + '_max'] = max(values)
+        return summary
+
+    def get_trace_events(self):
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': 1,
+                   'args': {'name': 'flowsim'}}]
+        for name, subsystem, start, elapsed in self.timeline or []:
+            events.append({'name': name, 'cat': subsystem, 'ph': 'X',
+                           'ts': start * 1e6, 'dur': elapsed * 1e6,
+                           'pid': 1, 'tid': 1})
+        # Gauges over simulated time, one counter track per gauge
+        for time, pending_events, active_flows in self.gauges:
+            events.append({'name': 'gauges', 'ph': 'C', 'ts': time * 1e6,
+                           'pid': 2, 'args': {
+                               'pending_events': pending_events,
+                               'active_flows': active_flows}})
+        return events
+
+    def export_timeline(self, filename):
+        # Chrome trace event format (chrome://tracing, Perfetto): process 1
+        # is the wall-clock timeline (timeline=True), process 2 the gauges
+        # with simulated time units shown as seconds
+        with open(filename, 'w') as timeline_file:
+            json.dump({'traceEvents': self.get_trace_events(),
+                       'displayTimeUnit': 'ms',
+                       'otherData': {'dropped_events':
+                                     self.dropped_timeline_events}},
+                      timeline_file)
@@ -0,0 +1,225 @@
+import heapq
+from array import array
+from flowsim.flowsim_exception import NoSuchEdge, EdgeAllocationError
+
+
+class Compact_graph(object):
+    # Frozen CSR view of a Topology: node i has its outgoing edges at
+    # positions indptr[i]:indptr[i + 1] of the edge arrays. Edge ids are
+    # these positions. Routing and capacity accounting only touch the
+    # arrays, the networkx graph is kept for construction and drawing.
+
+    def __init__(self, topology):
+        self.nodes = topology.nodes()
+        self.node_ids = dict((node, i) for i, node in enumerate(self.nodes))
+        self.edge_objects = []
+
+        self.indptr = array('l', [0])
+        self.indices = array('l')
+        self.weights = array('d')
+        self.capacities = array('l')
+        for node in self.nodes:
+            neighbors = sorted((self.node_ids[neighbor], data) for
+                               neighbor, data in topology[node].iteritems())
+            for neighbor, data in neighbors:
+                self.indices.append(neighbor)
+                weight = data['weight']
+                if weight == topology.infinity:
+                    weight = data['edge_former_weight']
+                self.weights.append(weight)
+                self.capacities.append(data['object'].max_flows)
+                self.edge_objects.append(data['object'])
+            self.indptr.append(len(self.indices))
+        self.available = array('l', self.capacities)
+
+        # Reverse CSR for the backward search
+        incoming = [[] for node in self.nodes]
+        for node in xrange(len(self.nodes)):
+            for edge in xrange(self.indptr[node], self.indptr[node + 1]):
+                incoming[self.indices[edge]].append(edge)
+        self.rev_indptr = array('l', [0])
+        self.rev_edges = array('l')
+        for edges in incoming:
+            self.rev_edges.extend(edges)
+            self.rev_indptr.append(len(self.rev_edges))
+        self.sources = array('l', [0]) * len(self.indices)
+        for node in xrange(len(self.nodes)):
+            for edge in xrange(self.indptr[node], self.indptr[node + 1]):
+                self.sources[edge] = node
+
+        self.unit_weights = len(set(self.weights)) <= 1
+        self.path_table = None
+
+    def number_of_edges(self):
+        return len(self.indices)
+
+    def edge_id(self, node1, node2):
+        node1 = self.node_ids[node1]
+        node2 = self.node_ids[node2]
+        for edge in xrange(self.indptr[node1], self.indptr[node1 + 1]):
+            if self.indices[edge] == node2:
+                return edge
+        raise NoSuchEdge()
+
+    def edge_path(self, node_path):
+        return [self.edge_id(node_path[i], node_path[i + 1])
+                for i in xrange(len(node_path) - 1)]
+
+    def path_nodes(self, source, edges):
+        nodes = self.nodes
+        indices = self.indices
+        return [nodes[source]] + [nodes[indices[edge]] for edge in edges]
+
+    def set_path_table(self, path_table):
+        # Topology path table converted to edge ids
+        self.path_table = dict()
+        for (node1, node2), candidates in path_table.iteritems():
+            self.path_table[(self.node_ids[node1], self.node_ids[node2])] =\
+                [self.edge_path(path) for path, _ in candidates]
+
+    def route(self, source, target):
+        # List of edge ids of an available shortest path, None if none
+        if self.path_table is not None and\
+                (source, target) in self.path_table:
+            available = self.available
+            for edges in self.path_table[(source, target)]:
+                for edge in edges:
+                    if available[edge] == 0:
+                        break
+                else:
+                    return edges
+            return None
+        if source == target:
+            return []
+        if self.unit_weights:
+            return self.bidirectional_bfs(source, target)
+        return self.bidirectional_dijkstra(source, target)
+
+    def bidirectional_bfs(self, source, target):
+        indptr, indices, available = self.indptr, self.indices, self.available
+        rev_indptr, rev_edges = self.rev_indptr, self.rev_edges
+        sources = self.sources
+        # node -> edge used to reach it (-1 for the search roots)
+        forward = {source: -1}
+        backward = {target: -1}
+        forward_level = [source]
+        backward_level = [target]
+        while forward_level and backward_level:
+            meeting = None
+            if len(forward_level) <= len(backward_level):
+                next_level = []
+                for node in forward_level:
+                    for edge in xrange(indptr[node], indptr[node + 1]):
+                        if available[edge] == 0:
+                            continue
+                        neighbor = indices[edge]
+                        if neighbor not in forward:
+                            forward[neighbor] = edge
+                            next_level.append(neighbor)
+                            if meeting is None and neighbor in backward:
+                                meeting = neighbor
+                    if meeting is not None:
+                        break
+                forward_level = next_level
+            else:
+                next_level = []
+                for node in backward_level:
+                    for i in xrange(rev_indptr[node], rev_indptr[node + 1]):
+                        edge = rev_edges[i]
+                        if available[edge] == 0:
+                            continue
+                        neighbor = sources[edge]
+                        if neighbor not in backward:
+                            backward[neighbor] = edge
+                            next_level.append(neighbor)
+                            if meeting is None and neighbor in forward:
+                                meeting = neighbor
+                    if meeting is not None:
+                        break
+                backward_level = next_level
+            if meeting is not None:
+                # Every node of the expanded level is at the same depth and
+                # backward depths never exceed the current one: the first
+                # meeting is on a shortest path
+                return self.join(forward, backward, meeting)
+        return None
+
+    def bidirectional_dijkstra(self, source, target):
+        indptr, indices, available = self.indptr, self.indices, self.available
+        rev_indptr, rev_edges = self.rev_indptr, self.rev_edges
+        sources, weights = self.sources, self.weights
+        dists = [{source: 0.}, {target: 0.}]
+        preds = [{source: -1}, {target: -1}]
+        done = [set(), set()]
+        heaps = [[(0., source)], [(0., target)]]
+        best = float('inf')
+        meeting = None
+        while heaps[0] and heaps[1]:
+            if heaps[0][0][0] + heaps[1][0][0] >= best:
+                break
+            side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+            dist, node = heapq.heappop(heaps[side])
+            if node in done[side]:
+                continue
+            done[side].add(node)
+            side_dists = dists[side]
+            other_dists = dists[1 - side]
+            if side == 0:
+                edges = xrange(indptr[node], indptr[node + 1])
+            else:
+                edges = (rev_edges[i] for i in
+                         xrange(rev_indptr[node], rev_indptr[node + 1]))
+            for edge in edges:
+                if available[edge] == 0:
+                    continue
+                neighbor = indices[edge] if side == 0 else sources[edge]
+                new_dist = dist + weights[edge]
+                if neighbor not in side_dists or\
+                        new_dist < side_dists[neighbor]:
+                    side_dists[neighbor] = new_dist
+                    preds[side][neighbor] = edge
+                    heapq.heappush(heaps[side], (new_dist, neighbor))
+                    if neighbor in other_dists and\
+                            new_dist + other_dists[neighbor] < best:
+                        best = new_dist + other_dists[neighbor]
+                        meeting = neighbor
+        if meeting is None:
+            return None
+        return self.join(preds[0], preds[1], meeting)
+
+    def join(self, forward, backward, meeting):
+        indices, sources = self.indices, self.sources
+        edges = []
+        node = meeting
+        while forward[node] != -1:
+            edges.append(forward[node])
+            node = sources[forward[node]]
+        edges.reverse()
+        node = meeting
+        while backward[node] != -1:
+            edges.append(backward[node])
+            node = indices[backward[node]]
+        return edges
+
+    def allocate(self, edges):
+        available = self.available
+        for edge in edges:
+            if available[edge] == 0:
+                raise EdgeAllocationError()
+            available[edge] -= 1
+
+    def free(self, edges):
+        available = self.available
+        capacities = self.capacities
+        for edge in edges:
+            if available[edge] == capacities[edge]:
+                raise EdgeAllocationError()
+            available[edge] += 1
+
+    def sync_edges(self):
+        # Copies the counters back to the Edge objects (drawing, debug)
+        for edge, edge_object in enumerate(self.edge_objects):
+            edge_object.available_flows = self.available[edge]
+
+    def reset(self):
+        self.available = array('l', self.capacities)
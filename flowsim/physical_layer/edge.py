@@ -4,10 +4,11 @@ from flowsim.flowsim_exception import EdgeAllocationError
 class Edge(object):
     constants = {'LAST_FLOW_AVAILABLE': -1}
 
-    def __init__(self, capacity=1, name=''):
+    def __init__(self, capacity=1, name='', track_flows=True):
         self.max_flows = capacity
         self.available_flows = self.max_flows
-        self.passing_flows = []
+        # None when only the capacity counter is kept
+        self.passing_flows = set() if track_flows else None
         self.name = name if name != '' else str(id(self))
 
     def allocate_flow(self, flow):
@@ -19,18 +20,29 @@ class Edge(object):
             ret_value = Edge.constants['LAST_FLOW_AVAILABLE']
 
         self.available_flows -= 1
-        self.passing_flows.append(flow)
+        if self.passing_flows is not None:
+            self.passing_flows.add(flow)
         return ret_value
 
     def free_flow(self, flow):
         if not (self.available_flows < self.max_flows):
             raise EdgeAllocationError()
-        try:
-            self.passing_flows.remove(flow)
-        except ValueError:
-            raise EdgeAllocationError()
+        if self.passing_flows is not None:
+            try:
+                self.passing_flows.remove(flow)
+            except KeyError:
+                raise EdgeAllocationError()
         self.available_flows += 1
 
+    def set_flow_tracking(self, track_flows):
+        if not track_flows:
+            self.passing_flows = None
+        elif self.passing_flows is None:
+            if self.available_flows != self.max_flows:
+                # Passing flows are unknown
+                raise EdgeAllocationError()
+            self.passing_flows = set()
+
     def get_const_value(self, key):
         return Edge.constants[key]
 
@@ -38,5 +50,6 @@ class Edge(object):
         return self.name
 
     def reset(self):
-        self.passing_flows = []
+        if self.passing_flows is not None:
+            self.passing_flows = set()
         self.available_flows = self.max_flows
@@ -0,0 +1,182 @@
+import numpy
+from topology import Topology
+from topology_file import node_flags
+
+# Topology generators working on NumPy edge arrays. Each generator
+# returns the arrays of topology_file (numbers, flags, sources, targets,
+# capacities, weights, names), every undirected edge being given both
+# ways. Use build_topology to get a Topology, or
+# topology_file.save_topology_arrays(filename, **arrays) to save them.
+
+
+def topology_arrays(number_of_nodes, sources, targets, capacity=1,
+                    weight=1, flags=None):
+    # sources, targets: one entry per undirected edge
+    sources = numpy.asarray(sources, dtype=numpy.int64)
+    targets = numpy.asarray(targets, dtype=numpy.int64)
+    if flags is None:
+        flags = numpy.zeros(number_of_nodes, dtype=numpy.int8)
+    edges = 2 * len(sources)
+    return {'numbers': numpy.arange(number_of_nodes, dtype=numpy.int64),
+            'flags': numpy.asarray(flags, dtype=numpy.int8),
+            'sources': numpy.concatenate((sources, targets)),
+            'targets': numpy.concatenate((targets, sources)),
+            'capacities': numpy.resize(numpy.asarray(capacity,
+                                                     dtype=numpy.int64),
+                                       edges),
+            'weights': numpy.resize(numpy.asarray(weight,
+                                                  dtype=numpy.float64),
+                                    edges),
+            'names': None}
+
+
+def build_topology(arrays, arrival_rate=None, service_rate=None):
+    topology = Topology()
+    topology.build_topology_from_arrays(arrival_rate=arrival_rate,
+                                        service_rate=service_rate, **arrays)
+    return topology
+
+
+def unique_edges(sources, targets):
+    # Without self loops and duplicates, whatever their direction
+    low = numpy.minimum(sources, targets)
+    high = numpy.maximum(sources, targets)
+    keep = low != high
+    number_of_nodes = high.max() + 1 if len(high) > 0 else 0
+    keys = numpy.unique(low[keep] * number_of_nodes + high[keep])
+    return keys // number_of_nodes, keys % number_of_nodes
+
+
+def grid_edges(dimensions, wrap):
+    # Node i has coordinates numpy.unravel_index(i, dimensions)
+    grid = numpy.arange(numpy.prod(dimensions),
+                        dtype=numpy.int64).reshape(dimensions)
+    sources = []
+    targets = []
+    for axis, size in enumerate(dimensions):
+        if wrap and size > 2:
+            neighbours = numpy.roll(grid, -1, axis)
+            sources.append(grid.ravel())
+            targets.append(neighbours.ravel())
+        elif size > 1:
+            # Without wrap-around (for 2 nodes, it would duplicate edges)
+            index = [slice(None)] * len(dimensions)
+            index[axis] = slice(None, -1)
+            sources.append(grid[tuple(index)].ravel())
+            index[axis] = slice(1, None)
+            targets.append(grid[tuple(index)].ravel())
+    if len(sources) == 0:
+        return numpy.zeros(0, numpy.int64), numpy.zeros(0, numpy.int64)
+    return numpy.concatenate(sources), numpy.concatenate(targets)
+
+
+def torus(*dimensions, **options):
+    # Any number of dimensions: torus(x, y) or torus(x, y, z).
+    # torus(z, x, y) has the same numbering as topology.torus3D(x, y, z)
+    # options: capacity, weight
+    sources, targets = grid_edges(dimensions, True)
+    return topology_arrays(int(numpy.prod(dimensions)), sources, targets,
+                           **options)
+
+
+def mesh(*dimensions, **options):
+    sources, targets = grid_edges(dimensions, False)
+    return topology_arrays(int(numpy.prod(dimensions)), sources, targets,
+                           **options)
+
+
+def hypercube(dimension, **options):
+    nodes = numpy.arange(2 ** dimension, dtype=numpy.int64)
+    sources = []
+    targets = []
+    for bit in xrange(dimension):
+        low = nodes[(nodes >> bit) & 1 == 0]
+        sources.append(low)
+        targets.append(low | (1 << bit))
+    if dimension == 0:
+        return topology_arrays(1, [], [], **options)
+    return topology_arrays(len(nodes), numpy.concatenate(sources),
+                           numpy.concatenate(targets), **options)
+
+
+def fat_tree(k, **options):
+    # k-ary fat-tree (Al-Fares et al., SIGCOMM 2008): (k / 2) ** 2 core
+    # switches, then per pod k / 2 aggregation and k / 2 edge switches,
+    # then k / 2 hosts per edge switch. Nodes are numbered in that order
+    # and the hosts are the only entry and exit nodes
+    if k < 2 or k % 2 != 0:
+        raise ValueError(k)
+    half = k // 2
+    cores = half * half
+    aggregations = cores + numpy.arange(k * half).reshape(k, half)
+    edge_switches = cores + k * half + numpy.arange(k * half).reshape(k, half)
+    hosts = cores + 2 * k * half +\
+        numpy.arange(k * half * half).reshape(k, half, half)
+    # Aggregation switch i of each pod is linked to cores i * half ...
+    # (i + 1) * half - 1
+    core_sources = numpy.repeat(aggregations.ravel(), half)
+    core_targets = (numpy.arange(half).repeat(half) * half +
+                    numpy.tile(numpy.arange(half), half))
+    core_targets = numpy.tile(core_targets, k)
+    # Full bipartite graph between aggregation and edge switches of a pod
+    pod_sources = numpy.repeat(aggregations, half, axis=1).ravel()
+    pod_targets = numpy.tile(edge_switches, half).ravel()
+    host_sources = numpy.repeat(edge_switches.ravel(), half)
+    host_targets = hosts.ravel()
+    number_of_nodes = int(hosts.max()) + 1
+    flags = numpy.zeros(number_of_nodes, dtype=numpy.int8)
+    flags[host_targets] = node_flags['entry'] | node_flags['exit']
+    return topology_arrays(number_of_nodes,
+                           numpy.concatenate((core_sources, pod_sources,
+                                              host_sources)),
+                           numpy.concatenate((core_targets, pod_targets,
+                                              host_targets)),
+                           flags=flags, **options)
+
+
+def erdos_renyi(number_of_nodes, probability, seed=None, **options):
+    # G(n, p) drawn as G(n, m) with m ~ Binomial(n (n - 1) / 2, p): pairs
+    # are drawn in blocks until m distinct edges are found
+    rand = numpy.random.RandomState(seed)
+    pairs = number_of_nodes * (number_of_nodes - 1) // 2
+    edges = rand.binomial(pairs, probability) if pairs > 0 else 0
+    sources = numpy.zeros(0, numpy.int64)
+    targets = numpy.zeros(0, numpy.int64)
+    while len(sources) < edges:
+        missing = edges - len(sources)
+        block = int(missing * 1.1) + 16
+        sources, targets = unique_edges(
+            numpy.concatenate((sources,
+                               rand.randint(0, number_of_nodes, block))),
+            numpy.concatenate((targets,
+                               rand.randint(0, number_of_nodes, block))))
+    if len(sources) > edges:
+        keep = numpy.sort(rand.permutation(len(sources))[:edges])
+        sources, targets = sources[keep], targets[keep]
+    return topology_arrays(number_of_nodes, sources, targets, **options)
+
+
+def barabasi_albert(number_of_nodes, m, seed=None, **options):
+    # Preferential attachment, V. Batagelj, U. Brandes, "Efficient
+    # generation of large random networks", 2005: edge e = v * m + i of
+    # node v goes to the node found at a uniform position r of the edge
+    # endpoint list [source(0), target(0), source(1), ...] written so far.
+    # Sources are known in advance, the targets referring to previous
+    # targets are resolved by pointer jumping instead of sequentially.
+    # Self loops and multiple edges are removed.
+    rand = numpy.random.RandomState(seed)
+    edges = number_of_nodes * m
+    sources = numpy.arange(edges, dtype=numpy.int64) // m
+    positions = (rand.random_sample(edges) *
+                 (2 * numpy.arange(edges) + 1)).astype(numpy.int64)
+    targets = numpy.where(positions % 2 == 0, positions // 2 // m, -1)
+    pointers = numpy.where(positions % 2 == 1, positions // 2, -1)
+    unresolved = numpy.flatnonzero(targets < 0)
+    while len(unresolved) > 0:
+        referred = pointers[unresolved]
+        resolved = targets[referred] >= 0
+        targets[unresolved[resolved]] = targets[referred[resolved]]
+        pointers[unresolved[~resolved]] = pointers[referred[~resolved]]
+        unresolved = unresolved[~resolved]
+    sources, targets = unique_edges(sources, targets)
+    return topology_arrays(number_of_nodes, sources, targets, **options)
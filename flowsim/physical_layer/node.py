@@ -12,6 +12,11 @@ class Node(object):
     def __int__(self):
         return self.number
 
+    def __hash__(self):
+        # Deterministic graph iteration order (and therefore routing and
+        # random node picks) across processes, unlike the default id()
+        return self.number
+
     def get_name(self):
         return self.name
 
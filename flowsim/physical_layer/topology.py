@@ -1,20 +1,48 @@
 import networkx
 import sys
+import hashlib
+import itertools
+import cPickle
 from edge import Edge
 from node import Node, Entry_node, Exit_node
+from compact_graph import Compact_graph
+import topology_file
 from flowsim.flowsim_exception import NoSuchEdge,\
     DuplicatedNodeError,\
-    NoPathError
+    NoPathError,\
+    InvalidPathTable,\
+    EdgeAllocationError
+from flowsim.utilities import gc_disabled
 
 
 class Topology(networkx.DiGraph):
 
-    def __init__(self):
+    def __init__(self, route_cache=True):
         super(self.__class__, self).__init__()
         self.entry_nodes = []
         self.exit_nodes = []
         self.infinity = float('inf')
 
+        # (node1, node2) -> path, None if there is no available path
+        self.route_cache = dict()
+        self.route_cache_enabled = route_cache
+        # (node1, node2) edge -> set of cached routes using it
+        self.edge_routes = dict()
+        # Routes computed while some edges were unavailable: they may
+        # not be the shortest anymore once an edge is freed
+        self.constrained_routes = set()
+        self.unavailable_edges = 0
+        self.route_cache_hits = 0
+        self.route_cache_misses = 0
+
+        # Precomputed candidate routes (see precompute_paths):
+        # (node1, node2) -> list of (path, edge data dicts)
+        self.path_table = None
+        self.path_table_k = None
+
+        # Array-backed routing and capacity accounting, see freeze()
+        self.compact_graph = None
+
     def add_node(self, node):
         super(self.__class__, self).add_node(node)
 
@@ -27,13 +55,22 @@ class Topology(networkx.DiGraph):
 
     def add_edges(self, edge_list, edge_weight=1):
         # Each edge (node1, node2, {'object': object})
+        for edge in edge_list:
+            if self.has_edge(edge[0], edge[1]) and\
+                    self[edge[0]][edge[1]]['weight'] == self.infinity:
+                self.unavailable_edges -= 1
         self.add_edges_from(edge_list, weight=edge_weight)
+        self.clear_route_cache()
+        self.compact_graph = None
 
     def set_edge_unavailable(self, node1, node2):
         try:
-            self[node1][node2]['edge_former_weight'] =\
-                self[node1][node2]['weight']
-            self[node1][node2]['weight'] = self.infinity
+            if self[node1][node2]['weight'] != self.infinity:
+                self[node1][node2]['edge_former_weight'] =\
+                    self[node1][node2]['weight']
+                self[node1][node2]['weight'] = self.infinity
+                self.unavailable_edges += 1
+                self.evict_edge_routes(node1, node2)
         except KeyError:
             raise NoSuchEdge()
 
@@ -42,23 +79,207 @@ class Topology(networkx.DiGraph):
             if self[node1][node2]['weight'] == self.infinity:
                 self[node1][node2]['weight'] =\
                     self[node1][node2]['edge_former_weight']
+                self.unavailable_edges -= 1
+                self.evict_constrained_routes()
             if flow is not None:
                 self[node1][node2]['object'].free_flow(flow)
         except KeyError:
             raise NoSuchEdge
 
+    def set_edge_capacity(self, node1, node2, capacity):
+        # Capacity change on a running network (e.g. a forked what-if
+        # variant). Flows in progress are kept: the capacity cannot go
+        # below the number of flows using the edge
+        try:
+            edge = self[node1][node2]['object']
+        except KeyError:
+            raise NoSuchEdge()
+        graph = self.compact_graph
+        if graph is not None:
+            edge_id = graph.edge_id(node1, node2)
+            used = graph.capacities[edge_id] - graph.available[edge_id]
+        else:
+            used = edge.max_flows - edge.available_flows
+        if capacity < used:
+            raise EdgeAllocationError()
+        edge.max_flows = capacity
+        edge.available_flows = capacity - used
+        if graph is not None:
+            graph.capacities[edge_id] = capacity
+            graph.available[edge_id] = capacity - used
+        elif edge.available_flows == 0:
+            self.set_edge_unavailable(node1, node2)
+        else:
+            self.free_edge(node1, node2, None)
+
     def get_edge_object(self, node1, node2):
         return self[node1][node2]['object']
 
     def shortest_path(self, node1, node2):
+        if self.path_table is not None and\
+                (node1, node2) in self.path_table:
+            path = self.table_path(node1, node2)
+        elif not self.route_cache_enabled:
+            path = self.compute_shortest_path(node1, node2)
+        else:
+            try:
+                path = self.route_cache[(node1, node2)]
+                self.route_cache_hits += 1
+            except KeyError:
+                self.route_cache_misses += 1
+                path = self.compute_shortest_path(node1, node2)
+                self.cache_route((node1, node2), path)
+        if path is None:
+            raise NoPathError
+        return path
+
+    def compute_shortest_path(self, node1, node2):
         try:
             path = networkx.shortest_path(self, node1, node2, weight='weight')
-            if self.infinity in [self[path[i]][path[i + 1]]['weight']
-                                 for i in xrange(len(path) - 1)]:
-                raise NoPathError
-            return path
         except networkx.NetworkXNoPath:
-            raise NoPathError
+            return None
+        if self.infinity in [self[path[i]][path[i + 1]]['weight']
+                             for i in xrange(len(path) - 1)]:
+            return None
+        return path
+
+    def cache_route(self, key, path):
+        self.route_cache[key] = path
+        if self.unavailable_edges > 0:
+            self.constrained_routes.add(key)
+        if path is not None:
+            for i in xrange(len(path) - 1):
+                self.edge_routes.setdefault((path[i], path[i + 1]),
+                                            set()).add(key)
+
+    def evict_route(self, key):
+        path = self.route_cache.pop(key)
+        self.constrained_routes.discard(key)
+        if path is not None:
+            for i in xrange(len(path) - 1):
+                self.edge_routes[(path[i], path[i + 1])].discard(key)
+
+    def evict_edge_routes(self, node1, node2):
+        # A more expensive edge only invalidates routes going through it
+        for key in list(self.edge_routes.get((node1, node2), ())):
+            self.evict_route(key)
+
+    def evict_constrained_routes(self):
+        # Weights never go below their initial value: routes computed
+        # on a fully available graph are still the shortest ones
+        for key in list(self.constrained_routes):
+            self.evict_route(key)
+
+    def clear_route_cache(self):
+        self.route_cache.clear()
+        self.edge_routes.clear()
+        self.constrained_routes.clear()
+
+    def table_path(self, node1, node2):
+        # First candidate whose edges all have a free slot
+        for path, edges_data in self.path_table[(node1, node2)]:
+            for data in edges_data:
+                if data['weight'] == self.infinity:
+                    break
+            else:
+                return path
+        return None
+
+    def get_path_pairs(self):
+        exit_nodes = self.exit_nodes if len(self.exit_nodes) > 0 else\
+            self.nodes()
+        return [(node1, node2) for node1 in self.get_entry_nodes()
+                for node2 in exit_nodes if node1 != node2]
+
+    def precompute_paths(self, k=1, pairs=None):
+        # Candidates are computed on initial weights: the topology is
+        # expected to be fully available
+        pairs = pairs if pairs is not None else self.get_path_pairs()
+        paths = dict()
+        if k == 1:
+            all_paths = networkx.all_pairs_dijkstra_path(self,
+                                                         weight='weight')
+            for node1, node2 in pairs:
+                paths[(node1, node2)] = [all_paths[node1][node2]] if\
+                    node2 in all_paths[node1] else []
+        else:
+            for node1, node2 in pairs:
+                try:
+                    paths[(node1, node2)] = list(itertools.islice(
+                        networkx.shortest_simple_paths(self, node1, node2,
+                                                       weight='weight'),
+                        k))
+                except networkx.NetworkXNoPath:
+                    paths[(node1, node2)] = []
+        self.set_path_table(paths, k)
+
+    def set_path_table(self, paths, k):
+        self.path_table = dict()
+        for key, candidates in paths.iteritems():
+            self.path_table[key] =\
+                [(path, [self[path[i]][path[i + 1]]
+                         for i in xrange(len(path) - 1)])
+                 for path in candidates]
+        self.path_table_k = k
+
+    def get_signature(self):
+        edges = sorted((node1.get_name(), node2.get_name(),
+                        data.get('edge_former_weight', data['weight'])
+                        if data['weight'] == self.infinity
+                        else data['weight'])
+                       for node1, node2, data in self.edges_iter(data=True))
+        return hashlib.sha1(repr(edges)).hexdigest()
+
+    def save_path_table(self, filename):
+        # Paths are stored by node name
+        paths = dict()
+        for (node1, node2), candidates in self.path_table.iteritems():
+            paths[(node1.get_name(), node2.get_name())] =\
+                [[node.get_name() for node in path] for path, _ in candidates]
+        with open(filename, 'wb') as table_file:
+            cPickle.dump({'signature': self.get_signature(),
+                          'k': self.path_table_k,
+                          'paths': paths},
+                         table_file, cPickle.HIGHEST_PROTOCOL)
+
+    def load_path_table(self, filename):
+        # Truncated or corrupt tables are invalid too, so that callers can
+        # compute the paths again
+        try:
+            with open(filename, 'rb') as table_file:
+                table = cPickle.load(table_file)
+            if table['signature'] != self.get_signature():
+                raise InvalidPathTable(filename)
+            nodes = dict((node.get_name(), node)
+                         for node in self.nodes_iter())
+            paths = dict()
+            for (name1, name2), candidates in table['paths'].iteritems():
+                paths[(nodes[name1], nodes[name2])] =\
+                    [[nodes[name] for name in path] for path in candidates]
+            k = table['k']
+        except (cPickle.UnpicklingError, EOFError, ValueError, TypeError,
+                AttributeError, KeyError, IndexError, ImportError):
+            raise InvalidPathTable(filename)
+        self.set_path_table(paths, k)
+
+    def set_flow_tracking(self, track_flows):
+        # Without tracking, edges only keep their capacity counters
+        for node1, node2, data in self.edges_iter(data=True):
+            data['object'].set_flow_tracking(track_flows)
+
+    def freeze(self):
+        # Once frozen, flows are routed and accounted on the Compact_graph:
+        # edge weights and Edge objects are not updated anymore
+        # (see Compact_graph.sync_edges)
+        self.compact_graph = Compact_graph(self)
+        if self.path_table is not None:
+            self.compact_graph.set_path_table(self.path_table)
+        return self.compact_graph
+
+    def get_route_cache_info(self):
+        return {'hits': self.route_cache_hits,
+                'misses': self.route_cache_misses,
+                'size': len(self.route_cache)}
 
     def build_topology_from_int(self, nodes, edges,
                                 arrival_rate=None, service_rate=None):
@@ -133,6 +354,65 @@ class Topology(networkx.DiGraph):
             else:
                 raise TypeError()
 
+    def build_topology_from_arrays(self, numbers, flags, sources, targets,
+                                   capacities, weights, names=None,
+                                   arrival_rate=None, service_rate=None):
+        # Bulk version of build_topology_from_int for large topologies:
+        # one entry per node (number, flag, name) and per directed edge
+        # (source and target node indices, capacity, weight), see
+        # topology_file and generators. Entries are lists or NumPy arrays,
+        # they are not type checked
+        numbers, flags, sources, targets, capacities, weights =\
+            [values.tolist() if hasattr(values, 'tolist') else values
+             for values in (numbers, flags, sources, targets, capacities,
+                            weights)]
+        if names is None:
+            names = numbers
+        entry_flag = topology_file.node_flags['entry']
+        exit_flag = topology_file.node_flags['exit']
+        # Nodes that are both entry and exit nodes are plain Node objects
+        node_classes = {0: Node, entry_flag: Entry_node, exit_flag: Exit_node,
+                        entry_flag | exit_flag: Node}
+        nodes = [node_classes[flag](arrival_rate, service_rate, number, name)
+                 for number, flag, name in itertools.izip(numbers, flags,
+                                                          names)]
+        if len(set(names)) != len(names):
+            raise DuplicatedNodeError
+        self.entry_nodes.extend(node for node, flag in zip(nodes, flags)
+                                if flag & entry_flag)
+        self.exit_nodes.extend(node for node, flag in zip(nodes, flags)
+                               if flag & exit_flag)
+        with gc_disabled():
+            self.add_nodes_from(nodes)
+            # Adjacency dicts filled per node index instead of through
+            # add_edges_from, which hashes both nodes several times per edge.
+            # Relies on the networkx 1.x DiGraph storage (1.11 here): succ
+            # and pred are the adjacency dicts themselves, sharing one edge
+            # data dict per edge. From networkx 2.0 they are read-only views
+            # and this must write to _succ and _pred instead
+            successors = [dict() for node in nodes]
+            predecessors = [dict() for node in nodes]
+            for source, target, capacity, weight in\
+                    itertools.izip(sources, targets, capacities, weights):
+                data = {'object': Edge(capacity), 'weight': weight}
+                successors[source][nodes[target]] = data
+                predecessors[target][nodes[source]] = data
+            for node, node_successors, node_predecessors in\
+                    itertools.izip(nodes, successors, predecessors):
+                self.succ[node].update(node_successors)
+                self.pred[node].update(node_predecessors)
+        self.clear_route_cache()
+        self.compact_graph = None
+
+    def load_topology(self, filename, arrival_rate=None, service_rate=None):
+        # Binary topology file, see topology_file
+        self.build_topology_from_arrays(
+            arrival_rate=arrival_rate, service_rate=service_rate,
+            **topology_file.load_topology_arrays(filename))
+
+    def save_topology(self, filename):
+        topology_file.save_topology(self, filename)
+
     def get_random_entry_node(self, number):
         if len(self.entry_nodes) == 0:
             #If no entry node, all nodes are entry nodes
@@ -151,9 +431,14 @@ class Topology(networkx.DiGraph):
     def import_topology(self, filename, arrival_rate, service_rate):
         #TODO : catch exceptions
         g = networkx.read_graphml(filename)
-        nodes = [{'name': node,
+        # Numbered from 0 in file order (as topology_file does), not from
+        # Node.counter: node hashes, and therefore graph iteration order,
+        # do not depend on the topologies built before
+        nodes = [{'number': number,
+                  'name': node,
                   'arrival_rate': arrival_rate,
-                  'service_rate': service_rate} for node in g.nodes()]
+                  'service_rate': service_rate}
+                 for number, node in enumerate(g.nodes())]
 
         self.build_topology_from_int(nodes, g.edges())
 
@@ -163,6 +448,8 @@ class Topology(networkx.DiGraph):
             self.edges_iter(data=True))
         map(lambda x: self.free_edge(x[0], x[1], None),
             self.edges_iter(data=True))
+        if self.compact_graph is not None:
+            self.compact_graph.reset()
 
 
 def torus2D(x, y, start_index=0):
@@ -0,0 +1,149 @@
+import mmap
+import struct
+import networkx
+from flowsim.flowsim_exception import InvalidTopologyFile
+
+# Binary topology file: a header followed by little-endian arrays, each
+# starting on an 8 bytes boundary, so that they can be used in place from
+# a memory map (NumPy).
+#   numbers    int64[nodes]   node numbers
+#   flags      int8[nodes]    see node_flags, entry | exit for both
+#   sources    int64[edges]   node indices, edges are directed
+#   targets    int64[edges]
+#   capacities int64[edges]
+#   weights    float64[edges]
+#   name_offsets int64[nodes + 1], names: optional node names, utf-8
+magic = 'FLOWSIMT'
+version = 1
+header = struct.Struct('<8sIIqq')  # magic, version, has_names, nodes, edges
+node_flags = {'': 0, 'entry': 1, 'exit': 2}
+
+
+def get_layout(nodes, edges, has_names):
+    # Offsets of the arrays
+    import numpy
+    layout = []
+    offset = header.size
+    arrays = [('numbers', numpy.int64, nodes),
+              ('flags', numpy.int8, nodes),
+              ('sources', numpy.int64, edges),
+              ('targets', numpy.int64, edges),
+              ('capacities', numpy.int64, edges),
+              ('weights', numpy.float64, edges)]
+    if has_names:
+        arrays.append(('name_offsets', numpy.int64, nodes + 1))
+    for key, dtype, count in arrays:
+        offset += -offset % 8
+        layout.append((key, numpy.dtype(dtype).newbyteorder('<'), count,
+                       offset))
+        offset += numpy.dtype(dtype).itemsize * count
+    return layout, offset
+
+
+def save_topology_arrays(filename, numbers, flags, sources, targets,
+                         capacities, weights, names=None):
+    # Sequences (or arrays) of the same length per node and per edge
+    import numpy
+    values = {'numbers': numbers, 'flags': flags, 'sources': sources,
+              'targets': targets, 'capacities': capacities,
+              'weights': weights}
+    nodes = len(numbers)
+    edges = len(sources)
+    if names is not None:
+        names = [unicode(name).encode('utf-8') for name in names]
+        values['name_offsets'] = numpy.cumsum([0] + map(len, names))
+    layout, end = get_layout(nodes, edges, names is not None)
+    with open(filename, 'wb') as topology_file:
+        topology_file.write(header.pack(magic, version, names is not None,
+                                        nodes, edges))
+        for key, dtype, count, offset in layout:
+            array = numpy.asarray(values[key], dtype=dtype)
+            if len(array) != count:
+                raise ValueError(key)
+            topology_file.write('\0' * (offset - topology_file.tell()))
+            topology_file.write(array.tostring())
+        if names is not None:
+            topology_file.write(''.join(names))
+
+
+def load_topology_arrays(filename):
+    # Arrays are read-only views of the memory mapped file, names is a
+    # list of unicode strings or None
+    import numpy
+    with open(filename, 'rb') as topology_file:
+        try:
+            data = mmap.mmap(topology_file.fileno(), 0,
+                             access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file
+            raise InvalidTopologyFile(filename)
+    try:
+        (file_magic, file_version, has_names, nodes, edges) =\
+            header.unpack_from(data)
+        if file_magic != magic or file_version != version:
+            raise InvalidTopologyFile(filename)
+        layout, end = get_layout(nodes, edges, has_names)
+        arrays = dict((key, numpy.frombuffer(data, dtype, count, offset))
+                      for key, dtype, count, offset in layout)
+        arrays['names'] = None
+        if has_names:
+            offsets = arrays.pop('name_offsets').tolist()
+            if offsets[0] != 0 or offsets != sorted(offsets) or\
+                    end + offsets[-1] > len(data):
+                raise InvalidTopologyFile(filename)
+            blob = data[end:end + offsets[-1]]
+            # UnicodeDecodeError is a ValueError
+            arrays['names'] = [
+                blob[offsets[i]:offsets[i + 1]].decode('utf-8')
+                for i in xrange(nodes)]
+    except (struct.error, ValueError):
+        raise InvalidTopologyFile(filename)
+    return arrays
+
+
+def save_topology(topology, filename):
+    nodes = topology.nodes()
+    node_ids = dict((node, i) for i, node in enumerate(nodes))
+    edges = topology.edges(data=True)
+    entry_nodes = set(topology.entry_nodes)
+    exit_nodes = set(topology.exit_nodes)
+    names = [node.get_name() for node in nodes]
+    if all(name == node.number for name, node in zip(names, nodes)):
+        names = None  # Numbers are used as names
+    save_topology_arrays(
+        filename,
+        [node.number for node in nodes],
+        [(node_flags['entry'] if node in entry_nodes else 0) |
+         (node_flags['exit'] if node in exit_nodes else 0)
+         for node in nodes],
+        [node_ids[node1] for node1, node2, data in edges],
+        [node_ids[node2] for node1, node2, data in edges],
+        [data['object'].max_flows for node1, node2, data in edges],
+        # Unavailable edges are saved with their normal weight
+        [data.get('edge_former_weight', data['weight'])
+         if data['weight'] == topology.infinity else data['weight']
+         for node1, node2, data in edges],
+        names)
+
+
+def graphml_to_topology_file(graphml_filename, filename, capacity=1,
+                             weight=1):
+    # Like Topology.import_topology, every edge is used both ways. The
+    # 'capacity', 'weight' edge attributes and the 'type' ('entry' or
+    # 'exit') node attribute are used when present
+    graph = networkx.read_graphml(graphml_filename)
+    nodes = graph.nodes()
+    node_ids = dict((node, i) for i, node in enumerate(nodes))
+    sources = []
+    targets = []
+    capacities = []
+    weights = []
+    for node1, node2, data in graph.edges_iter(data=True):
+        for source, target in [(node1, node2), (node2, node1)]:
+            sources.append(node_ids[source])
+            targets.append(node_ids[target])
+            capacities.append(int(data.get('capacity', capacity)))
+            weights.append(float(data.get('weight', weight)))
+    save_topology_arrays(filename, range(len(nodes)),
+                         [node_flags[graph.node[node].get('type', '')]
+                          for node in nodes],
+                         sources, targets, capacities, weights, nodes)
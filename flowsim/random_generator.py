@@ -1,19 +1,143 @@
-from random import expovariate, randint, seed
+import hashlib
+import random
 from flowsim.flowsim_exception import LoopError
 
 
+def derive_seed(base_seed, key):
+    # Independent of the order in which seeds are requested and of the
+    # process deriving them
+    digest = hashlib.sha256('%r:%r' % (base_seed, key)).hexdigest()
+    return int(digest[:16], 16)
+
+
+class Variate_buffer(object):
+    # Hands out one by one the values drawn in blocks of size by
+    # stream.method(*args, size=size) (stream: numpy RandomState)
+
+    def __init__(self, stream, method, size, *args):
+        self.stream = stream
+        self.method = method
+        self.args = args
+        self.size = size
+        self.values = []
+        self.index = 0
+
+    def next(self):
+        if self.index == len(self.values):
+            self.values = getattr(self.stream, self.method)(
+                *self.args, size=self.size).tolist()
+            self.index = 0
+        self.index += 1
+        return self.values[self.index - 1]
+
+
 class Random_generator(object):
     max_int = 10000
 
     def __init__(self, topology, rand_seed=None,
-                 arrival_generation_function=None, duration_function=None):
-        # TODO change this
+                 arrival_generation_function=None, duration_function=None,
+                 buffer_size=None):
+        # buffer_size: if set, default variates are drawn by NumPy in blocks
+        # of buffer_size (same distributions, different sequence than the
+        # scalar mode)
+        if rand_seed is None:
+            rand_seed = random.SystemRandom().getrandbits(64)
+        self.rand_seed = rand_seed
+        # One stream per kind of draw: drawing more of one kind (e.g. more
+        # destination retries) does not shift the others
+        self.arrival_stream = self.spawn('arrival')
+        self.duration_stream = self.spawn('duration')
+        self.destination_stream = self.spawn('destination')
+        self.buffer_size = buffer_size
+        if buffer_size is not None:
+            self.init_buffers(buffer_size)
+        default_arrival, default_duration = self.get_default_functions()
+
         self.next_arrival_func = arrival_generation_function if\
-            arrival_generation_function is not None else expovariate
+            arrival_generation_function is not None else default_arrival
         self.duration_function = duration_function if\
-            duration_function is not None else expovariate
+            duration_function is not None else default_duration
         self.topology = topology
-        seed(rand_seed)
+
+    def get_default_functions(self):
+        if self.buffer_size is not None:
+            return self.buffered_arrival, self.buffered_duration
+        return (self.arrival_stream.expovariate,
+                self.duration_stream.expovariate)
+
+    def __getstate__(self):
+        # Bound methods cannot be pickled, default functions are rebuilt
+        # by __setstate__
+        state = self.__dict__.copy()
+        default_arrival, default_duration = self.get_default_functions()
+        if self.next_arrival_func == default_arrival:
+            state['next_arrival_func'] = None
+        if self.duration_function == default_duration:
+            state['duration_function'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        default_arrival, default_duration = self.get_default_functions()
+        if self.next_arrival_func is None:
+            self.next_arrival_func = default_arrival
+        if self.duration_function is None:
+            self.duration_function = default_duration
+
+    def reseed(self, rand_seed):
+        # New streams for a copy of the simulation (see rare_event), custom
+        # functions are kept
+        default_arrival, default_duration = self.get_default_functions()
+        self.rand_seed = rand_seed
+        self.arrival_stream = self.spawn('arrival')
+        self.duration_stream = self.spawn('duration')
+        self.destination_stream = self.spawn('destination')
+        if self.buffer_size is not None:
+            self.init_buffers(self.buffer_size)
+        if self.next_arrival_func == default_arrival:
+            self.next_arrival_func = self.get_default_functions()[0]
+        if self.duration_function == default_duration:
+            self.duration_function = self.get_default_functions()[1]
+
+    def get_streams(self):
+        # Replaced by reseed
+        streams = [self.arrival_stream, self.duration_stream,
+                   self.destination_stream]
+        if self.buffer_size is not None:
+            streams += [self.arrival_buffer, self.duration_buffer,
+                        self.destination_buffer]
+        return streams
+
+    def uses_default_functions(self):
+        default_arrival, default_duration = self.get_default_functions()
+        return self.next_arrival_func == default_arrival and\
+            self.duration_function == default_duration
+
+    def spawn(self, key):
+        return random.Random(derive_seed(self.rand_seed, key))
+
+    def spawn_numpy(self, key):
+        import numpy
+        seed = derive_seed(self.rand_seed, key)
+        return numpy.random.RandomState([seed & 0xffffffff, seed >> 32])
+
+    def init_buffers(self, buffer_size):
+        # Exp(rate) = Exp(1) / rate, one buffer serves every rate
+        self.arrival_buffer = Variate_buffer(self.spawn_numpy('arrival'),
+                                             'standard_exponential',
+                                             buffer_size)
+        self.duration_buffer = Variate_buffer(self.spawn_numpy('duration'),
+                                              'standard_exponential',
+                                              buffer_size)
+        self.destination_buffer =\
+            Variate_buffer(self.spawn_numpy('destination'), 'randint',
+                           buffer_size, 0, self.__class__.max_int + 1)
+
+    def buffered_arrival(self, arrival_rate):
+        return self.arrival_buffer.next() / arrival_rate
+
+    def buffered_duration(self, service_rate):
+        return self.duration_buffer.next() / service_rate
 
     def next_arrival(self, arrival_rate):
         return self.next_arrival_func(arrival_rate)
@@ -22,7 +146,10 @@ class Random_generator(object):
         return self.duration_function(service_rate)
 
     def randint(self, minimum=0):
-        return randint(minimum, self.__class__.max_int)
+        if self.buffer_size is not None and minimum == 0:
+            return self.destination_buffer.next()
+        return self.destination_stream.randint(minimum,
+                                               self.__class__.max_int)
 
     def random_io_nodes(self):
         prevent_loop = 10
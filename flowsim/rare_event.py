@@ -0,0 +1,333 @@
+import bisect
+import math
+from flowsim.checkpoint import dump_simulation, load_simulation
+from flowsim.random_generator import derive_seed
+from flowsim.statistics import normal_quantile
+from flowsim.event.event_types import Restart_arrival_Event,\
+    Restart_end_flow_Event
+
+# Blocking rate by RESTART splitting, for blocking rates too small to be
+# estimated by a plain run. M. Villen-Altamirano, J. Villen-Altamirano,
+# "RESTART: a method for accelerating rare event simulations", 1991.
+#
+# A flow is blocked when a cut between its nodes is full, most often the
+# outgoing or incoming edges of one node: the importance function is the
+# largest number of flows on the outgoing (or incoming) edges of a node,
+# cut into regions by increasing thresholds. Each time a trial reaches
+# threshold i from below, splits[i] - 1 retrials are started from a copy
+# of its state; a retrial ends when the importance falls back below the
+# threshold it was started at. The main trial is the plain simulation.
+# A blocking in region i (threshold i reached, not i + 1) is weighted by
+# 1 / (splits[0] * ... * splits[i]).
+#
+# The main trial regenerates at each arrival into an empty network, and
+# retrials end before it empties: the estimate is a ratio of cycle means
+# (weighted blockings / arrivals) with a delta method confidence interval.
+# The estimate does not depend on the splits, its variance does (see
+# balanced_splits).
+
+
+def count_events(simulation):
+    return sum(simulation.result.counters[0])
+
+
+def cut_capacity(topology):
+    # Largest capacity of the outgoing or incoming edges of a node
+    capacity = 0
+    for node in topology.nodes():
+        capacity = max(capacity,
+                       sum(topology.get_edge_object(node, next_node).max_flows
+                           for next_node in topology.successors(node)),
+                       sum(topology.get_edge_object(previous_node,
+                                                    node).max_flows
+                           for previous_node in topology.predecessors(node)))
+    return capacity
+
+
+def resample_clocks(event_manager):
+    # Exponential clocks are memoryless: the pending arrivals and ends of
+    # flow of a retrial are drawn again, so that it does not share its
+    # future with the trial it was copied from
+    random_generator = event_manager.random_generator
+    event_list = event_manager.event_list
+    current_time = event_manager.current_time
+    events = []
+    while len(event_list) > 0:
+        events.append(event_list.pop())
+    for event in events:
+        if isinstance(event, Restart_arrival_Event):
+            event.handling_time = current_time +\
+                random_generator.next_arrival(event.arrival_rate)
+            event.duration = random_generator.rand_duration(
+                event.service_rate)
+        elif isinstance(event, Restart_end_flow_Event):
+            event.handling_time = current_time +\
+                random_generator.rand_duration(
+                    event.event_issuer.get_service_rate())
+        event_list.push(event)
+
+
+class Restart_trial(object):
+    # Main trial (level 0) or retrial started at threshold level. The
+    # importance is updated with the flows of the trial: flows on the
+    # outgoing and on the incoming edges of every node, number of
+    # (node, direction) by value, and their maximum
+
+    def __init__(self, estimator, simulation, level):
+        self.estimator = estimator
+        self.simulation = simulation
+        self.level = level
+        self.region = level
+        self.top_blocked = False  # Since the last threshold was reached
+        self.cut_flows = dict()
+        self.cuts_by_flows = [0]
+        self.importance = 0
+        for flow in simulation.flow_controller.flows:
+            self.update_cuts(flow, 1)
+
+    def arrival(self, time, network_empty):
+        if self.level == 0:
+            self.estimator.arrival(time, network_empty)
+
+    def blocked(self):
+        self.estimator.blocked(self)
+
+    def add_flow(self, flow):
+        self.update_cuts(flow, 1)
+        self.set_region(self.estimator.get_region(self.importance))
+
+    def remove_flow(self, flow):
+        self.update_cuts(flow, -1)
+        self.set_region(self.estimator.get_region(self.importance))
+
+    def update_cuts(self, flow, step):
+        nodes = flow.get_nodes()
+        for i in xrange(len(nodes) - 1):
+            self.update_cut((nodes[i], 'out'), step)
+            self.update_cut((nodes[i + 1], 'in'), step)
+
+    def update_cut(self, cut, step):
+        cuts_by_flows = self.cuts_by_flows
+        flows = self.cut_flows.get(cut, 0)
+        cuts_by_flows[flows] -= 1
+        flows += step
+        self.cut_flows[cut] = flows
+        if flows == len(cuts_by_flows):
+            cuts_by_flows.append(0)
+        cuts_by_flows[flows] += 1
+        if flows > self.importance:
+            self.importance = flows
+        while self.importance > 0 and cuts_by_flows[self.importance] == 0:
+            self.importance -= 1
+
+    def set_region(self, region):
+        if region < self.level:
+            self.simulation.event_manager.set_EOS()
+        # Crossing several thresholds at once: split at each of them
+        while self.region < region:
+            self.region += 1
+            self.estimator.split(self, self.region)
+        self.region = region
+        if region < len(self.estimator.thresholds):
+            self.top_blocked = False
+
+
+class Restart_estimator(object):
+
+    def __init__(self, simulation, thresholds, splits, cycles):
+        # simulation: initialised, not run. thresholds: increasing numbers
+        # of flows on the edges of a node (see cut_capacity), splits:
+        # number of trials continuing from each threshold, one for all
+        # thresholds or one per threshold. cycles: of the main trial
+        if isinstance(splits, (int, long)):
+            splits = [splits] * len(thresholds)
+        if len(thresholds) == 0 or len(splits) != len(thresholds) or\
+                list(thresholds) != sorted(set(thresholds)) or\
+                min(thresholds) < 1 or min(splits) < 1:
+            raise ValueError((thresholds, splits))
+        if cycles < 1:
+            raise ValueError(cycles)
+        self.simulation = simulation
+        self.thresholds = list(thresholds)
+        self.splits = list(splits)
+        self.weights = [1.]  # Of a blocking, by region
+        for split in self.splits:
+            self.weights.append(self.weights[-1] / split)
+        self.cycles = cycles
+        self.rand_seed = simulation.random_generator.rand_seed
+        # Pending clocks can only be drawn again if exponential
+        self.resample = simulation.random_generator.uses_default_functions()
+        # Cycle in progress
+        self.cycle_start = None
+        self.cycle_arrivals = 0
+        self.blocked_weight = 0.
+        # Complete cycles: arrivals, weighted blockings
+        self.arrivals = []
+        self.blocked_weights = []
+        # Effort, see balanced_splits
+        self.crossings = [0] * len(thresholds)
+        # Trial stays above the last threshold with a blocking
+        self.top_blockings = 0
+        self.retrials = 0
+        self.retrial_events = 0
+
+    def get_region(self, importance):
+        return bisect.bisect_right(self.thresholds, importance)
+
+    def arrival(self, time, network_empty):
+        if network_empty:
+            if self.cycle_start is not None:
+                self.arrivals.append(self.cycle_arrivals)
+                self.blocked_weights.append(self.blocked_weight)
+                if len(self.arrivals) == self.cycles:
+                    self.simulation.event_manager.set_EOS()
+                    self.cycle_start = None
+                    self.cycles = 0
+            if self.cycles == 0:
+                return
+            self.cycle_start = time
+            self.cycle_arrivals = 0
+            self.blocked_weight = 0.
+        self.cycle_arrivals += 1
+
+    def blocked(self, trial):
+        if self.cycle_start is None:
+            return
+        self.blocked_weight += self.weights[trial.region]
+        if trial.region == len(self.thresholds) and not trial.top_blocked:
+            trial.top_blocked = True
+            self.top_blockings += 1
+
+    def split(self, trial, level):
+        if self.cycle_start is None:
+            return  # After the last cycle
+        self.crossings[level - 1] += 1
+        event_manager = trial.simulation.event_manager
+        # Random streams are replaced in the retrials, not copied. Every
+        # retrial is loaded from the same dump
+        streams = event_manager.random_generator.get_streams()
+        event_manager.rare_event = None
+        try:
+            data = dump_simulation(trial.simulation, streams)
+        finally:
+            event_manager.rare_event = trial
+        for i in xrange(self.splits[level - 1] - 1):
+            self.run_retrial(load_simulation(data, streams), level)
+
+    def run_retrial(self, simulation, level):
+        self.retrials += 1
+        event_manager = simulation.event_manager
+        trial = Restart_trial(self, simulation, level)
+        event_manager.rare_event = trial
+        # Only the main trial is checkpointed, traced and sampled
+        event_manager.checkpointer = None
+        event_manager.trace_recorder = None
+        event_manager.sampler = None
+        event_manager.random_generator.reseed(
+            derive_seed(self.rand_seed, ('restart', self.retrials)))
+        if self.resample:
+            resample_clocks(event_manager)
+        events = count_events(simulation)
+        trial.set_region(self.get_region(trial.importance))
+        event_manager.process_events()
+        self.retrial_events += count_events(simulation) - events
+
+    def run(self, confidence=0.95):
+        simulation = self.simulation
+        event_manager = simulation.event_manager
+        # Stopped by the estimator, not by the usual rules. These and the
+        # event types are given back afterwards: pending events then
+        # behave as plain ones
+        stop_rules = (simulation.precision_targets,
+                      simulation.warm_up_metric)
+        event_types = (event_manager.arrival_event_type,
+                       event_manager.end_flow_event_type)
+        simulation.precision_targets = dict()
+        simulation.warm_up_metric = None
+        event_manager.arrival_event_type = Restart_arrival_Event
+        event_manager.end_flow_event_type = Restart_end_flow_Event
+        event_manager.rare_event = Restart_trial(self, simulation, 0)
+        try:
+            simulation.launch_simulation()
+        finally:
+            simulation.precision_targets, simulation.warm_up_metric =\
+                stop_rules
+            event_manager.arrival_event_type,\
+                event_manager.end_flow_event_type = event_types
+            event_manager.rare_event = None
+        return self.get_results(confidence)
+
+    def get_results(self, confidence=0.95):
+        n = len(self.arrivals)
+        results = {'cycles': n,
+                   'thresholds': self.thresholds,
+                   'splits': self.splits,
+                   'crossings': self.crossings,
+                   'top_blockings': self.top_blockings,
+                   'retrials': self.retrials,
+                   'events': count_events(self.simulation) +
+                   self.retrial_events}
+        if n == 0:
+            return results
+        arrivals = float(sum(self.arrivals)) / n
+        blocking_rate = sum(self.blocked_weights) / (arrivals * n)
+        results['Blocking_rate'] = blocking_rate
+        if n > 1:
+            # Delta method for the ratio of the cycle means
+            variance = sum((blocked - blocking_rate * cycle_arrivals) ** 2
+                           for blocked, cycle_arrivals in
+                           zip(self.blocked_weights, self.arrivals)) / (n - 1)
+            results['Blocking_rate_half_width'] =\
+                normal_quantile(0.5 + confidence / 2.) *\
+                math.sqrt(variance / n) / arrivals
+        return results
+
+
+def balanced_splits(runs, max_split=1000):
+    # Splits of the next run from the results of previous runs: each split
+    # is the inverse of the estimated probability that a trial started at
+    # its threshold reaches the next one (the last one: sees a blocking),
+    # so that about as many trials reach every threshold. Thresholds reached
+    # but never passed get a larger split, thresholds never reached the
+    # split of the previous one
+    splits = runs[-1]['splits']
+    balanced = []
+    for i, split in enumerate(splits):
+        trials = sum(run['crossings'][i] * run['splits'][i] for run in runs)
+        passed = sum((run['crossings'] + [run['top_blockings']])[i + 1]
+                     for run in runs)
+        if trials == 0:
+            balanced.append(max(split, balanced[-1] if balanced else 1))
+        elif passed == 0:
+            balanced.append(min(split * 4, max_split))
+        else:
+            balanced.append(min(max(int(round(float(trials) / passed)), 1),
+                                max_split))
+    return balanced
+
+
+def estimate_blocking_rate(simulation, cycles, thresholds=None, splits=None,
+                           pilot_cycles=None, pilots=3, confidence=0.95):
+    # simulation: initialised, not run. thresholds: every number of flows
+    # from 2 (1 if the cut capacity is 1) to cut_capacity by default.
+    # splits: balanced by pilot runs of pilot_cycles (cycles / 10 by
+    # default) on copies of simulation if not given
+    if thresholds is None:
+        capacity = cut_capacity(simulation.topology)
+        thresholds = range(2, capacity + 1) or range(1, capacity + 1)
+        if len(thresholds) == 0:
+            raise ValueError('no thresholds, cut capacity: %d' % capacity)
+    if splits is None:
+        splits = 2
+        runs = []
+        for i in xrange(pilots):
+            # Other random streams than the simulation
+            pilot = simulation.fork()
+            pilot.random_generator.reseed(
+                derive_seed(pilot.random_generator.rand_seed, ('pilot', i)))
+            runs.append(Restart_estimator(
+                pilot, thresholds, splits,
+                pilot_cycles or max(cycles // 10, 1)).run())
+            splits = balanced_splits(runs)
+    return Restart_estimator(simulation, thresholds, splits,
+                             cycles).run(confidence)
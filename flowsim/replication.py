@@ -0,0 +1,69 @@
+import multiprocessing
+from flowsim.simulation import Simulation
+from flowsim.statistics import summarize
+from flowsim.random_generator import derive_seed
+
+
+def run_replica(task):
+    (nodes, edges, arrival_rate, service_rate, rand_seed, max_arrivals,
+     simulation_options, init_options) = task
+    simulation = Simulation(arrival_rate, service_rate, rand_seed,
+                            **simulation_options)
+    simulation.init_simulation(nodes, edges, **init_options)
+    return simulation.launch_simulation(max_arrivals)
+
+
+def merge_results(results, confidence=0.95):
+    # key -> summary (see statistics.summarize) of the numeric values
+    # found in every replica
+    merged = dict()
+    if len(results) == 0:
+        return merged
+    for key in results[0]:
+        try:
+            values = [float(result[key]) for result in results]
+        except (KeyError, TypeError, ValueError):
+            continue
+        merged[key] = summarize(values, confidence)
+    return merged
+
+
+class Replication_runner(object):
+
+    def __init__(self, nodes, edges, processes=None, simulation_options=None,
+                 init_options=None):
+        # simulation_options: Simulation keyword arguments (event_queue...)
+        # init_options: init_simulation keyword arguments (k_paths...)
+        self.nodes = nodes
+        self.edges = edges
+        self.processes = processes if processes is not None else\
+            multiprocessing.cpu_count()
+        self.simulation_options = simulation_options or dict()
+        self.init_options = init_options or dict()
+
+    def get_tasks(self, arrival_rate, service_rate, replicas, base_seed,
+                  max_arrivals):
+        return [(self.nodes, self.edges, arrival_rate, service_rate,
+                 derive_seed(base_seed, index), max_arrivals,
+                 self.simulation_options, self.init_options)
+                for index in xrange(replicas)]
+
+    def run_replicas(self, arrival_rate, service_rate, replicas,
+                     base_seed=0, max_arrivals=float('inf')):
+        tasks = self.get_tasks(arrival_rate, service_rate, replicas,
+                               base_seed, max_arrivals)
+        if self.processes <= 1:
+            return map(run_replica, tasks)
+        pool = multiprocessing.Pool(min(self.processes, len(tasks)))
+        try:
+            return pool.map(run_replica, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    def run(self, arrival_rate, service_rate, replicas, base_seed=0,
+            max_arrivals=float('inf'), confidence=0.95):
+        return merge_results(self.run_replicas(arrival_rate, service_rate,
+                                               replicas, base_seed,
+                                               max_arrivals),
+                             confidence)
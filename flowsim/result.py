@@ -1,30 +1,121 @@
+from flowsim.statistics import Running_statistics, Batch_means, Mser
+from flowsim.event.event_types import event_types
+
+
 class Result(object):
+    # Event counters and computed values are stored in lists indexed by
+    # integer ids: node id 0 is 'general' and built-in event types have
+    # their type_code as key id.
+    quantiles = (0.5, 0.95, 0.99)
 
     def __init__(self):
-        self.data = dict()
-        self.data['general'] = dict()
-        self.data['general']['event_counter'] = dict()
-        self.data['general']['computed_values'] = dict()
-        self.convergence = dict()
+        self.keys = []  # Key id -> event counter key
+        self.key_ids = dict()
+        self.nodes = []  # Node id -> node
+        self.node_ids = dict()
+        self.counters = []  # Node id -> list of counts by key id
+
+        # value key -> list by node id
+        self.sums = dict()
+        self.samples = dict()  # Running_statistics
+        self.custom_values = dict()
+        self.updated = dict()  # value key -> set of updated node ids
+
+        # value key -> [Batch_means, relative precision, confidence,
+        # last (numerator, denominator) totals]
+        self.precision_targets = dict()
+        # [Mser, last (numerator, denominator) totals, value key], None
+        # once the warm-up is over or without detection
+        self.warm_up = None
         self.computed_values_fcts = dict()
         self.results = dict()
-        self.check_samples = 5
+
+        self.get_node_id('general')
+        for Event_type in event_types:
+            self.get_key_id(Event_type)
+
+    def __getstate__(self):
+        # Bound update functions (mean, sum, ...) are pickled by name
+        state = self.__dict__.copy()
+        state['computed_values_fcts'] = dict(
+            (key, [function.__name__ if getattr(function, 'im_self', None)
+                   is self else function, kwargs])
+            for key, (function, kwargs) in
+            self.computed_values_fcts.iteritems())
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        for function_kwargs in self.computed_values_fcts.itervalues():
+            if isinstance(function_kwargs[0], str):
+                function_kwargs[0] = getattr(self, function_kwargs[0])
+
+    def get_key_id(self, key):
+        try:
+            return self.key_ids[key]
+        except KeyError:
+            key_id = self.key_ids[key] = len(self.keys)
+            self.keys.append(key)
+            for counters in self.counters:
+                counters.append(0)
+            return key_id
+
+    def get_node_id(self, node):
+        try:
+            return self.node_ids[node]
+        except KeyError:
+            return self.init_node_data(node)
 
     def init_node_data(self, node):
-        if node not in self.data:
-            self.data[node] = dict()
-            self.data[node]['event_counter'] = dict()
-            self.data[node]['computed_values'] = dict()
+        if node in self.node_ids:
+            return self.node_ids[node]
+        node_id = self.node_ids[node] = len(self.nodes)
+        self.nodes.append(node)
+        self.counters.append([0] * len(self.keys))
+        for sums in self.sums.itervalues():
+            sums.append(0.)
+        for samples in self.samples.itervalues():
+            samples.append(Running_statistics(self.quantiles))
+        for values in self.custom_values.itervalues():
+            values.append(0.)
+        return node_id
+
+    def init_nodes(self, nodes):
+        # Preallocates counters and accumulators
+        for node in nodes:
+            self.init_node_data(node)
 
     def increase_event_counter(self, key, node='general'):
+        self.counters[self.get_node_id(node)][self.get_key_id(key)] += 1
+
+    def count_event(self, key_id, node=None):
+        # Fast path of increase_event_counter for the general counter and,
+        # if any, the node one
+        self.counters[0][key_id] += 1
+        if node is not None:
+            try:
+                node_id = self.node_ids[node]
+            except KeyError:
+                node_id = self.init_node_data(node)
+            self.counters[node_id][key_id] += 1
+
+    def get_event_count(self, key, node='general'):
         try:
-            self.data[node]['event_counter'][key] += 1
+            return self.counters[self.node_ids[node]][self.key_ids[key]]
         except KeyError:
-            self.init_node_data(node)
-            self.data[node]['event_counter'][key] = 1
+            return 0
 
     def add_computed_value(self, key, update_function, function_args):
         self.computed_values_fcts[key] = [update_function, function_args]
+        self.updated.setdefault(key, set())
+        if update_function == self.sum:
+            self.sums.setdefault(key, [0.] * len(self.nodes))
+        elif update_function == self.mean:
+            self.samples.setdefault(key,
+                                    [Running_statistics(self.quantiles)
+                                     for node in self.nodes])
+        elif update_function != self.event_division:
+            self.custom_values.setdefault(key, [0.] * len(self.nodes))
 
     def update_computed_value(self, value_key, update_param, node=None,
                               update_function=None, **kwargs):
@@ -38,19 +129,64 @@ class Result(object):
             update_function = self.mean
             self.add_computed_value(value_key, update_function, kwargs)
 
-        node = node if node is not None else 'general'
+        node_id = self.get_node_id(node if node is not None else 'general')
+        self.updated[value_key].add(node_id)
+        if value_key in self.sums:
+            self.sums[value_key][node_id] += update_param
+        elif value_key in self.samples:
+            self.samples[value_key][node_id].add(update_param)
+        elif value_key in self.custom_values:
+            self.custom_values[value_key][node_id] =\
+                update_function(self.get_node_data(node_id), value_key,
+                                update_param, **kwargs)
 
+    def add_to_sum(self, value_key, value):
+        # Fast path of update_computed_value(..., update_function=self.sum)
+        # on the general node
         try:
-            self.data[node]['computed_values']
+            self.sums[value_key][0] += value
         except KeyError:
-            self.init_node_data(node)
+            self.update_computed_value(value_key, value,
+                                       update_function=self.sum)
+        else:
+            self.updated[value_key].add(0)
+
+    def add_sample(self, value_key, value):
+        # Fast path of update_computed_value(..., update_function=self.mean)
+        # on the general node
+        try:
+            self.samples[value_key][0].add(value)
+        except KeyError:
+            self.update_computed_value(value_key, value,
+                                       update_function=self.mean)
+        else:
+            self.updated[value_key].add(0)
 
-        if not value_key in self.data[node]['computed_values']:
-            self.data[node]['computed_values'][value_key] = 0.
+    def get_computed_value(self, key, node_id=0):
+        if key in self.sums:
+            return self.sums[key][node_id]
+        elif key in self.samples:
+            return self.samples[key][node_id].get_mean()
+        elif key in self.custom_values:
+            return self.custom_values[key][node_id]
+        update_function, kwargs = self.computed_values_fcts[key]
+        return update_function(self.get_node_data(node_id), key, None,
+                               **kwargs)
 
-        self.data[node]['computed_values'][value_key] = \
-            update_function(self.data[node], value_key,
-                            update_param, **kwargs)
+    def get_node_data(self, node_id):
+        # Nested dict view of a node, as expected by custom update functions
+        counters = self.counters[node_id]
+        data = {'event_counter': dict((key, counters[key_id])
+                                      for key_id, key in enumerate(self.keys)
+                                      if counters[key_id] > 0),
+                'computed_values': dict()}
+        for key, values in self.sums.iteritems():
+            data['computed_values'][key] = values[node_id]
+        for key, values in self.samples.iteritems():
+            data['computed_values'][key] = values[node_id].get_mean()
+        for key, values in self.custom_values.iteritems():
+            data['computed_values'][key] = values[node_id]
+        return data
 
     def mean(self, dictionary, key, value, **kwargs):
         event_type = kwargs.pop('event_type', key)
@@ -72,38 +208,123 @@ class Result(object):
         except KeyError:
             return float('nan')
 
+    def get_active_nodes(self):
+        # Node ids (but general) with at least one event
+        return [node_id for node_id in xrange(1, len(self.nodes))
+                if any(self.counters[node_id])]
+
     def process_node_value(self, key, process_function, **kwargs):
-        nodes = self.data.keys()
-        nodes.remove('general')
-        [self.update_computed_value(key, None, node, None) for node in nodes]
-        values = [self.data[node]['computed_values'][key] for node in nodes]
+        values = [self.get_computed_value(key, node_id)
+                  for node_id in self.get_active_nodes()]
         return process_function(values, **kwargs)
 
-    def check_mean_convergence(self, key, epsilon=1.e-3):
+    def get_ratio_totals(self, key):
+        # Cumulative (numerator, denominator) of the general value of key
+        if key in self.samples:
+            samples = self.samples[key][0]
+            return samples.mean * samples.count, samples.count
         try:
-            cntr = self.convergence[key]['counter']
+            update_function, kwargs = self.computed_values_fcts[key]
         except KeyError:
-            self.convergence[key] = dict()
-            self.convergence[key]['counter'] = cntr = 0
-            self.convergence[key]['samples'] =\
-                [float('-inf') for i in xrange(self.check_samples)]
-        self.convergence[key]['samples'][cntr] =\
-            self.process_node_value(key, lambda x: sum(x) / len(x))
-        # Comparing all samples to the new one
-        res = map(lambda x: abs(self.convergence[key]['samples'][cntr] - x),
-                  self.convergence[key]['samples'])
-        self.convergence[key]['counter'] = (cntr + 1) % self.check_samples
-        if reduce(lambda x, y: x and y, [diff < epsilon for diff in res]):
-            return True
+            return 0., 0.  # Not updated yet
+        if update_function != self.event_division:
+            raise ValueError(key)
+        return (self.get_event_count(kwargs['key_numerator']),
+                self.get_event_count(kwargs['key_denominator']))
+
+    def set_precision_target(self, key, relative_precision, confidence=0.95,
+                             batch_size=100, zero_precision=None):
+        # key: ratio of event counters (event_division) or mean value.
+        # zero_precision: see Batch_means, None: a zero count never
+        # converges
+        batch_means = Batch_means(batch_size, zero_precision=zero_precision)
+        self.precision_targets[key] = [batch_means, relative_precision,
+                                       confidence, self.get_ratio_totals(key)]
+
+    def update_precision(self):
+        # Feeds the batch means with the values accumulated since the last
+        # call, O(1) in the number of nodes and of events
+        for key, target in self.precision_targets.iteritems():
+            numerator, denominator = self.get_ratio_totals(key)
+            if denominator > target[3][1]:
+                target[0].add(numerator - target[3][0],
+                              denominator - target[3][1])
+                target[3] = (numerator, denominator)
+
+    def has_converged(self):
+        if len(self.precision_targets) == 0:
+            return False
+        self.update_precision()
+        for batch_means, relative_precision, confidence, totals in\
+                self.precision_targets.itervalues():
+            if not batch_means.has_converged(relative_precision, confidence):
+                return False
+        return True
+
+    def set_warm_up_detection(self, key, batch_size=5):
+        # key: ratio of event counters or mean value, as precision targets
+        self.warm_up = [Mser(batch_size), self.get_ratio_totals(key), key]
+
+    def update_warm_up(self):
+        # Returns True when the end of the warm-up is detected, all
+        # statistics collected so far are then discarded
+        numerator, denominator = self.get_ratio_totals(self.warm_up[2])
+        last_numerator, last_denominator = self.warm_up[1]
+        if denominator > last_denominator:
+            self.warm_up[0].add(numerator - last_numerator,
+                                denominator - last_denominator)
+            self.warm_up[1] = (numerator, denominator)
+            if self.warm_up[0].truncation() is not None:
+                self.warm_up = None
+                self.reset_statistics()
+                return True
         return False
 
+    def reset_statistics(self):
+        # Zeroes counters and accumulators in place, keeping the key and
+        # node ids
+        for counters in self.counters:
+            counters[:] = [0] * len(counters)
+        for sums in self.sums.itervalues():
+            sums[:] = [0.] * len(sums)
+        for samples in self.samples.itervalues():
+            samples[:] = [Running_statistics(self.quantiles)
+                          for node in self.nodes]
+        for values in self.custom_values.itervalues():
+            values[:] = [0.] * len(values)
+        for node_ids in self.updated.itervalues():
+            node_ids.clear()
+        for target in self.precision_targets.itervalues():
+            target[0].clear()
+            target[3] = (0., 0.)
+        self.results = dict()
+
     def get_results(self):
-        self.results.update(self.data['general']['event_counter'])
-        self.results.update(self.data['general']['computed_values'])
-        for key in self.convergence:
-            self.results[key] =\
-                self.convergence[key]['samples'][
-                    self.convergence[key]['counter']]
+        for key_id, key in enumerate(self.keys):
+            if self.counters[0][key_id] > 0:
+                self.results[key] = self.counters[0][key_id]
+        for key, node_ids in self.updated.iteritems():
+            if 0 in node_ids:
+                self.results[key] = self.get_computed_value(key)
+        for key, samples in self.samples.iteritems():
+            if 0 in self.updated[key]:
+                self.results[key + '_std'] = samples[0].std()
+                for p, value in samples[0].get_quantiles():
+                    self.results['%s_p%d' % (key, round(100 * p))] = value
+        for key, (update_function, kwargs) in\
+                self.computed_values_fcts.iteritems():
+            if update_function == self.event_division:
+                numerator, denominator = self.get_ratio_totals(key)
+                if denominator > 0:
+                    self.results[key] = float(numerator) / denominator
+        self.update_precision()
+        for key, target in self.precision_targets.iteritems():
+            self.results[key + '_half_width'] =\
+                target[0].half_width(target[2])
+            # Nothing counted: the value is 0 with half_width as upper
+            # bound, not an estimate at the relative precision
+            if target[0].has_converged_on_zero(target[2]):
+                self.results[key + '_zero_count'] = True
         return self.results
 
     def print_results(self):
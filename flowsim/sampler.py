@@ -0,0 +1,151 @@
+import numpy
+from flowsim.event.event_types import Arrival_Event,\
+    Flow_allocation_failure_Event
+
+# Global gauges, one column each
+gauges = ['active_flows', 'pending_events', 'arrivals', 'blocked']
+# Rows allocated up front, doubled up to capacity as samples come in
+initial_rows = 64
+
+
+class Sampler(object):
+    # State of the network every interval of simulated time: global gauges
+    # and the number of flows on every (directed) edge. Samples are driven
+    # by Event_manager.handle_next_event, taken between two events, and
+    # kept in arrays of at most capacity rows, grown by doubling (a large
+    # topology costs capacity x edges only if the run fills them). Once
+    # full, every other sample is dropped and the interval doubled
+    # (downsample), or the oldest samples are overwritten.
+    # arrivals and blocked count from the end of the warm-up.
+
+    def __init__(self, simulation, interval, capacity=4096, downsample=True,
+                 edges=True):
+        self.simulation = simulation
+        self.interval = interval
+        self.capacity = capacity
+        self.downsample = downsample
+        self.next_time = 0.
+        self.index = 0  # Next row
+        self.count = 0  # Rows in use
+        rows = min(capacity, initial_rows)
+        self.times = numpy.zeros(rows)
+        self.gauges = numpy.zeros((rows, len(gauges)))
+
+        topology = simulation.topology
+        self.compact_graph = topology.compact_graph
+        if not edges:
+            self.edge_objects = []
+            edge_nodes = []
+        elif self.compact_graph is not None:
+            graph = self.compact_graph
+            self.edge_objects = None
+            self.capacities = numpy.array(graph.capacities, dtype=numpy.int64)
+            edge_nodes = [(graph.nodes[graph.sources[edge]],
+                           graph.nodes[graph.indices[edge]])
+                          for edge in xrange(graph.number_of_edges())]
+        else:
+            edge_list = list(topology.edges_iter(data=True))
+            self.edge_objects = [data['object']
+                                 for node1, node2, data in edge_list]
+            edge_nodes = [(node1, node2) for node1, node2, data in edge_list]
+        self.edge_sources = numpy.array([int(node1) for node1, node2 in
+                                         edge_nodes], dtype=numpy.int64)
+        self.edge_targets = numpy.array([int(node2) for node1, node2 in
+                                         edge_nodes], dtype=numpy.int64)
+        self.utilisation = numpy.zeros((rows, len(edge_nodes)),
+                                       dtype=numpy.int32)
+
+    def grow(self):
+        # Only reached before the first wrap around: rows are in order
+        rows = min(self.capacity, 2 * len(self.times))
+        for name in ('times', 'gauges', 'utilisation'):
+            array = getattr(self, name)
+            grown = numpy.zeros((rows,) + array.shape[1:], dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+
+    def get_utilisation(self):
+        # max_flows - available_flows of every edge
+        if self.edge_objects is None:
+            available = numpy.frombuffer(self.compact_graph.available,
+                                         dtype=numpy.int_)
+            return self.capacities - available
+        return [edge.max_flows - edge.available_flows
+                for edge in self.edge_objects]
+
+    def sample_until(self, time):
+        # Called before the clock moves to time: the state has been the
+        # current one since the previous event. The event at time is
+        # already popped, it is counted as pending
+        if self.next_time >= time:
+            return
+        event_manager = self.simulation.event_manager
+        counters = self.simulation.result.counters[0]
+        gauge_values = (len(self.simulation.flow_controller.flows),
+                        len(event_manager.event_list) + 1,
+                        counters[Arrival_Event.type_code],
+                        counters[Flow_allocation_failure_Event.type_code])
+        utilisation = self.get_utilisation()
+        while self.next_time < time:
+            if self.count == self.capacity:
+                if self.downsample:
+                    self.halve()
+                    if self.next_time >= time:
+                        break
+                else:
+                    self.count -= 1
+            row = self.index
+            if row == len(self.times):
+                self.grow()
+            self.times[row] = self.next_time
+            self.gauges[row] = gauge_values
+            self.utilisation[row] = utilisation
+            self.index = (row + 1) % self.capacity
+            self.count += 1
+            self.next_time += self.interval
+
+    def halve(self):
+        # Keeps the samples at multiples of the doubled interval. Only
+        # reached with downsample, the rows are in order from 0
+        start = 0 if int(round(self.times[0] / self.interval)) % 2 == 0\
+            else 1
+        kept = slice(start, self.count, 2)
+        count = len(xrange(*kept.indices(self.count)))
+        for array in (self.times, self.gauges, self.utilisation):
+            array[:count] = array[kept]
+        self.count = count
+        self.index = count
+        self.interval *= 2
+        self.next_time = self.times[count - 1] + self.interval
+
+    def get_rows(self, array):
+        # In chronological order
+        if self.count < self.capacity:
+            return array[:self.count]
+        return numpy.concatenate((array[self.index:], array[:self.index]))
+
+    def get_columns(self):
+        columns = {'time': self.get_rows(self.times),
+                   'edge_sources': self.edge_sources,
+                   'edge_targets': self.edge_targets,
+                   'utilisation': self.get_rows(self.utilisation)}
+        rows = self.get_rows(self.gauges)
+        for column, gauge in enumerate(gauges):
+            columns[gauge] = rows[:, column]
+        # Blocking rate between consecutive samples, NaN without arrivals.
+        # Counters restarting at the end of the warm-up count from zero
+        arrivals = columns['arrivals']
+        blocked = columns['blocked']
+        new_arrivals = numpy.diff(arrivals)
+        new_blocked = numpy.diff(blocked)
+        restarted = new_arrivals < 0
+        new_arrivals[restarted] = arrivals[1:][restarted]
+        new_blocked[restarted] = blocked[1:][restarted]
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            columns['blocking_rate'] = numpy.concatenate((
+                [numpy.nan], new_blocked / new_arrivals))
+        return columns
+
+    def save(self, filename):
+        # One array per column (numpy.load), utilisation is time x edge
+        numpy.savez(filename, **self.get_columns())
@@ -1,36 +1,123 @@
+import os
 from flowsim.result import Result
 from flowsim.random_generator import Random_generator
 from flowsim.event.event import Event_manager
+from flowsim.event.fast_engine import Fast_event_manager
 from flowsim.physical_layer.topology import Topology
 from flowsim.flow.flow_controller import Flow_controller
+from flowsim.flowsim_exception import InvalidPathTable, NoSuchEngine
 from flowsim.result import Result
+from flowsim.trace import Trace_recorder, Trace_replay
+from flowsim.instrumentation import Instrumentation
+from flowsim.rare_event import estimate_blocking_rate
+from flowsim.checkpoint import Checkpointer, save_checkpoint,\
+    copy_simulation
+
+
+event_managers = {'generic': Event_manager,
+                  'fast': Fast_event_manager}
+
+
+def create_event_manager(engine, *args):
+    try:
+        Event_manager_type = event_managers[engine]
+    except KeyError:
+        raise NoSuchEngine(engine)
+    return Event_manager_type(*args)
 
 
 class Simulation(object):
-    def __init__(self, arrival_rate, service_rate, rand_seed=None):
+    def __init__(self, arrival_rate, service_rate, rand_seed=None,
+                 event_queue='heap', rng_buffer=None, event_pool=False,
+                 precision_targets=None, confidence=0.95,
+                 zero_precision='default', warm_up_metric='Blocking_rate',
+                 engine='generic'):
         self.arrival_rate = arrival_rate
         self.service_rate = service_rate
         self.max_arrivals = float('inf')
         self.random_generator = None
         self.rand_seed = rand_seed
+        self.event_queue = event_queue  # 'heap', 'calendar' or 'ladder'
+        self.rng_buffer = rng_buffer  # NumPy block size, None: scalar draws
+        self.event_pool = event_pool  # Recycle handled events
+        # Upper bound below which a target that counted nothing (e.g. no
+        # blocking) stops the simulation, reported as <metric>_zero_count.
+        # None: a zero count never meets the target. 'default': 1e-4 with
+        # the default precision targets, so that a plain run always ends,
+        # None with given ones
+        if zero_precision == 'default':
+            zero_precision = 1e-4 if precision_targets is None else None
+        self.zero_precision = zero_precision
+        # Metric -> relative half-width of its confidence interval at which
+        # the simulation stops. Empty: run until max_arrivals
+        if precision_targets is None:
+            precision_targets = {'Blocking_rate': 0.05}
+        self.precision_targets = precision_targets
+        self.confidence = confidence
+        # Metric whose MSER truncation point ends the warm-up, None: no
+        # warm-up deletion
+        self.warm_up_metric = warm_up_metric
+        # 'generic' or 'fast': built-in events handled inline by the event
+        # loop, same results (see event.fast_engine)
+        self.engine = engine
         self.result = Result()
         self.topology = None
+        self.instrumentation = None  # See instrument
 
-    def init_simulation(self, nodes, edges):
+    def init_simulation(self, nodes, edges, k_paths=None,
+                        path_table_file=None, compact=False,
+                        track_flows=True):
         self.init_topology(nodes, edges)
+        self.init_components(k_paths, path_table_file, compact, track_flows)
+
+    def init_simulation_from_file(self, filename, k_paths=None,
+                                  path_table_file=None, compact=False,
+                                  track_flows=True):
+        # GraphML (.graphml) or binary topology file (see
+        # physical_layer.topology_file)
+        if filename.endswith('.graphml'):
+            self.import_topology(filename)
+        else:
+            self.load_topology(filename)
+        self.init_components(k_paths, path_table_file, compact, track_flows)
+
+    def init_simulation_from_arrays(self, arrays, k_paths=None,
+                                    path_table_file=None, compact=False,
+                                    track_flows=True):
+        # arrays: see physical_layer.generators and topology_file
+        self.topology = Topology()
+        self.topology.build_topology_from_arrays(
+            arrival_rate=self.arrival_rate, service_rate=self.service_rate,
+            **arrays)
+        self.init_components(k_paths, path_table_file, compact, track_flows)
+
+    def init_components(self, k_paths=None, path_table_file=None,
+                        compact=False, track_flows=True):
+        if not track_flows:
+            self.topology.set_flow_tracking(False)
+        if k_paths is not None:
+            self.init_path_table(k_paths, path_table_file)
+        if compact:
+            self.topology.freeze()
         self.init_random_generator()
         self.init_event_manager()
         self.init_flow_controller()
+        if self.instrumentation is not None:
+            self.instrumentation.attach(self)
 
     def init_random_generator(self, arrival_generation_function=None,
                               duration_function=None):
         self.random_generator = Random_generator(self.topology,
                                                  self.rand_seed,
                                                  arrival_generation_function,
-                                                 duration_function)
+                                                 duration_function,
+                                                 self.rng_buffer)
 
     def init_event_manager(self):
-        self.event_manager = Event_manager(self, self.random_generator)
+        self.event_manager = create_event_manager(self.engine, self,
+                                                  self.random_generator,
+                                                  self.event_queue,
+                                                  self.event_pool)
 
     def init_topology(self, nodes, edges):
         # nodes -> list of int
@@ -44,7 +131,28 @@ class Simulation(object):
 
     def import_topology(self, filename):
         self.topology = Topology()
-        self.topology.import_topology(filename)
+        self.topology.import_topology(filename, self.arrival_rate,
+                                      self.service_rate)
+
+    def load_topology(self, filename):
+        self.topology = Topology()
+        self.topology.load_topology(filename, self.arrival_rate,
+                                    self.service_rate)
+
+    def init_path_table(self, k_paths, filename=None):
+        # Routing becomes a lookup in the k shortest candidate paths of
+        # each entry/exit pair. The table is reused from filename when it
+        # was computed for the same topology and k
+        if filename is not None and os.path.exists(filename):
+            try:
+                self.topology.load_path_table(filename)
+            except InvalidPathTable:
+                pass
+            if self.topology.path_table_k == k_paths:
+                return
+        self.topology.precompute_paths(k_paths)
+        if filename is not None:
+            self.topology.save_path_table(filename)
 
     def init_flow_controller(self):
         self.flow_controller = Flow_controller(self.topology,
@@ -63,8 +171,90 @@ class Simulation(object):
         self.event_manager.start_event_processing()
         return self.result.get_results()
 
+    def launch_analytic(self, **options):
+        # Approximate Blocking_rate and mean_nodes_per_flow from the Erlang
+        # fixed point instead of simulating (see analytic), options: see
+        # Reduced_load.solve
+        from flowsim.analytic import Reduced_load
+        return Reduced_load(self.topology).solve(**options)
+
+    def launch_rare_event(self, cycles, **options):
+        # Blocking_rate and its confidence interval by RESTART splitting
+        # over cycles regeneration cycles, for very small blocking rates
+        # (see rare_event), options: see rare_event.estimate_blocking_rate
+        return estimate_blocking_rate(self, cycles, **options)
+
+    def warm_up_simulation(self, max_arrivals=float('inf')):
+        # Runs until the end of the warm-up (see warm_up_metric), the
+        # simulation is then continued by resume_simulation or forked
+        self.max_arrivals = max_arrivals
+        self.event_manager.init_event_processing()
+        self.event_manager.process_events(until_warm_up=True)
+        return self.event_manager.result.warm_up is None
+
+    def fork(self):
+        # Copy of the simulation in its current state: the copy draws the
+        # same random numbers as the original would. Only the original
+        # keeps recording its trace and saving its checkpoints (see
+        # record_trace and set_checkpoint)
+        return copy_simulation(self)
+
+    def resume_simulation(self):
+        # Continues a simulation loaded by checkpoint.load_checkpoint
+        self.event_manager.process_events()
+        return self.result.get_results()
+
+    def set_checkpoint(self, filename, every_events=None,
+                       every_seconds=None):
+        # After init_simulation. A run resumed from the checkpoint keeps
+        # saving it with the same period
+        self.event_manager.checkpointer = Checkpointer(self, filename,
+                                                       every_events,
+                                                       every_seconds)
+
+    def save_checkpoint(self, filename):
+        save_checkpoint(self, filename)
+
+    def record_trace(self, filename):
+        # After init_simulation, every handled arrival is written to
+        # filename (see trace)
+        self.event_manager.trace_recorder = Trace_recorder(filename)
+
+    def replay_trace(self, filename):
+        # After init_simulation, on the topology the trace was recorded on:
+        # arrivals are read from the trace instead of being drawn
+        self.event_manager.trace_replay = Trace_replay(filename,
+                                                       self.topology)
+
+    def instrument(self, timeline=False, gauge_interval=1.):
+        # After init_simulation: per-subsystem timings and gauges, added to
+        # get_results (see instrumentation). timeline: also keeps every
+        # timed call for Instrumentation.export_timeline
+        self.instrumentation = Instrumentation(timeline, gauge_interval)
+        self.instrumentation.attach(self)
+        return self.instrumentation
+
+    def sample(self, interval, capacity=4096, downsample=True, edges=True):
+        # After init_simulation: network state every interval of simulated
+        # time (see sampler), Sampler.save writes it to a .npz file
+        from flowsim.sampler import Sampler
+        self.event_manager.sampler = Sampler(self, interval, capacity,
+                                             downsample, edges)
+        return self.event_manager.sampler
+
+    def get_route_cache_info(self):
+        return self.topology.get_route_cache_info()
+
     def reset(self, arrival_rate=None, service_rate=None):
+        if arrival_rate is not None:
+            self.arrival_rate = arrival_rate
+        if service_rate is not None:
+            self.service_rate = service_rate
         self.topology.reset(arrival_rate, service_rate)
+        self.result = Result()
         self.init_random_generator()
         self.init_event_manager()
         self.init_flow_controller()
+        if self.instrumentation is not None:
+            self.instrumentation.clear()
+            self.instrumentation.attach(self)
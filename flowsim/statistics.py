@@ -0,0 +1,297 @@
+import math
+
+
+def normal_quantile(p):
+    # P. J. Acklam's rational approximation (relative error < 1.2e-9)
+    if p <= 0. or p >= 1.:
+        raise ValueError(p)
+    a = [-3.969683028665376e+01, 2.209460984245205e+02,
+         -2.759285104469687e+02, 1.383577518672690e+02,
+         -3.066479806614716e+01, 2.506628277459239e+00]
+    b = [-5.447609879822406e+01, 1.615858368580409e+02,
+         -1.556989798598866e+02, 6.680131188771972e+01,
+         -1.328068155288572e+01]
+    c = [-7.784894002430293e-03, -3.223964580411365e-01,
+         -2.400758277161838e+00, -2.549732539343734e+00,
+         4.374664141464968e+00, 2.938163982698783e+00]
+    d = [7.784695709041462e-03, 3.224671290700398e-01,
+         2.445134137142996e+00, 3.754408661907416e+00]
+    if p < 0.02425:
+        q = math.sqrt(-2. * math.log(p))
+        return (((((c[0] * q + c[1]) * q + c[2]) * q + c[3]) * q + c[4]) *
+                q + c[5]) / ((((d[0] * q + d[1]) * q + d[2]) * q + d[3]) *
+                             q + 1.)
+    if p > 1. - 0.02425:
+        return -normal_quantile(1. - p)
+    q = p - 0.5
+    r = q * q
+    return (((((a[0] * r + a[1]) * r + a[2]) * r + a[3]) * r + a[4]) * r +
+            a[5]) * q / (((((b[0] * r + b[1]) * r + b[2]) * r + b[3]) * r +
+                          b[4]) * r + 1.)
+
+
+def student_t_quantile(p, df):
+    if df < 1:
+        return float('nan')
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if df == 2:
+        return (2. * p - 1.) / math.sqrt(2. * p * (1. - p))
+    # Cornish-Fisher expansion around the normal quantile
+    z = normal_quantile(p)
+    z2 = z * z
+    return z + (z2 + 1.) * z / (4. * df) +\
+        ((5. * z2 + 16.) * z2 + 3.) * z / (96. * df ** 2) +\
+        (((3. * z2 + 19.) * z2 + 17.) * z2 - 15.) * z / (384. * df ** 3) +\
+        ((((79. * z2 + 776.) * z2 + 1482.) * z2 - 1920.) * z2 - 945.) *\
+        z / (92160. * df ** 4)
+
+
+def summarize(values, confidence=0.95):
+    # Mean, unbiased variance and Student confidence interval of
+    # independent samples
+    values = [float(value) for value in values]
+    n = len(values)
+    summary = {'n': n,
+               'mean': float('nan'),
+               'variance': float('nan'),
+               'half_width': float('nan'),
+               'lower': float('nan'),
+               'upper': float('nan')}
+    if n == 0:
+        return summary
+    mean = sum(values) / n
+    summary['mean'] = mean
+    if n > 1:
+        variance = sum((value - mean) ** 2 for value in values) / (n - 1)
+        summary['variance'] = variance
+        summary['half_width'] =\
+            student_t_quantile(0.5 + confidence / 2., n - 1) *\
+            math.sqrt(variance / n)
+    summary['lower'] = mean - summary['half_width']
+    summary['upper'] = mean + summary['half_width']
+    return summary
+
+
+class P2_quantile(object):
+    # R. Jain, I. Chlamtac, "The P2 algorithm for dynamic calculation of
+    # quantiles and histograms without storing observations", CACM 1985.
+    # Five markers, O(1) memory and time per observation.
+
+    def __init__(self, p):
+        self.p = p
+        self.heights = []
+        self.positions = [0, 1, 2, 3, 4]
+        self.desired = [0., 2. * p, 4. * p, 2. + 2. * p, 4.]
+        self.increments = [0., p / 2., p, (1. + p) / 2., 1.]
+
+    def add(self, value):
+        heights = self.heights
+        if len(heights) < 5:
+            heights.append(value)
+            heights.sort()
+            return
+        if value < heights[0]:
+            heights[0] = value
+            k = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            k = 3
+        else:
+            k = 0
+            while value >= heights[k + 1]:
+                k += 1
+        positions = self.positions
+        for i in xrange(k + 1, 5):
+            positions[i] += 1
+        desired = self.desired
+        for i in xrange(5):
+            desired[i] += self.increments[i]
+        for i in xrange(1, 4):
+            delta = desired[i] - positions[i]
+            if (delta >= 1. and positions[i + 1] - positions[i] > 1) or\
+                    (delta <= -1. and positions[i - 1] - positions[i] < -1):
+                step = 1 if delta > 0 else -1
+                height = self.parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = heights[i] + step *\
+                        (heights[i + step] - heights[i]) /\
+                        (positions[i + step] - positions[i])
+                heights[i] = height
+                positions[i] += step
+
+    def parabolic(self, i, step):
+        q = self.heights
+        n = self.positions
+        return q[i] + float(step) / (n[i + 1] - n[i - 1]) *\
+            ((n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+             (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    def value(self):
+        if len(self.heights) == 0:
+            return float('nan')
+        if len(self.heights) < 5:
+            index = int(round(self.p * (len(self.heights) - 1)))
+            return self.heights[index]
+        return self.heights[2]
+
+
+class Running_statistics(object):
+    # Welford's online mean and variance, plus P2 quantile estimates
+
+    def __init__(self, quantiles=()):
+        self.count = 0
+        self.mean = 0.
+        self.m2 = 0.
+        self.quantiles = [P2_quantile(p) for p in quantiles]
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        for quantile in self.quantiles:
+            quantile.add(value)
+
+    def get_mean(self):
+        return self.mean if self.count > 0 else float('nan')
+
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else float('nan')
+
+    def std(self):
+        return math.sqrt(self.variance())
+
+    def get_quantiles(self):
+        return [(quantile.p, quantile.value()) for quantile in self.quantiles]
+
+
+class Batch_means(object):
+    # Ratio estimator sum(numerators) / sum(denominators) with a batch
+    # means confidence interval. Observations are accumulated into batches
+    # of batch_size denominator units; when 2 * n_batches batches are
+    # closed, adjacent batches are merged and batch_size doubles, so the
+    # memory stays O(n_batches) while batches grow long enough to be
+    # nearly independent.
+    # With nothing counted in the closed batches (e.g. no blocking), the
+    # relative precision cannot be met: the half-width is then the upper
+    # confidence bound of a zero count, -log(1 - confidence) / denominator
+    # ("rule of three" at 95%). With a zero_precision, the estimate has
+    # converged once that bound is below it, otherwise it never converges
+    # on a zero count.
+
+    def __init__(self, batch_size=100., n_batches=20, min_batches=10,
+                 zero_precision=None):
+        self.initial_batch_size = float(batch_size)
+        self.n_batches = n_batches
+        self.min_batches = min_batches
+        self.zero_precision = zero_precision
+        self.clear()
+
+    def clear(self):
+        self.batch_size = self.initial_batch_size
+        self.batches = []  # (numerator, denominator) of closed batches
+        self.numerator = 0.  # Current batch
+        self.denominator = 0.
+        self.total_numerator = 0.
+        self.total_denominator = 0.
+
+    def add(self, numerator, denominator=1.):
+        self.numerator += numerator
+        self.denominator += denominator
+        self.total_numerator += numerator
+        self.total_denominator += denominator
+        if self.denominator >= self.batch_size:
+            self.batches.append((self.numerator, self.denominator))
+            self.numerator = self.denominator = 0.
+            if len(self.batches) == 2 * self.n_batches:
+                batches = self.batches
+                self.batches = [(batches[i][0] + batches[i + 1][0],
+                                 batches[i][1] + batches[i + 1][1])
+                                for i in xrange(0, len(batches), 2)]
+                self.batch_size *= 2.
+
+    def get_mean(self):
+        if self.total_denominator == 0:
+            return float('nan')
+        return self.total_numerator / self.total_denominator
+
+    def half_width(self, confidence=0.95):
+        n = len(self.batches)
+        if n < 2:
+            return float('inf')
+        if self.is_zero():
+            return -math.log(1. - confidence) /\
+                sum(denominator for numerator, denominator in self.batches)
+        values = [numerator / denominator
+                  for numerator, denominator in self.batches]
+        mean = sum(values) / n
+        variance = sum((value - mean) ** 2 for value in values) / (n - 1)
+        return student_t_quantile(0.5 + confidence / 2., n - 1) *\
+            math.sqrt(variance / n)
+
+    def is_zero(self):
+        # Nothing counted in the closed batches
+        return not any(numerator for numerator, denominator in self.batches)
+
+    def has_converged_on_zero(self, confidence=0.95):
+        # Zero count whose upper bound is below zero_precision: the
+        # estimate is only an upper bound, not a relative precision
+        return self.zero_precision is not None and\
+            len(self.batches) >= self.min_batches and self.is_zero() and\
+            self.half_width(confidence) <= self.zero_precision
+
+    def has_converged(self, relative_precision, confidence=0.95):
+        if len(self.batches) < self.min_batches:
+            return False
+        if self.is_zero():
+            return self.has_converged_on_zero(confidence)
+        return self.half_width(confidence) <=\
+            relative_precision * abs(self.get_mean())
+
+
+class Mser(object):
+    # MSER truncation rule (K. P. White, 1997) on the means of batches of
+    # batch_size denominator units: the warm-up is the number of leading
+    # batches d minimizing the variance of the mean of the remaining ones,
+    # sum((Z_i - mean_d)^2) / (m - d)^2. It is accepted once d falls in
+    # the first half of the series, otherwise more data is needed.
+
+    def __init__(self, batch_size=5., min_batches=20):
+        self.batch_size = float(batch_size)
+        self.min_batches = min_batches
+        self.values = []
+        self.numerator = 0.  # Current batch
+        self.denominator = 0.
+        self.next_test = min_batches
+
+    def add(self, numerator, denominator=1.):
+        self.numerator += numerator
+        self.denominator += denominator
+        if self.denominator >= self.batch_size:
+            self.values.append(self.numerator / self.denominator)
+            self.numerator = self.denominator = 0.
+
+    def truncation(self):
+        # Number of warm-up batches, None if not detected yet. Tested on a
+        # geometric schedule to keep the amortized cost O(1) per batch
+        values = self.values
+        m = len(values)
+        if m < self.next_test:
+            return None
+        self.next_test = max(m + 1, int(m * 1.1))
+        total = square_total = 0.
+        best_mser = float('inf')
+        best_d = None
+        for d in xrange(m - 1, -1, -1):
+            total += values[d]
+            square_total += values[d] * values[d]
+            if d <= m // 2:
+                n = m - d
+                mser = (square_total - total * total / n) / (n * n)
+                if mser <= best_mser:
+                    best_mser = mser
+                    best_d = d
+        if best_d < m // 2:
+            return best_d
+        return None
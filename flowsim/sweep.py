@@ -0,0 +1,136 @@
+import csv
+import itertools
+import multiprocessing
+import os
+from flowsim.simulation import Simulation
+from flowsim.replication import derive_seed, merge_results
+
+# Simulation built once per worker process by init_worker
+worker_simulation = None
+
+
+def init_worker(nodes, edges, simulation_options, init_options):
+    global worker_simulation
+    # Rates and seed are set for each task by run_point_replica
+    worker_simulation = Simulation(None, None, **simulation_options)
+    worker_simulation.init_simulation(nodes, edges, **init_options)
+
+
+def run_point_replica(task):
+    point, arrival_rate, service_rate, rand_seed, max_arrivals = task
+    worker_simulation.rand_seed = rand_seed
+    worker_simulation.reset(arrival_rate, service_rate)
+    return point, worker_simulation.launch_simulation(max_arrivals)
+
+
+def grid(arrival_rates, service_rates):
+    return list(itertools.product(arrival_rates, service_rates))
+
+
+class Sweep(object):
+    # Every (point, replica) is scheduled on the pool. A point is written to
+    # the tab separated output as soon as all its replicas are done; points
+    # already in the output are skipped, so an interrupted sweep is resumed
+    # by running it again.
+
+    def __init__(self, nodes, edges, points, replicas, output,
+                 metrics=('Blocking_rate', 'mean_nodes_per_flow'),
+                 processes=None, base_seed=0, max_arrivals=float('inf'),
+                 simulation_options=None, init_options=None,
+                 confidence=0.95):
+        # points: list of (arrival_rate, service_rate), see grid()
+        self.nodes = nodes
+        self.edges = edges
+        self.points = [(float(arrival_rate), float(service_rate))
+                       for arrival_rate, service_rate in points]
+        # Results are collected by point
+        if len(set(self.points)) != len(self.points):
+            raise ValueError('duplicated sweep points: %r' % sorted(
+                point for point in set(self.points)
+                if self.points.count(point) > 1))
+        self.replicas = replicas
+        self.output = output
+        self.metrics = list(metrics)
+        self.processes = processes if processes is not None else\
+            multiprocessing.cpu_count()
+        self.base_seed = base_seed
+        self.max_arrivals = max_arrivals
+        self.simulation_options = simulation_options or dict()
+        self.init_options = init_options or dict()
+        self.confidence = confidence
+
+    def get_columns(self):
+        columns = ['arrival_rate', 'service_rate', 'replicas']
+        for metric in self.metrics:
+            columns.extend([metric, metric + '_variance',
+                            metric + '_half_width'])
+        return columns
+
+    def read_rows(self):
+        if not os.path.exists(self.output):
+            return []
+        with open(self.output, 'rb') as output:
+            return list(csv.DictReader(output, delimiter='\t'))
+
+    def get_done_points(self):
+        return set((float(row['arrival_rate']), float(row['service_rate']))
+                   for row in self.read_rows())
+
+    def get_tasks(self, points):
+        # Replica i uses the same seed at every point (common random numbers)
+        return [(point, point[0], point[1],
+                 derive_seed(self.base_seed, replica), self.max_arrivals)
+                for point in points for replica in xrange(self.replicas)]
+
+    def make_row(self, point, results):
+        merged = merge_results(results, self.confidence)
+        row = {'arrival_rate': repr(point[0]),
+               'service_rate': repr(point[1]),
+               'replicas': len(results)}
+        for metric in self.metrics:
+            summary = merged.get(metric, dict())
+            row[metric] = repr(summary.get('mean', float('nan')))
+            row[metric + '_variance'] =\
+                repr(summary.get('variance', float('nan')))
+            row[metric + '_half_width'] =\
+                repr(summary.get('half_width', float('nan')))
+        return row
+
+    def run(self):
+        done = self.get_done_points()
+        points = [point for point in self.points if point not in done]
+        if len(points) == 0:
+            return []
+        tasks = self.get_tasks(points)
+        initargs = (self.nodes, self.edges, self.simulation_options,
+                    self.init_options)
+        pool = None
+        if self.processes <= 1:
+            init_worker(*initargs)
+            finished = itertools.imap(run_point_replica, tasks)
+        else:
+            pool = multiprocessing.Pool(self.processes, init_worker,
+                                        initargs)
+            finished = pool.imap_unordered(run_point_replica, tasks)
+
+        new_file = not os.path.exists(self.output)
+        rows = []
+        pending = dict((point, []) for point in points)
+        try:
+            with open(self.output, 'ab') as output:
+                writer = csv.DictWriter(output, self.get_columns(),
+                                        delimiter='\t')
+                if new_file:
+                    writer.writeheader()
+                for point, results in finished:
+                    pending[point].append(results)
+                    if len(pending[point]) == self.replicas:
+                        row = self.make_row(point, pending.pop(point))
+                        writer.writerow(row)
+                        output.flush()
+                        rows.append(row)
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+        return rows
@@ -0,0 +1,37 @@
+import unittest
+import os
+import tempfile
+from flowsim import Simulation
+
+# Ring of four nodes with a chord, shared by the tests of the simulation
+# features (checkpoint, trace, engines...)
+nodes = [0, 1, 2, 3]
+edges = [(0, 1), (1, 2), (2, 3), (3, 0), (0, 2)]
+
+
+def create_simulation(rand_seed=1234, init_options=None, **options):
+    # options: Simulation keyword arguments, init_options: init_simulation
+    # ones
+    sim = Simulation(0.9, 0.9, rand_seed, **options)
+    sim.init_simulation(nodes, edges, **(init_options or {}))
+    return sim
+
+
+class Temporary_file_test_case(unittest.TestCase):
+    # self.filename: an empty temporary file, removed after each test with
+    # the ones from new_filename
+
+    def setUp(self):
+        self.filenames = []
+        self.filename = self.new_filename()
+
+    def tearDown(self):
+        for filename in self.filenames:
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def new_filename(self):
+        handle, filename = tempfile.mkstemp()
+        os.close(handle)
+        self.filenames.append(filename)
+        return filename
@@ -0,0 +1,58 @@
+import unittest
+import numpy
+from flowsim import Simulation
+from flowsim.analytic import erlang_b, Reduced_load, screen
+from flowsim.physical_layer.topology import torus2D
+
+
+class Test_analytic(unittest.TestCase):
+
+    def test_erlang_b(self):
+        assert numpy.allclose(erlang_b([1., 5., 2., 0.], [1, 10, 0, 3]),
+                              [0.5, 0.0183845, 1., 0.], atol=1e-7)
+
+    def test_single_link(self):
+        # Each direction is a M/M/1/1 system offered 1 Erlang
+        sim = Simulation(0.9, 0.9, 1, precision_targets={},
+                         warm_up_metric=None)
+        sim.init_simulation([0, 1], [(0, 1, 1)])
+        results = sim.launch_analytic()
+        assert abs(results['Blocking_rate'] - 0.5) < 1e-9
+        assert results['mean_nodes_per_flow'] == 2
+        simulated = sim.launch_simulation(20000)
+        assert set(results) <= set(simulated)
+        assert abs(simulated['Blocking_rate'] - 0.5) < 0.02
+
+    def test_line(self):
+        # Routes 0-2 cross both links: fixed point against the simulation,
+        # no alternate route exists
+        sim = Simulation(0.5, 1., 1, precision_targets={},
+                         warm_up_metric=None, engine='fast')
+        sim.init_simulation([0, 1, 2], [(0, 1, 2), (1, 2, 2)])
+        results = sim.launch_analytic(tolerance=1e-12)
+        simulated = sim.launch_simulation(30000)
+        assert abs(results['Blocking_rate'] -
+                   simulated['Blocking_rate']) < 0.01
+        assert abs(results['mean_nodes_per_flow'] -
+                   simulated['mean_nodes_per_flow']) < 0.02
+
+    def test_screen(self):
+        sim = Simulation(1., 1., 1)
+        nodes, edges = torus2D(4, 4)
+        sim.init_simulation(nodes, [edge + (3,) for edge in edges])
+        points = [(rate, 0.5) for rate in [0.1, 0.5, 1., 2.]]
+        results = screen(sim.topology, points)
+        assert [point for point, values in results] == points
+        blocking_rates = [values['Blocking_rate'] for point, values in results]
+        assert blocking_rates == sorted(blocking_rates)
+        assert 0 < blocking_rates[0] < blocking_rates[-1] < 1
+
+    def test_unreachable(self):
+        sim = Simulation(1., 1., 1)
+        sim.init_simulation([0, 1, 2, 3], [(0, 1, 0), (2, 3, 1)])
+        solver = Reduced_load(sim.topology)
+        results = solver.solve()
+        # 0-1 has no capacity, the other pairs no path but 2-3 and 3-2,
+        # offered 1 / 3 Erlang each
+        assert solver.route_blocking.tolist().count(1.) == 10
+        assert abs(results['Blocking_rate'] - (10 + 2 * 0.25) / 12.) < 1e-9
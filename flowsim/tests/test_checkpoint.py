@@ -0,0 +1,40 @@
+import os
+from flowsim.checkpoint import load_checkpoint
+from flowsim.flowsim_exception import InvalidCheckpoint
+from fixtures import create_simulation, Temporary_file_test_case
+
+
+class Test_checkpoint(Temporary_file_test_case):
+
+    def setUp(self):
+        Temporary_file_test_case.setUp(self)
+        os.remove(self.filename)  # Written by the checkpoints only
+
+    def run_simulation(self, checkpoint, **options):
+        sim = create_simulation(init_options=self.init_options, **options)
+        if checkpoint:
+            sim.set_checkpoint(self.filename, every_events=700)
+        return sim.launch_simulation(2000)
+
+    def check_resume(self, **options):
+        uninterrupted = self.run_simulation(False, **options)
+        assert self.run_simulation(True, **options) == uninterrupted
+        # Resuming from the last checkpoint, which keeps being updated
+        sim = load_checkpoint(self.filename)
+        assert len(sim.event_manager.event_list) > 0
+        assert sim.resume_simulation() == uninterrupted
+
+    def test_resume(self):
+        self.init_options = dict()
+        self.check_resume()
+        self.check_resume(precision_targets={}, warm_up_metric=None)
+
+    def test_resume_options(self):
+        self.init_options = {'compact': True, 'track_flows': False}
+        self.check_resume(event_queue='ladder', rng_buffer=64,
+                          event_pool=True)
+
+    def test_invalid_checkpoint(self):
+        with open(self.filename, 'wb') as checkpoint_file:
+            checkpoint_file.write('not a checkpoint')
+        self.assertRaises(InvalidCheckpoint, load_checkpoint, self.filename)
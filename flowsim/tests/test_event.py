@@ -1,7 +1,11 @@
 #!/usr/bin/pyton
 
 import unittest
+import random
 from flowsim.event.event import *
+from flowsim.event.event_queue import create_event_queue, event_queues
+from flowsim.event.event_types import get_slot_names
+from flowsim.flowsim_exception import NoSuchEventQueue
 from flowsim.random_generator import Random_generator
 
 
@@ -121,6 +125,177 @@ class Test_Event_manager(unittest.TestCase):
 
         type_list = self.create_events(event_manager)
 
-        for i in xrange(len(event_manager.event_list)-1):
-            assert event_manager.event_list[i].delay_before_handling >=\
-                event_manager.event_list[i].delay_before_handling
+        times = []
+        while len(event_manager.event_list) > 0:
+            times.append(event_manager.event_list.pop().handling_time)
+        assert times == sorted(times)
+
+    def test_event_pool(self):
+        event_manager = Event_manager(Simu(), self.rand_gen, event_pool=True)
+        event_manager.set_flow_controller(Flow_controller())
+        flow = Flow()
+
+        event_manager.add_event(End_flow_Event, Node(), delay=1.,
+                                issuer_flow=flow)
+        event = iter(event_manager.event_list).next()
+        assert not hasattr(event, '__dict__')
+        event_manager.handle_next_event()
+        assert event.flow is None
+
+        event_manager.add_event(End_flow_Event, Node(), delay=2.,
+                                issuer_flow=flow)
+        assert event_manager.event_list.pop() is event
+        assert event.flow is flow and event.handling_time == 3.
+
+    def test_event_state(self):
+        class Tagged_end_flow_Event(End_flow_Event):
+            pass
+
+        assert get_slot_names(Tagged_end_flow_Event) ==\
+            get_slot_names(Event) + ['flow']
+        event_manager = Event_manager(Simu(), self.rand_gen)
+        flow = Flow()
+        event_manager.add_event(Tagged_end_flow_Event, Node(), delay=1.,
+                                issuer_flow=flow)
+        event = event_manager.event_list.pop()
+        event.tag = 'a'
+        copy = Tagged_end_flow_Event.__new__(Tagged_end_flow_Event)
+        copy.__setstate__(event.__getstate__())
+        assert copy.flow is flow and copy.handling_time == 1.
+        assert copy.tag == 'a'
+
+    def test_event_order(self):
+        event_manager = Event_manager(Simu(), self.rand_gen)
+        event_manager.set_flow_controller(Flow_controller())
+
+        for delay in [5., 1., 3.]:
+            event_manager.add_event(End_flow_Event,
+                                    Node(),
+                                    delay=delay,
+                                    issuer_flow=None)
+        event_manager.add_event(Flow_allocation_failure_Event, Node())
+
+        event_manager.handle_next_event()
+        assert event_manager.get_current_time() == 0.
+        times = []
+        while len(event_manager.event_list) > 0:
+            event_manager.handle_next_event()
+            times.append(event_manager.get_current_time())
+        assert times == [1., 3., 5.]
+
+        # Delays are relative to the time the event is added
+        event_manager.add_event(End_of_simulation_Event, Node(), delay=2.)
+        event_manager.handle_next_event()
+        assert event_manager.get_current_time() == 7.
+
+
+class Test_random_generator(unittest.TestCase):
+
+    def test_streams(self):
+        state = random.getstate()
+        gen1 = Random_generator(Topo(), 5)
+        gen2 = Random_generator(Topo(), 5)
+        assert random.getstate() == state
+
+        arrivals = [gen1.next_arrival(1.) for i in xrange(10)]
+        # Destination draws do not shift the arrival stream
+        durations = []
+        for i in xrange(10):
+            gen2.randint()
+            durations.append(gen2.rand_duration(1.))
+            assert gen2.next_arrival(1.) == arrivals[i]
+        assert durations == [gen1.rand_duration(1.) for i in xrange(10)]
+        assert Random_generator(Topo(), 6).next_arrival(1.) != arrivals[0]
+
+        gen = Random_generator(Topo())
+        assert gen.rand_seed is not None
+
+    def test_buffered(self):
+        gen = Random_generator(Topo(), 5, buffer_size=100)
+        arrivals = [gen.next_arrival(2.) for i in xrange(5000)]
+        assert abs(sum(arrivals) / len(arrivals) - 0.5) < 0.05
+        durations = [gen.rand_duration(4.) for i in xrange(5000)]
+        assert abs(sum(durations) / len(durations) - 0.25) < 0.025
+        draws = [gen.randint() for i in xrange(5000)]
+        assert min(draws) >= 0 and max(draws) <= Random_generator.max_int
+        assert type(draws[0]) == int
+
+        other = Random_generator(Topo(), 5, buffer_size=7)
+        assert [other.next_arrival(2.) for i in xrange(5000)] == arrivals
+
+
+class Fake_event(object):
+
+    def __init__(self, handling_time, sequence):
+        self.handling_time = handling_time
+        self.sequence = sequence
+
+
+class Test_event_queue(unittest.TestCase):
+
+    def check_queue(self, name, rand):
+        queue = create_event_queue(name)
+        expected = []
+        sequence = 0
+        now = 0.
+        for step in xrange(3000):
+            if len(queue) == 0 or rand.random() < 0.55:
+                if rand.random() < 0.1:
+                    time = float('-inf')
+                elif rand.random() < 0.1:
+                    time = now  # Ties
+                else:
+                    time = now + rand.expovariate(1.)
+                event = Fake_event(time, sequence)
+                sequence += 1
+                queue.push(event)
+                expected.append((time, event.sequence))
+            else:
+                expected.sort()
+                event = queue.pop()
+                assert (event.handling_time, event.sequence) ==\
+                    expected.pop(0)
+                now = max(now, event.handling_time)
+            assert len(queue) == len(expected)
+        assert sorted((e.handling_time, e.sequence) for e in queue) ==\
+            sorted(expected)
+        while len(expected) > 0:
+            expected.sort()
+            event = queue.pop()
+            assert (event.handling_time, event.sequence) == expected.pop(0)
+        self.assertRaises(IndexError, queue.pop)
+
+    def test_queues(self):
+        for name in event_queues:
+            self.check_queue(name, random.Random(12))
+
+    def test_same_order_as_heap(self):
+        # Mostly near times, some far ahead and some rounded (ties): the
+        # ladder queue gets rungs with later pushes into their range
+        for seed in xrange(20):
+            for name in ['calendar', 'ladder']:
+                rand = random.Random(seed)
+                queue = create_event_queue(name)
+                heap = create_event_queue('heap')
+                now = 0.
+                for sequence in xrange(3000):
+                    if len(heap) == 0 or rand.random() < 0.55:
+                        draw = rand.random()
+                        if draw < 0.8:
+                            time = now + rand.expovariate(1.)
+                        elif draw < 0.95:
+                            time = now + rand.uniform(0., 50.)
+                        else:
+                            time = now
+                        if rand.random() < 0.2:
+                            time = max(now, round(time, 3))
+                        event = Fake_event(time, sequence)
+                        queue.push(event)
+                        heap.push(event)
+                    else:
+                        event = heap.pop()
+                        assert queue.pop() is event, (name, seed)
+                        now = event.handling_time
+
+    def test_unknown_queue(self):
+        self.assertRaises(NoSuchEventQueue, create_event_queue, 'list')
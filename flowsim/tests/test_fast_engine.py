@@ -0,0 +1,96 @@
+import numpy
+from flowsim import Simulation
+from flowsim.checkpoint import load_checkpoint
+from flowsim.event.event import Event_manager
+from flowsim.simulation import event_managers
+from flowsim.flowsim_exception import NoSuchEngine
+from flowsim.physical_layer.topology import torus2D
+from fixtures import create_simulation, Temporary_file_test_case
+
+
+class Test_fast_engine(Temporary_file_test_case):
+
+    def check_engines(self, arrivals=3000, init_options=None, **options):
+        results = [create_simulation(engine=engine,
+                                     init_options=init_options,
+                                     **options).launch_simulation(arrivals)
+                   for engine in ['generic', 'fast']]
+        assert results[0] == results[1]
+        return results[1]
+
+    def test_same_results(self):
+        self.check_engines()
+        self.check_engines(precision_targets={}, warm_up_metric=None)
+        self.check_engines(event_queue='ladder', rng_buffer=64,
+                           event_pool=True,
+                           init_options={'compact': True,
+                                         'track_flows': False})
+
+    def test_torus(self):
+        nodes, edges = torus2D(4, 4)
+        results = []
+        for engine in ['generic', 'fast']:
+            sim = Simulation(1., 0.2, 1, precision_targets={},
+                             warm_up_metric=None, engine=engine)
+            sim.init_simulation(nodes, [edge + (2,) for edge in edges])
+            results.append(sim.launch_simulation(3000))
+        assert results[0] == results[1]
+        assert results[1]['Blocking_rate'] > 0
+
+    def test_checkpoint(self):
+        expected = create_simulation(engine='generic').launch_simulation(3000)
+        sim = create_simulation(engine='fast')
+        sim.set_checkpoint(self.filename, every_events=701)
+        assert sim.launch_simulation(3000) == expected
+        sim = load_checkpoint(self.filename)
+        assert sim.resume_simulation() == expected
+
+    def test_fork(self):
+        results = []
+        for engine in ['generic', 'fast']:
+            sim = create_simulation(engine=engine, precision_targets={})
+            sim.warm_up_simulation(3000)
+            fork = sim.fork()
+            results.append((sim.resume_simulation(),
+                            fork.resume_simulation()))
+        assert results[0][0] == results[0][1] == results[1][0] ==\
+            results[1][1]
+
+    def test_trace_and_sampler(self):
+        sim = create_simulation(engine='generic', precision_targets={})
+        sim.record_trace(self.filename)
+        expected = sim.launch_simulation(2000)
+        columns = []
+        for engine in ['generic', 'fast']:
+            sim = create_simulation(engine=engine, precision_targets={})
+            sampler = sim.sample(0.5)
+            sim.replay_trace(self.filename)
+            assert sim.launch_simulation() == expected
+            columns.append(sampler.get_columns())
+        for key, values in columns[0].iteritems():
+            # NaN-aware: the first blocking_rate sample is NaN
+            numpy.testing.assert_array_equal(values, columns[1][key])
+
+    def test_instrumented(self):
+        sim = create_simulation(engine='fast')
+        sim.instrument()
+        results = sim.launch_simulation(3000)
+        assert results['calls_dispatch'] > 0
+        assert results['Blocking_rate'] ==\
+            self.check_engines()['Blocking_rate']
+
+    def test_no_such_engine(self):
+        self.assertRaises(NoSuchEngine, create_simulation, engine='slow')
+
+        # Errors of the engine itself are not hidden
+        class Broken_event_manager(Event_manager):
+
+            def __init__(self, *args):
+                raise KeyError('broken')
+
+        event_managers['broken'] = Broken_event_manager
+        try:
+            self.assertRaises(KeyError, create_simulation,
+                              engine='broken')
+        finally:
+            del event_managers['broken']
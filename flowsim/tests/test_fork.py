@@ -0,0 +1,89 @@
+import os
+from flowsim import Simulation
+from flowsim.checkpoint import load_checkpoint
+from flowsim.fork import Fork_runner
+from flowsim.flowsim_exception import EdgeAllocationError
+from fixtures import Temporary_file_test_case
+
+
+def double_capacity(simulation):
+    topology = simulation.topology
+    for node1, node2 in topology.edges():
+        topology.set_edge_capacity(node1, node2, 2)
+
+
+class Test_fork(Temporary_file_test_case):
+
+    def create(self, **init_options):
+        sim = Simulation(0.9, 0.9, 11, precision_targets={})
+        sim.init_simulation([0, 1, 2], [(0, 1), (1, 2), (2, 0)],
+                            **init_options)
+        assert sim.warm_up_simulation()
+        return sim
+
+    def test_fork(self):
+        sim = self.create()
+        time = sim.event_manager.get_current_time()
+        fork = sim.fork()
+        assert fork.event_manager.get_current_time() == time
+        assert len(fork.event_manager.event_list) ==\
+            len(sim.event_manager.event_list)
+        # Common random numbers: both continue identically
+        sim.max_arrivals = fork.max_arrivals = 1000
+        assert fork.resume_simulation() == sim.resume_simulation()
+
+    def test_fork_checkpoint(self):
+        # Only the original saves its checkpoints
+        os.remove(self.filename)
+        sim = self.create()
+        sim.set_checkpoint(self.filename, every_events=100)
+        fork = sim.fork()
+        assert fork.event_manager.checkpointer is None
+        double_capacity(fork)
+        fork.max_arrivals = 1000
+        fork.resume_simulation()
+        assert not os.path.exists(self.filename)
+        sim.max_arrivals = 1000
+        sim.resume_simulation()
+        loaded = load_checkpoint(self.filename)
+        assert [data['object'].max_flows for node1, node2, data in
+                loaded.topology.edges(data=True)] == [1] * 6
+
+    def test_runner(self):
+        for init_options in [dict(), {'compact': True}]:
+            runner = Fork_runner(self.create(**init_options), processes=1)
+            serial = runner.run([None, double_capacity, None], 3000)
+            assert serial[0] == serial[2]
+            assert serial[1]['Blocking_rate'] < serial[0]['Blocking_rate']
+            runner.processes = 2
+            assert runner.run([None, double_capacity, None], 3000) == serial
+
+    def test_runner_trace(self):
+        # Variants run in other processes do not write to the trace of
+        # the original
+        filenames = [self.filename, self.new_filename()]
+        for processes, filename in zip([None, 2], filenames):
+            sim = Simulation(0.9, 0.9, 11, precision_targets={})
+            sim.init_simulation([0, 1, 2], [(0, 1), (1, 2), (2, 0)])
+            sim.record_trace(filename)
+            assert sim.warm_up_simulation()
+            if processes is not None:
+                Fork_runner(sim, processes).run([None, double_capacity],
+                                                3000)
+            sim.max_arrivals = 1000
+            sim.resume_simulation()
+        with open(filenames[0], 'rb') as expected:
+            with open(filenames[1], 'rb') as trace:
+                assert trace.read() == expected.read()
+
+    def test_set_edge_capacity(self):
+        sim = Simulation(0.9, 0.9, 11)
+        sim.init_simulation([0, 1], [(0, 1)])
+        node0, node1 = sorted(sim.topology.nodes(), key=int)
+        flow = sim.flow_controller.allocate_flow(node0, node1)
+        self.assertRaises(EdgeAllocationError,
+                          sim.topology.set_edge_capacity, node0, node1, 0)
+        sim.topology.set_edge_capacity(node0, node1, 2)
+        assert sim.topology[node0][node1]['weight'] == 1
+        sim.flow_controller.allocate_flow(node0, node1)
+        assert sim.topology[node0][node1]['weight'] == float('inf')
@@ -0,0 +1,95 @@
+import json
+from flowsim.checkpoint import load_checkpoint
+from fixtures import create_simulation, Temporary_file_test_case
+
+
+class Test_instrumentation(Temporary_file_test_case):
+
+    def create_simulation(self, **init_options):
+        # Runs until max_arrivals
+        return create_simulation(init_options=init_options,
+                                 precision_targets={}, warm_up_metric=None)
+
+    def check_instrumented(self, **options):
+        expected = self.create_simulation(**options).launch_simulation(2000)
+        sim = self.create_simulation(**options)
+        instrumentation = sim.instrument()
+        results = sim.launch_simulation(2000)
+        summary = instrumentation.get_summary()
+        # Same simulation, timings added to the results
+        assert dict((key, value) for key, value in results.iteritems()
+                    if key not in summary) == expected
+        for subsystem in ['dispatch', 'queue', 'routing', 'allocation',
+                          'free', 'statistics', 'random']:
+            assert results['calls_' + subsystem] > 0
+            assert results['wall_time_' + subsystem] >= 0
+        assert instrumentation.event_counts['Arrival_Event'] ==\
+            expected[sim.result.keys[0]]
+        assert 0 < results['pending_events_mean'] <=\
+            results['pending_events_max']
+        assert results['active_flows_max'] > 0
+
+    def test_instrumented_results(self):
+        self.check_instrumented()
+        self.check_instrumented(compact=True)
+
+    def test_detach(self):
+        sim = self.create_simulation()
+        sim.instrument().detach()
+        for component in [sim.event_manager, sim.event_manager.event_list,
+                          sim.topology, sim.flow_controller, sim.result,
+                          sim.random_generator]:
+            assert not any(callable(value) and
+                           getattr(value, '__name__', '').endswith('_method')
+                           for value in component.__dict__.itervalues())
+
+    def test_checkpoint(self):
+        sim = self.create_simulation()
+        sim.instrument()
+        expected = sim.launch_simulation(2000)
+        sim = self.create_simulation()
+        sim.instrument()
+        sim.set_checkpoint(self.filename, every_events=700)
+        assert sim.launch_simulation(2000)['Blocking_rate'] ==\
+            expected['Blocking_rate']
+        sim = load_checkpoint(self.filename)
+        assert sim.instrumentation.simulation is sim
+        results = sim.resume_simulation()
+        assert results['Blocking_rate'] == expected['Blocking_rate']
+        assert results['calls_dispatch'] == expected['calls_dispatch']
+
+    def test_timeline(self):
+        sim = self.create_simulation()
+        sim.instrument(timeline=True)
+        sim.launch_simulation(200)
+        sim.instrumentation.export_timeline(self.filename)
+        with open(self.filename) as timeline_file:
+            events = json.load(timeline_file)['traceEvents']
+        durations = [event for event in events if event['ph'] == 'X']
+        assert set(event['cat'] for event in durations) ==\
+            set(sim.instrumentation.times)
+        assert len(durations) == sum(sim.instrumentation.calls.itervalues())
+        assert len([event for event in events if event['ph'] == 'C']) ==\
+            len(sim.instrumentation.gauges)
+
+    def test_gauges(self):
+        sim = self.create_simulation()
+        instrumentation = sim.instrument(gauge_interval=0.25)
+        sim.launch_simulation(500)
+        # Taken before the first event: one arrival pending per entry node
+        assert instrumentation.gauges[0] == (0., 4, 0)
+        times = [gauge[0] for gauge in instrumentation.gauges]
+        assert times == [0.25 * index for index in xrange(len(times))]
+        assert times[-1] < sim.event_manager.current_time
+
+    def test_reset(self):
+        sim = self.create_simulation()
+        instrumentation = sim.instrument()
+        expected = sim.launch_simulation(2000)
+        sim.reset()
+        results = sim.launch_simulation(2000)
+        # Nothing carried over from the first run
+        assert results['calls_dispatch'] == expected['calls_dispatch']
+        assert instrumentation.gauges[0][0] == 0.
+        assert len(instrumentation.gauges) == len(set(
+            gauge[0] for gauge in instrumentation.gauges))
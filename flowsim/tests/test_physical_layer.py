@@ -2,6 +2,10 @@
 
 import unittest
 import networkx
+import numpy
+import os
+import random
+import tempfile
 from flowsim.physical_layer.node import Node
 from flowsim.physical_layer.edge import Edge, EdgeAllocationError
 from flowsim.physical_layer.topology import Topology
@@ -10,6 +14,12 @@ from flowsim.physical_layer.topology import torus2D
 from flowsim.physical_layer.topology import torus3D
 from flowsim.physical_layer.topology import NoSuchEdge
 from flowsim.physical_layer.topology import DuplicatedNodeError
+from flowsim.physical_layer.topology import NoPathError
+from flowsim.physical_layer.topology import InvalidPathTable
+from flowsim.physical_layer.topology_file import graphml_to_topology_file,\
+    load_topology_arrays
+from flowsim.flowsim_exception import InvalidTopologyFile
+from flowsim.physical_layer import generators
 
 
 class Flow(object):
@@ -32,6 +42,11 @@ class Test_node(unittest.TestCase):
              Node(self.arrival_rate, self.service_rate, -1)]
         assert set(map(int, nodes)) == set([0, 1, 2, 6, 7, 8])
 
+    def test_hash(self):
+        node = Node(self.arrival_rate, self.service_rate, 6)
+        assert hash(node) == hash(6)
+        assert node != Node(self.arrival_rate, self.service_rate, 6)
+
     def test_reset(self):
         node = Node(self.arrival_rate, self.service_rate)
         assert (node.get_arrival_rate() == self.arrival_rate)
@@ -86,7 +101,22 @@ class Test_edge(unittest.TestCase):
         edge.reset()
 
         assert(edge.available_flows == edge.max_flows)
-        assert(edge.passing_flows == [])
+        assert(len(edge.passing_flows) == 0)
+
+    def test_flow_tracking(self):
+        edge = Edge(2, track_flows=False)
+        flow = Flow()
+        edge.allocate_flow(flow)
+        assert edge.passing_flows is None
+        edge.free_flow(Flow())
+        self.assertRaises(EdgeAllocationError, edge.free_flow, flow)
+
+        edge.allocate_flow(flow)
+        self.assertRaises(EdgeAllocationError, edge.set_flow_tracking, True)
+        edge.reset()
+        edge.set_flow_tracking(True)
+        edge.allocate_flow(flow)
+        assert flow in edge.passing_flows
 
 
 class Test_topology(unittest.TestCase):
@@ -175,6 +205,139 @@ class Test_topology(unittest.TestCase):
                                       weight='weight') ==
                [nodes[0], nodes[3], nodes[4], nodes[5]])
 
+    def test_route_cache(self):
+        topo = Topology()
+        nodes = [Node(self.arrival_rate, self.service_rate, i)
+                 for i in xrange(4)]
+        topo.add_nodes(nodes)
+        # Square 0 -> 1 -> 3 and 0 -> 2 -> 3, with 0 -> 1 cheaper
+        topo.add_edges([(nodes[0], nodes[1], {'object': Edge()}),
+                        (nodes[1], nodes[3], {'object': Edge()})],
+                       edge_weight=1)
+        topo.add_edges([(nodes[0], nodes[2], {'object': Edge()}),
+                        (nodes[2], nodes[3], {'object': Edge()})],
+                       edge_weight=2)
+
+        path = [nodes[0], nodes[1], nodes[3]]
+        assert topo.shortest_path(nodes[0], nodes[3]) == path
+        assert topo.shortest_path(nodes[0], nodes[3]) == path
+        assert topo.shortest_path(nodes[2], nodes[3]) == nodes[2:]
+        info = topo.get_route_cache_info()
+        assert info['hits'] == 1 and info['misses'] == 2
+
+        # Only the route using the edge is evicted
+        topo.set_edge_unavailable(nodes[1], nodes[3])
+        assert topo.get_route_cache_info()['size'] == 1
+        assert topo.shortest_path(nodes[0], nodes[3]) ==\
+            [nodes[0], nodes[2], nodes[3]]
+
+        topo.set_edge_unavailable(nodes[2], nodes[3])
+        self.assertRaises(NoPathError,
+                          topo.shortest_path, nodes[0], nodes[3])
+
+        # Freeing an edge evicts the routes computed around it
+        topo.free_edge(nodes[1], nodes[3], None)
+        assert topo.shortest_path(nodes[0], nodes[3]) == path
+        topo.free_edge(nodes[2], nodes[3], None)
+        assert topo.shortest_path(nodes[2], nodes[3]) == nodes[2:]
+        assert topo.get_route_cache_info()['hits'] == 1
+
+    def test_path_table(self):
+        topo = Topology()
+        topo.build_topology_from_int([(0, 'entry'), 1, 2, (3, 'exit')],
+                                     [(0, 1, 1, 1), (1, 3, 1, 1),
+                                      (0, 2, 1, 2), (2, 3, 1, 2)],
+                                     self.arrival_rate,
+                                     self.service_rate)
+        nodes = dict((node.get_name(), node) for node in topo.nodes())
+        topo.precompute_paths(2)
+        assert topo.path_table.keys() == [(nodes[0], nodes[3])]
+        assert len(topo.path_table[(nodes[0], nodes[3])]) == 2
+
+        assert topo.shortest_path(nodes[0], nodes[3]) ==\
+            [nodes[0], nodes[1], nodes[3]]
+        topo.set_edge_unavailable(nodes[0], nodes[1])
+        assert topo.shortest_path(nodes[0], nodes[3]) ==\
+            [nodes[0], nodes[2], nodes[3]]
+        topo.set_edge_unavailable(nodes[2], nodes[3])
+        self.assertRaises(NoPathError,
+                          topo.shortest_path, nodes[0], nodes[3])
+        topo.reset()
+
+        handle, filename = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            topo.save_path_table(filename)
+            topo.path_table = None
+            topo.load_path_table(filename)
+            assert topo.path_table_k == 2
+            assert [path for path, _ in
+                    topo.path_table[(nodes[0], nodes[3])]] ==\
+                [[nodes[0], nodes[1], nodes[3]],
+                 [nodes[0], nodes[2], nodes[3]]]
+
+            other = Topology()
+            other.build_topology_from_int([0, 1], [(0, 1)],
+                                          self.arrival_rate,
+                                          self.service_rate)
+            self.assertRaises(InvalidPathTable,
+                              other.load_path_table, filename)
+
+            # Truncated and corrupt tables
+            with open(filename, 'rb') as table_file:
+                data = table_file.read()
+            for corrupt in [data[:len(data) // 2], data[:1], '',
+                            'not a path table']:
+                with open(filename, 'wb') as table_file:
+                    table_file.write(corrupt)
+                self.assertRaises(InvalidPathTable,
+                                  topo.load_path_table, filename)
+        finally:
+            os.remove(filename)
+
+    def test_compact_graph(self):
+        nodes, edges = torus2D(5, 4)
+        rand = random.Random(3)
+        for weighted in (False, True):
+            topo = Topology()
+            topo.build_topology_from_int(
+                nodes,
+                [edge + (2, rand.randint(1, 3) if weighted else 1)
+                 for edge in edges],
+                self.arrival_rate, self.service_rate)
+            graph = topo.freeze()
+            assert graph.number_of_edges() == topo.number_of_edges()
+            assert graph.unit_weights != weighted
+            for i in xrange(200):
+                node1, node2 = rand.sample(topo.nodes(), 2)
+                source = graph.node_ids[node1]
+                target = graph.node_ids[node2]
+                route = graph.route(source, target)
+                expected = topo.compute_shortest_path(node1, node2)
+                if expected is None:
+                    assert route is None
+                    continue
+                path = graph.path_nodes(source, route)
+                assert path[0] == node1 and path[-1] == node2
+                assert sum(graph.weights[edge] for edge in route) ==\
+                    sum(topo[expected[j]][expected[j + 1]]['weight']
+                        for j in xrange(len(expected) - 1))
+                # Keeping both graphs in the same state
+                graph.allocate(route)
+                for edge in route:
+                    if graph.available[edge] == 0:
+                        topo.set_edge_unavailable(
+                            graph.nodes[graph.sources[edge]],
+                            graph.nodes[graph.indices[edge]])
+
+        graph.reset()
+        assert list(graph.available) == list(graph.capacities)
+        edge = graph.edge_id(topo.nodes()[0],
+                             topo.neighbors(topo.nodes()[0])[0])
+        graph.allocate([edge])
+        graph.free([edge])
+        self.assertRaises(EdgeAllocationError, graph.free, [edge])
+
     def test_set_edge_unavailable(self):
         topo = Topology()
         nodes = [Node(self.arrival_rate, self.service_rate, i)
@@ -305,6 +468,83 @@ class Test_topology(unittest.TestCase):
                     for node1, node2 in topo.edges()]) ==\
             set([frozenset([node1, node2])
                  for node1, node2 in imported_graph.edges()])
+        assert sorted(map(int, topo.nodes())) ==\
+            range(imported_graph.number_of_nodes())
+
+        # Same numbers, and graph order, whatever was built before
+        Node(self.arrival_rate, self.service_rate, 1000)
+        other = Topology()
+        other.import_topology(filename, self.arrival_rate, self.service_rate)
+        assert [(int(node), node.get_name()) for node in other.nodes()] ==\
+            [(int(node), node.get_name()) for node in topo.nodes()]
+
+    def get_edges(self, topo):
+        return set((node1.get_name(), node2.get_name(),
+                    data['object'].max_flows, data['weight'])
+                   for node1, node2, data in topo.edges(data=True))
+
+    def test_topology_file(self):
+        handle, filename = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            for names in [range(4), [u'n\xe9%d' % i for i in xrange(4)]]:
+                nodes = [{'number': i, 'name': names[i]} for i in xrange(4)]
+                nodes[0]['type'] = 'entry'
+                nodes[3]['type'] = 'exit'
+                topo = Topology()
+                topo.build_topology_from_int(
+                    nodes, [(names[0], names[1], 2),
+                            (names[1], names[2], 1, 3.5),
+                            (names[2], names[3]), (names[3], names[0])],
+                    self.arrival_rate, self.service_rate)
+                edges = self.get_edges(topo)
+                # Saved with its normal weight
+                topo.set_edge_unavailable(*topo.edges()[0])
+                topo.save_topology(filename)
+                loaded = Topology()
+                loaded.load_topology(filename, self.arrival_rate,
+                                     self.service_rate)
+                assert self.get_edges(loaded) == edges
+                assert sorted(map(int, loaded.nodes())) == range(4)
+                assert map(int, loaded.entry_nodes) ==\
+                    map(int, topo.entry_nodes)
+                assert map(int, loaded.exit_nodes) ==\
+                    map(int, topo.exit_nodes)
+                assert loaded.nodes()[0].get_arrival_rate() ==\
+                    self.arrival_rate
+
+            # Names section truncated, then not utf-8
+            with open(filename, 'rb') as topology_file:
+                data = topology_file.read()
+            for corrupt in [data[:-1], data[:-2] + '\xff\xff']:
+                with open(filename, 'wb') as topology_file:
+                    topology_file.write(corrupt)
+                self.assertRaises(InvalidTopologyFile, load_topology_arrays,
+                                  filename)
+        finally:
+            os.remove(filename)
+
+    def test_graphml_to_topology_file(self):
+        handle, filename = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            graphml_to_topology_file('./graph0_yed.graphml', filename)
+            loaded = Topology()
+            loaded.load_topology(filename, self.arrival_rate,
+                                 self.service_rate)
+            imported = Topology()
+            imported.import_topology('./graph0_yed.graphml',
+                                     self.arrival_rate, self.service_rate)
+            assert self.get_edges(loaded) == self.get_edges(imported)
+            arrays = load_topology_arrays(filename)
+            assert len(arrays['sources']) == imported.number_of_edges()
+
+            with open(filename, 'wb') as topology_file:
+                topology_file.write('flowsim')
+            self.assertRaises(InvalidTopologyFile, load_topology_arrays,
+                              filename)
+        finally:
+            os.remove(filename)
 
     @unittest.skip('Pauses tests')
     def test_draw_graph(self):
@@ -382,3 +622,69 @@ class Test_topology(unittest.TestCase):
                                      self.service_rate)
         # Visual check
         # draw_graph(topo)
+
+
+class Test_generators(unittest.TestCase):
+
+    def get_edges(self, arrays):
+        return set(zip(arrays['sources'].tolist(),
+                       arrays['targets'].tolist()))
+
+    def check_undirected(self, arrays, edges):
+        assert len(self.get_edges(arrays)) == len(arrays['sources']) ==\
+            2 * edges
+        assert set((node2, node1) for node1, node2 in
+                   self.get_edges(arrays)) == self.get_edges(arrays)
+
+    def test_torus(self):
+        nodes, edges = torus3D(4, 3, 3)
+        arrays = generators.torus(3, 4, 3)
+        assert arrays['numbers'].tolist() == nodes
+        assert self.get_edges(arrays) ==\
+            set(edges) | set((node2, node1) for node1, node2 in edges)
+        nodes, edges = torus2D(4, 3)
+        arrays = generators.torus(4, 3, capacity=5)
+        assert set(frozenset(edge) for edge in self.get_edges(arrays)) ==\
+            set(frozenset(edge) for edge in edges)
+        assert set(arrays['capacities'].tolist()) == set([5])
+
+    def test_mesh_hypercube(self):
+        self.check_undirected(generators.mesh(3, 4), 2 * 4 + 3 * 3)
+        self.check_undirected(generators.mesh(2, 2, 2), 12)
+        arrays = generators.hypercube(4)
+        self.check_undirected(arrays, 4 * 16 / 2)
+        assert all(bin(node1 ^ node2).count('1') == 1
+                   for node1, node2 in self.get_edges(arrays))
+
+    def test_fat_tree(self):
+        k = 4
+        arrays = generators.fat_tree(k, weight=2.)
+        # Core - aggregation, aggregation - edge, edge - host
+        self.check_undirected(arrays, 3 * k ** 3 / 4)
+        topo = generators.build_topology(arrays, 0.5, 0.5)
+        assert topo.number_of_nodes() == 5 * k ** 2 / 4 + k ** 3 / 4
+        assert len(topo.entry_nodes) == len(topo.exit_nodes) == k ** 3 / 4
+        assert set(topo.entry_nodes) == set(topo.exit_nodes)
+        assert all(topo.degree(node) == 2 for node in topo.entry_nodes)
+        assert networkx.is_strongly_connected(topo)
+        assert len(topo.shortest_path(topo.entry_nodes[0],
+                                      topo.entry_nodes[-1])) == 7
+        assert topo.edges(data=True)[0][2]['weight'] == 2.
+
+    def test_random_graphs(self):
+        arrays = generators.erdos_renyi(500, 0.02, 3)
+        edges = len(arrays['sources']) / 2
+        assert abs(edges - 0.02 * 500 * 499 / 2) < 200
+        self.check_undirected(arrays, edges)
+        assert generators.erdos_renyi(500, 0.02, 3)['sources'].tolist() ==\
+            arrays['sources'].tolist()
+
+        arrays = generators.barabasi_albert(2000, 3, 4)
+        edges = len(arrays['sources']) / 2
+        self.check_undirected(arrays, edges)
+        assert 0.9 * 2000 * 3 < edges <= 2000 * 3
+        assert all(node1 != node2 for node1, node2 in
+                   self.get_edges(arrays))
+        degrees = numpy.bincount(arrays['sources'], minlength=2000)
+        # Preferential attachment: a few hubs
+        assert degrees.max() > 10 * numpy.median(degrees)
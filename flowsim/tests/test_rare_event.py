@@ -0,0 +1,93 @@
+import unittest
+from flowsim import Simulation
+from flowsim.analytic import erlang_b
+from flowsim.rare_event import Restart_estimator, balanced_splits,\
+    cut_capacity
+
+
+class Test_rare_event(unittest.TestCase):
+
+    def create_simulation(self, arrival_rate=0.2, rand_seed=1234,
+                          init_options=None, **options):
+        # One link each way: two independent Erlang loss systems
+        sim = Simulation(arrival_rate, 1., rand_seed, **options)
+        sim.init_simulation([0, 1], [(0, 1, 3)], **(init_options or {}))
+        return sim
+
+    def check_erlang_b(self, results, arrival_rate=0.2):
+        expected = float(erlang_b(arrival_rate, 3))
+        assert abs(results['Blocking_rate'] - expected) <=\
+            results['Blocking_rate_half_width']
+
+    def test_erlang_b(self):
+        results = self.create_simulation().launch_rare_event(
+            2000, thresholds=[2, 3], splits=[4, 6], confidence=0.99)
+        assert results['cycles'] == 2000
+        assert results['retrials'] > 0
+        self.check_erlang_b(results)
+
+    def test_simulation_restored(self):
+        sim = self.create_simulation()
+        precision_targets = sim.precision_targets
+        sim.launch_rare_event(100, thresholds=[2, 3], splits=3)
+        assert sim.precision_targets is precision_targets
+        assert sim.warm_up_metric == 'Blocking_rate'
+        assert sim.event_manager.rare_event is None
+        # Pending events continue as plain ones
+        sim.event_manager.EOS = False
+        sim.max_arrivals = 1000
+        sim.resume_simulation()
+        assert sim.max_arrivals <= 0
+
+    def test_same_results(self):
+        results = [self.create_simulation(engine=engine).launch_rare_event(
+            100, thresholds=[2, 3], splits=3) for engine in
+            ['generic', 'fast', 'generic']]
+        assert results[0] == results[1] == results[2]
+
+    def test_options(self):
+        results = self.create_simulation(
+            event_queue='ladder', rng_buffer=64, event_pool=True,
+            init_options={'compact': True}).launch_rare_event(
+            2000, thresholds=[2, 3], splits=[4, 6], confidence=0.99)
+        self.check_erlang_b(results)
+
+    def test_balanced_splits(self):
+        results = self.create_simulation(0.1).launch_rare_event(
+            1000, pilot_cycles=100, confidence=0.99)
+        assert results['thresholds'] == [2, 3]
+        assert min(results['splits']) > 1
+        self.check_erlang_b(results, 0.1)
+
+    def test_unit_capacity(self):
+        # No threshold from 2: every number of flows from 1
+        sim = Simulation(0.2, 1., 1234)
+        sim.init_simulation([0, 1], [(0, 1, 1)])
+        results = sim.launch_rare_event(1000, pilot_cycles=100,
+                                        confidence=0.99)
+        assert results['thresholds'] == [1]
+        assert abs(results['Blocking_rate'] - float(erlang_b(0.2, 1))) <=\
+            results['Blocking_rate_half_width']
+
+    def test_balanced_splits_rules(self):
+        runs = [{'splits': [2, 2, 2], 'crossings': [100, 20, 0],
+                 'top_blockings': 0}]
+        assert balanced_splits(runs) == [10, 8, 8]
+        runs = [{'splits': [2, 2], 'crossings': [10, 5],
+                 'top_blockings': 0}]
+        assert balanced_splits(runs) == [4, 8]
+        assert balanced_splits(runs, max_split=5) == [4, 5]
+
+    def test_cut_capacity(self):
+        sim = Simulation(1., 1., 1)
+        sim.init_simulation([0, 1, 2], [(0, 1, 2), (1, 2, 2), (2, 0, 2)])
+        assert cut_capacity(sim.topology) == 4
+
+    def test_invalid(self):
+        for thresholds, splits in [([], 2), ([3, 2], 2), ([0, 1], 2),
+                                   ([1, 2], [2]), ([1, 2], 0)]:
+            self.assertRaises(ValueError, Restart_estimator,
+                              self.create_simulation(), thresholds, splits,
+                              10)
+        self.assertRaises(ValueError, Restart_estimator,
+                          self.create_simulation(), [1, 2], 2, 0)
@@ -0,0 +1,52 @@
+import unittest
+from flowsim.replication import Replication_runner, derive_seed,\
+    merge_results
+from flowsim.statistics import normal_quantile, student_t_quantile,\
+    summarize
+
+
+class Test_statistics(unittest.TestCase):
+
+    def test_quantiles(self):
+        assert abs(normal_quantile(0.975) - 1.959964) < 1e-6
+        assert abs(normal_quantile(0.005) + 2.575829) < 1e-6
+        assert abs(student_t_quantile(0.975, 1) - 12.706205) < 1e-6
+        assert abs(student_t_quantile(0.975, 2) - 4.302653) < 1e-6
+        assert abs(student_t_quantile(0.975, 9) - 2.262157) < 1e-3
+        assert abs(student_t_quantile(0.975, 30) - 2.042272) < 1e-5
+
+    def test_summarize(self):
+        summary = summarize([1, 2, 3, 4])
+        assert summary['n'] == 4
+        assert summary['mean'] == 2.5
+        assert abs(summary['variance'] - 5. / 3.) < 1e-12
+        assert summary['lower'] < 2.5 < summary['upper']
+
+
+class Test_replication(unittest.TestCase):
+
+    def test_derive_seed(self):
+        seeds = [derive_seed(12, i) for i in xrange(10)]
+        assert seeds == [derive_seed(12, i) for i in xrange(10)]
+        assert len(set(seeds)) == 10
+        assert derive_seed(13, 0) not in seeds
+
+    def test_merge_results(self):
+        merged = merge_results([{'a': 1., 'b': 'x'}, {'a': 3., 'b': 'y'}])
+        assert merged.keys() == ['a']
+        assert merged['a']['mean'] == 2.
+
+    def test_runner(self):
+        nodes = [0, 1, 2]
+        edges = [(0, 1), (1, 2), (2, 0)]
+        serial = Replication_runner(nodes, edges, processes=1).\
+            run_replicas(0.9, 0.9, 3, 42, 500)
+        parallel = Replication_runner(nodes, edges, processes=2).\
+            run_replicas(0.9, 0.9, 3, 42, 500)
+        assert serial == parallel
+        assert serial[0] != serial[1]
+
+        merged = Replication_runner(nodes, edges, processes=2).\
+            run(0.9, 0.9, 4, 42)
+        assert abs(merged['Blocking_rate']['mean'] - 0.29) < 0.05
+        assert merged['Blocking_rate']['n'] == 4
@@ -0,0 +1,160 @@
+import unittest
+import math
+import random
+from flowsim.result import Result
+from flowsim.statistics import Running_statistics, P2_quantile,\
+    Batch_means, Mser
+from flowsim.event.event_types import Arrival_Event,\
+    Flow_allocation_failure_Event
+
+
+class Test_running_statistics(unittest.TestCase):
+
+    def test_moments(self):
+        stats = Running_statistics()
+        for value in [2., 4., 4., 4., 5., 5., 7., 9.]:
+            stats.add(value)
+        assert stats.get_mean() == 5.
+        assert abs(stats.variance() - 32. / 7.) < 1e-12
+        variance = Running_statistics().variance()
+        assert variance != variance  # nan
+
+    def test_p2_quantile(self):
+        rand = random.Random(4)
+        values = [rand.gauss(0., 1.) for i in xrange(20000)]
+        quantile = P2_quantile(0.9)
+        for value in values:
+            quantile.add(value)
+        values.sort()
+        assert abs(quantile.value() - values[18000]) < 0.05
+
+        quantile = P2_quantile(0.5)
+        for value in [3., 1., 2.]:
+            quantile.add(value)
+        assert quantile.value() == 2.
+
+    def test_batch_means(self):
+        rand = random.Random(2)
+        batch_means = Batch_means(batch_size=10, n_batches=4, min_batches=4)
+        for i in xrange(85):
+            batch_means.add(rand.random() < 0.25)
+        # 8 batches of 10 merged into 4 batches of 20, 5 values pending
+        assert len(batch_means.batches) == 4
+        assert batch_means.batch_size == 20.
+        assert batch_means.denominator == 5.
+        for i in xrange(100000):
+            batch_means.add(rand.random() < 0.25)
+        assert abs(batch_means.get_mean() - 0.25) < 0.01
+        assert batch_means.half_width() < 0.01
+        assert batch_means.has_converged(0.05)
+        assert not batch_means.has_converged(0.001)
+
+        # Nothing observed: upper bound of a zero count, never converged
+        # without a zero_precision
+        batch_means = Batch_means(batch_size=10, n_batches=4, min_batches=4)
+        for i in xrange(4000):
+            batch_means.add(0)
+        assert batch_means.half_width() < 1e-3
+        assert not batch_means.has_converged(0.05)
+        assert not batch_means.has_converged_on_zero()
+
+        # Converged once it is below zero_precision
+        batch_means = Batch_means(batch_size=10, n_batches=4, min_batches=4,
+                                  zero_precision=1e-3)
+        for i in xrange(1000):
+            batch_means.add(0)
+        assert batch_means.half_width() == -math.log(1. - 0.95) /\
+            (1000 - batch_means.denominator)
+        assert not batch_means.has_converged(0.05)
+        for i in xrange(3000):
+            batch_means.add(0)
+        assert batch_means.has_converged(0.05)
+        assert batch_means.has_converged_on_zero()
+        # A single count: far from the relative precision
+        batch_means.add(1)
+        while batch_means.denominator > 0:
+            batch_means.add(0)
+        assert not batch_means.has_converged(0.05)
+
+    def test_mser(self):
+        rand = random.Random(3)
+        mser = Mser(batch_size=1, min_batches=20)
+        # Transient of 30 values decreasing to the steady-state mean 0
+        for i in xrange(30):
+            mser.add(3. - i / 10. + rand.gauss(0., 0.1))
+        assert mser.truncation() is None
+        truncation = None
+        while truncation is None:
+            mser.add(rand.gauss(0., 0.1))
+            truncation = mser.truncation()
+        assert 25 <= truncation <= 35
+        assert len(mser.values) < 100
+
+
+class Node(object):
+    pass
+
+
+class Test_result(unittest.TestCase):
+
+    def test_event_counter(self):
+        result = Result()
+        node = Node()
+        result.increase_event_counter(Arrival_Event)
+        result.increase_event_counter(Arrival_Event, node)
+        result.count_event(Arrival_Event.type_code, node)
+        result.increase_event_counter('other')
+        assert result.get_event_count(Arrival_Event) == 2
+        assert result.get_event_count(Arrival_Event, node) == 2
+        assert result.get_event_count('other', node) == 0
+        results = result.get_results()
+        assert results[Arrival_Event] == 2 and results['other'] == 1
+        assert Flow_allocation_failure_Event not in results
+
+    def test_computed_values(self):
+        result = Result()
+        for value in [1., 2., 3., 4.]:
+            result.add_sample('length', value)
+            result.add_to_sum('time', value)
+        result.update_computed_value('length', 5.)
+        results = result.get_results()
+        assert results['length'] == 3. and results['time'] == 10.
+        assert abs(results['length_std'] - 2.5 ** 0.5) < 1e-12
+        assert results['length_p50'] == 3.
+        assert 'length_p95' in results and 'length_p99' in results
+
+        node = Node()
+        result.add_computed_value('Blocking_rate', result.event_division,
+                                  {'key_numerator':
+                                   Flow_allocation_failure_Event,
+                                   'key_denominator': Arrival_Event})
+        for i in xrange(4):
+            result.count_event(Arrival_Event.type_code, node)
+        result.count_event(Flow_allocation_failure_Event.type_code, node)
+        assert result.process_node_value('Blocking_rate', sum) == 0.25
+
+        # Custom update functions see the nested dict view of a node
+        result.update_computed_value(
+            'arrivals', None, node,
+            lambda data, key, value: data['event_counter'][Arrival_Event])
+        assert result.get_computed_value('arrivals',
+                                         result.get_node_id(node)) == 4
+
+    def test_precision_target(self):
+        result = Result()
+        result.add_computed_value('Blocking_rate', result.event_division,
+                                  {'key_numerator':
+                                   Flow_allocation_failure_Event,
+                                   'key_denominator': Arrival_Event})
+        result.set_precision_target('Blocking_rate', 0.1, batch_size=10)
+        assert not result.has_converged()
+        for i in xrange(1000):
+            result.count_event(Arrival_Event.type_code)
+            if i % 2:
+                result.count_event(Flow_allocation_failure_Event.type_code)
+            if i % 10 == 9:
+                result.update_precision()
+        assert result.has_converged()
+        results = result.get_results()
+        assert results['Blocking_rate'] == 0.5
+        assert results['Blocking_rate_half_width'] == 0.
@@ -0,0 +1,111 @@
+import unittest
+import os
+import tempfile
+import numpy
+from fixtures import create_simulation
+
+
+class Test_sampler(unittest.TestCase):
+
+    def create_simulation(self, **init_options):
+        # Runs until max_arrivals
+        return create_simulation(init_options=init_options,
+                                 precision_targets={}, warm_up_metric=None)
+
+    def check_sampler(self, **options):
+        expected = self.create_simulation(**options).launch_simulation(2000)
+        sim = self.create_simulation(**options)
+        sampler = sim.sample(0.5)
+        assert sim.launch_simulation(2000) == expected
+        columns = sampler.get_columns()
+        times = columns['time']
+        assert times[0] == 0
+        assert numpy.allclose(numpy.diff(times), sampler.interval)
+        assert times[-1] <= sim.event_manager.current_time
+        # Before the first event: one arrival pending per entry node
+        assert columns['pending_events'][0] == 4
+        # 10 directed edges
+        assert columns['utilisation'].shape == (len(times), 10)
+        assert (columns['utilisation'] >= 0).all()
+        assert (columns['utilisation'] <= 1).all()
+        assert (columns['active_flows'] <= columns['utilisation'].sum(1)).all()
+        assert columns['arrivals'][-1] <= expected[sim.result.keys[0]]
+        blocking_rate = columns['blocking_rate']
+        assert numpy.isnan(blocking_rate[0])
+        blocking_rate = blocking_rate[~numpy.isnan(blocking_rate)]
+        assert ((blocking_rate >= 0) & (blocking_rate <= 1)).all()
+        # Current state read the same way as the samples
+        assert sum(sampler.get_utilisation()) ==\
+            sum(flow.length() - 1 for flow in sim.flow_controller.flows)
+        return sampler
+
+    def test_sampler(self):
+        self.check_sampler()
+        self.check_sampler(compact=True)
+
+    def test_instrumentation_gauges(self):
+        # Same state as the gauges of the instrumentation
+        sim = self.create_simulation()
+        sampler = sim.sample(0.5)
+        instrumentation = sim.instrument(gauge_interval=0.5)
+        sim.launch_simulation(500)
+        columns = sampler.get_columns()
+        assert [tuple(gauge) for gauge in instrumentation.gauges] ==\
+            zip(columns['time'], columns['pending_events'],
+                columns['active_flows'])
+
+    def test_downsample(self):
+        sim = self.create_simulation()
+        sampler = sim.sample(0.5, capacity=16)
+        sim.launch_simulation(2000)
+        times = sampler.get_columns()['time']
+        assert 8 <= len(times) <= 16
+        assert sampler.interval > 0.5
+        assert times[0] == 0
+        assert numpy.allclose(numpy.diff(times), sampler.interval)
+        assert sim.event_manager.current_time - times[-1] <=\
+            sampler.interval
+
+    def test_ring(self):
+        sim = self.create_simulation()
+        sampler = sim.sample(0.5, capacity=16, downsample=False)
+        sim.launch_simulation(2000)
+        times = sampler.get_columns()['time']
+        assert len(times) == 16
+        assert numpy.allclose(numpy.diff(times), 0.5)
+        assert sim.event_manager.current_time - times[-1] <= 0.5
+
+    def test_grow(self):
+        # Rows allocated as the samples come in, up to capacity
+        sim = self.create_simulation()
+        sampler = sim.sample(0.5)
+        sim.launch_simulation(10)
+        assert len(sampler.times) < sampler.capacity
+        assert len(sampler.utilisation) == len(sampler.times)
+        for downsample in [True, False]:
+            sim = self.create_simulation()
+            sampler = sim.sample(0.05, capacity=100, downsample=downsample)
+            sim.launch_simulation(2000)
+            assert len(sampler.times) == 100
+            times = sampler.get_columns()['time']
+            assert len(times) >= 50
+            assert numpy.allclose(numpy.diff(times), sampler.interval)
+            assert (sampler.get_columns()['utilisation'].sum(1) >=
+                    sampler.get_columns()['active_flows']).all()
+
+    def test_save(self):
+        sim = self.create_simulation()
+        sampler = sim.sample(1.)
+        sim.launch_simulation(500)
+        handle, filename = tempfile.mkstemp(suffix='.npz')
+        os.close(handle)
+        try:
+            sampler.save(filename)
+            saved = numpy.load(filename)
+            columns = sampler.get_columns()
+            assert set(saved.files) == set(columns)
+            for key, values in columns.iteritems():
+                assert numpy.array_equal(saved[key], values) or\
+                    key == 'blocking_rate'
+        finally:
+            os.remove(filename)
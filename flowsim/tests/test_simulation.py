@@ -1,5 +1,8 @@
 import unittest
+import os
+import tempfile
 from flowsim import Simulation
+from flowsim.event.event_types import Arrival_Event
 
 
 class Test_Simulation(unittest.TestCase):
@@ -74,6 +77,159 @@ class Test_Simulation(unittest.TestCase):
         # Is it realy the expected result?
         assert (abs(res['Blocking_rate'] - 0.29) < 0.05)
 
+    def test_precision_targets(self):
+        sim = Simulation(0.9, 0.9, 5, precision_targets={
+            'Blocking_rate': 0.04, 'mean_nodes_per_flow': 0.02})
+        sim.init_simulation([0, 1, 2], [(0, 1), (1, 2), (2, 0)])
+        res = sim.launch_simulation()
+        assert res['Blocking_rate_half_width'] <= 0.04 * res['Blocking_rate']
+        assert res['mean_nodes_per_flow_half_width'] <=\
+            0.02 * res['mean_nodes_per_flow']
+
+        # No target: runs until max_arrivals
+        sim = Simulation(0.9, 0.9, 5, precision_targets={},
+                         warm_up_metric=None)
+        sim.init_simulation([0, 1, 2], [(0, 1), (1, 2), (2, 0)])
+        res = sim.launch_simulation(5000)
+        assert res[Arrival_Event] == 5000 + 2
+
+        # No blocking yet: runs until max_arrivals
+        sim = Simulation(0.05, 1., 1)
+        sim.init_simulation([0, 1, 2], [(0, 1, 3), (1, 2, 3), (2, 0, 3)])
+        res = sim.launch_simulation(5000)
+        assert res['Blocking_rate'] == 0.
+        assert sim.max_arrivals <= 0
+
+        # Never blocks: with the default target, stops once the upper bound
+        # of the blocking rate is small enough
+        edges = [(0, 1, 100), (1, 2, 100), (2, 0, 100)]
+        sim = Simulation(0.1, 1., 1)
+        sim.init_simulation([0, 1, 2], edges)
+        res = sim.launch_simulation()
+        assert res['Blocking_rate'] == 0.
+        assert 0. < res['Blocking_rate_half_width'] <= 1e-4
+        assert res['Blocking_rate_zero_count']
+
+        # Same with a given zero_precision
+        sim = Simulation(0.1, 1., 1, zero_precision=1e-3,
+                         precision_targets={'Blocking_rate': 0.05})
+        sim.init_simulation([0, 1, 2], edges)
+        res = sim.launch_simulation()
+        assert 0. < res['Blocking_rate_half_width'] <= 1e-3
+        assert res['Blocking_rate_zero_count']
+
+        # Without: a zero count does not meet the relative precision
+        sim = Simulation(0.1, 1., 1, zero_precision=None)
+        sim.init_simulation([0, 1, 2], edges)
+        res = sim.launch_simulation(50000)
+        assert res['Blocking_rate'] == 0.
+        assert sim.max_arrivals <= 0
+        assert 'Blocking_rate_zero_count' not in res
+
+    def test_warm_up(self):
+        sim = Simulation(0.9, 0.9, 5, precision_targets={})
+        sim.init_simulation([0, 1, 2], [(0, 1), (1, 2), (2, 0)])
+        res = sim.launch_simulation(5000)
+        # time_elapsed: after the truncation only
+        assert res['warm_up_time'] > 0
+        assert abs(res['warm_up_time'] + res['time_elapsed'] -
+                   sim.event_manager.current_time) < 1e-9
+        assert res[Arrival_Event] < 5000
+        assert sim.result.warm_up is None
+
+    def test_topology_file(self):
+        handle, filename = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            sim = Simulation(0.9, 0.9, 1234)
+            sim.init_simulation_from_file('./graph0_yed.graphml')
+            sim.topology.save_topology(filename)
+            res = sim.launch_simulation(500)
+            loaded = Simulation(0.9, 0.9, 1234)
+            loaded.init_simulation_from_file(filename)
+            assert loaded.launch_simulation(500) == res
+        finally:
+            os.remove(filename)
+
+    def test_event_queues(self):
+        results = []
+        for event_queue in ['heap', 'calendar', 'ladder']:
+            sim = Simulation(0.9, 0.9, 1234, event_queue=event_queue)
+            sim.init_simulation([0, 1, 2], [(0, 1), (1, 2), (2, 0)])
+            results.append(sim.launch_simulation(2000))
+        assert results[0] == results[1] == results[2]
+
+    def test_path_table(self):
+        handle, filename = tempfile.mkstemp()
+        os.close(handle)
+        os.remove(filename)
+        try:
+            for i in xrange(2):
+                sim = Simulation(0.9, 0.9, 1234)
+                sim.init_simulation([0, 1, 2], [(0, 1), (1, 2), (2, 0)],
+                                    k_paths=2, path_table_file=filename)
+                assert len(sim.topology.path_table) == 6
+                res = sim.launch_simulation(1000)
+                assert os.path.exists(filename)
+            # Truncated table: computed and saved again
+            with open(filename, 'r+b') as table_file:
+                table_file.truncate(10)
+            sim = Simulation(0.9, 0.9, 1234)
+            sim.init_simulation([0, 1, 2], [(0, 1), (1, 2), (2, 0)],
+                                k_paths=2, path_table_file=filename)
+            assert len(sim.topology.path_table) == 6
+            assert os.path.getsize(filename) > 10
+        finally:
+            os.remove(filename)
+
+    def test_compact_simulation(self):
+        sim = Simulation(0.9, 0.9, 1234)
+        sim.init_simulation([0, 1, 2], [(0, 1), (1, 2), (2, 0)],
+                            compact=True)
+        res = sim.launch_simulation()
+        assert (abs(res['Blocking_rate'] - 0.29) < 0.05)
+        sim.reset()
+        assert list(sim.topology.compact_graph.available) ==\
+            list(sim.topology.compact_graph.capacities)
+
+    def test_buffered_random_generator(self):
+        sim = Simulation(0.9, 0.9, 1234, rng_buffer=1024)
+        sim.init_simulation([0, 1, 2], [(0, 1), (1, 2), (2, 0)])
+        res = sim.launch_simulation()
+        assert (abs(res['Blocking_rate'] - 0.29) < 0.05)
+
+    def test_interleaved_simulations(self):
+        # Two simulations in one process do not share random streams
+        def create():
+            sim = Simulation(0.9, 0.9, 99)
+            sim.init_simulation([0, 1, 2], [(0, 1), (1, 2), (2, 0)])
+            sim.max_arrivals = 500
+            event_manager = sim.event_manager
+            for node in event_manager.flow_controller.get_entry_nodes():
+                event_manager.add_event(Arrival_Event, node,
+                                        arrival_rate=node.get_arrival_rate(),
+                                        service_rate=node.get_service_rate())
+            return sim
+
+        alone = create()
+        while not alone.event_manager.EOS:
+            alone.event_manager.handle_next_event()
+        sims = [create(), create()]
+        while not all(sim.event_manager.EOS for sim in sims):
+            for sim in sims:
+                sim.event_manager.handle_next_event()
+        assert sims[0].result.get_results() == alone.result.get_results()
+        assert sims[1].result.get_results() == alone.result.get_results()
+
+    def test_untracked_flows(self):
+        results = []
+        for track_flows in (True, False):
+            sim = Simulation(0.9, 0.9, 1234)
+            sim.init_simulation([0, 1, 2], [(0, 1, 3), (1, 2, 3), (2, 0, 3)],
+                                track_flows=track_flows)
+            results.append(sim.launch_simulation(2000))
+        assert results[0] == results[1]
+
     def test_reset_simulation(self):
         sim = Simulation(0.9, 0.9)
         nodes = [0, 1, 2]
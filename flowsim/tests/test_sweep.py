@@ -0,0 +1,42 @@
+import os
+from flowsim.sweep import Sweep, grid
+from flowsim.replication import Replication_runner
+from fixtures import Temporary_file_test_case
+
+
+class Test_sweep(Temporary_file_test_case):
+
+    def setUp(self):
+        Temporary_file_test_case.setUp(self)
+        os.remove(self.filename)  # Written by the sweeps only
+        self.nodes = [0, 1, 2]
+        self.edges = [(0, 1), (1, 2), (2, 0)]
+
+    def test_grid(self):
+        assert grid([1, 2], [3]) == [(1, 3), (2, 3)]
+
+    def test_duplicated_points(self):
+        # 1 and 1. are the same point
+        self.assertRaises(ValueError, Sweep, self.nodes, self.edges,
+                          [(1, 3), (2, 3), (1., 3)], 2, self.filename)
+
+    def test_sweep(self):
+        points = grid([0.5, 0.9], [0.9])
+        sweep = Sweep(self.nodes, self.edges, points[:1], 3, self.filename,
+                      processes=1, base_seed=7, max_arrivals=300)
+        assert len(sweep.run()) == 1
+
+        # Resuming only computes the missing point
+        sweep = Sweep(self.nodes, self.edges, points, 3, self.filename,
+                      processes=2, base_seed=7, max_arrivals=300)
+        rows = sweep.run()
+        assert len(rows) == 1 and float(rows[0]['arrival_rate']) == 0.9
+        assert sweep.run() == []
+        rows = sweep.read_rows()
+        assert [float(row['arrival_rate']) for row in rows] == [0.5, 0.9]
+
+        # Same seeds as independent replications
+        merged = Replication_runner(self.nodes, self.edges, processes=1).\
+            run(0.9, 0.9, 3, 7, 300)
+        assert float(rows[1]['Blocking_rate']) ==\
+            merged['Blocking_rate']['mean']
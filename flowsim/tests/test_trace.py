@@ -0,0 +1,78 @@
+import cPickle
+from flowsim.trace import Trace_recorder, Trace_reader
+from flowsim.flowsim_exception import InvalidTrace
+from flowsim.event.event_types import Arrival_Event, Trace_arrival_Event
+from fixtures import create_simulation, Temporary_file_test_case
+
+
+class Node(object):
+
+    def __init__(self, number):
+        self.number = number
+
+
+class Test_trace(Temporary_file_test_case):
+
+    def test_reader(self):
+        recorder = Trace_recorder(self.filename, chunk_size=3)
+        arrivals = [(float(i), i % 4, (i + 1) % 4, i / 10.)
+                    for i in xrange(10)]
+        for time, source, destination, duration in arrivals:
+            recorder.record(time, Node(source), Node(destination), duration)
+        recorder.flush()
+        assert list(Trace_reader(self.filename)) == arrivals
+
+        reader = Trace_reader(self.filename)
+        for i in xrange(4):
+            reader.next_arrival()
+        # Pickled in the middle of the second chunk
+        copy = cPickle.loads(cPickle.dumps(reader, 2))
+        assert list(copy) == list(reader) == arrivals[4:]
+
+        with open(self.filename, 'wb') as trace_file:
+            trace_file.write('FLOWSIM')
+        self.assertRaises(InvalidTrace, Trace_reader, self.filename)
+
+    def test_replay(self):
+        for options in [dict(), {'precision_targets': {},
+                                 'warm_up_metric': None}]:
+            sim = create_simulation(5, **options)
+            sim.record_trace(self.filename)
+            recorded = sim.launch_simulation(3000)
+            # The seed is not used anymore
+            sim = create_simulation(6, **options)
+            sim.replay_trace(self.filename)
+            assert sim.launch_simulation() == recorded
+
+        sim = create_simulation(6, **options)
+        sim.replay_trace(self.filename)
+        assert sim.launch_simulation(100)[Arrival_Event] == 100
+
+    def test_replay_times(self):
+        # 90.1... + (225.2... - 90.1...) != 225.2...
+        times = [90.14274576114836, 225.25853386928983]
+        recorder = Trace_recorder(self.filename)
+        for time in times:
+            recorder.record(time, Node(0), Node(1), 1.)
+        recorder.flush()
+        sim = create_simulation(6)
+        sim.replay_trace(self.filename)
+        event_manager = sim.event_manager
+        event_manager.init_event_processing()
+        event_manager.handle_next_event()
+        assert event_manager.current_time == times[0]
+        assert [event.handling_time for event in event_manager.event_list
+                if isinstance(event, Trace_arrival_Event)] == times[1:]
+
+    def test_fork(self):
+        sim = create_simulation(5, precision_targets={})
+        sim.record_trace(self.filename)
+        sim.warm_up_simulation(3000)
+        fork = sim.fork()
+        assert fork.event_manager.trace_recorder is None
+        forked = fork.resume_simulation()
+        recorded = sim.resume_simulation()
+        assert forked == recorded
+        sim = create_simulation(6, precision_targets={})
+        sim.replay_trace(self.filename)
+        assert sim.launch_simulation() == recorded
@@ -0,0 +1,156 @@
+import struct
+from flowsim.flowsim_exception import InvalidTrace
+from flowsim.event.event_types import Trace_arrival_Event
+
+# Arrival trace: a header followed by chunks of little-endian columns
+#   count          uint64
+#   times          float64[count]  absolute arrival times
+#   sources        int64[count]    node numbers
+#   destinations   int64[count]
+#   durations      float64[count]
+# Arrivals are in handling order. Recorder and reader only keep the file
+# name and an offset between two chunks, they can be pickled with the
+# simulation (checkpoints). Forks do not copy the recorder.
+magic = 'FLOWSIMR'
+version = 1
+header = struct.Struct('<8sI')
+chunk_header = struct.Struct('<Q')
+columns = [('times', '<f8'), ('sources', '<i8'), ('destinations', '<i8'),
+           ('durations', '<f8')]
+
+
+class Trace_recorder(object):
+
+    def __init__(self, filename, chunk_size=65536):
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.times = []
+        self.sources = []
+        self.destinations = []
+        self.durations = []
+        with open(filename, 'wb') as trace_file:
+            trace_file.write(header.pack(magic, version))
+        self.size = header.size  # Of the chunks written so far
+
+    def record(self, time, source, destination, duration):
+        self.times.append(time)
+        self.sources.append(source.number)
+        self.destinations.append(destination.number)
+        self.durations.append(duration)
+        if len(self.times) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        import numpy
+        if len(self.times) == 0:
+            return
+        with open(self.filename, 'ab') as trace_file:
+            trace_file.write(chunk_header.pack(len(self.times)))
+            for key, dtype in columns:
+                trace_file.write(numpy.array(getattr(self, key),
+                                             dtype=dtype).tostring())
+                setattr(self, key, [])
+            self.size = trace_file.tell()
+
+    def __setstate__(self, state):
+        # Restored from a checkpoint: chunks written after it are dropped
+        self.__dict__.update(state)
+        with open(self.filename, 'r+b') as trace_file:
+            trace_file.truncate(self.size)
+
+
+class Trace_reader(object):
+    # Iterates over the arrivals of a trace, one chunk in memory at a time
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as trace_file:
+            try:
+                file_magic, file_version =\
+                    header.unpack(trace_file.read(header.size))
+            except struct.error:
+                raise InvalidTrace(filename)
+        if file_magic != magic or file_version != version:
+            raise InvalidTrace(filename)
+        # Current chunk: file offset, columns (None: to be read) and index
+        # of the next arrival
+        self.chunk_offset = header.size
+        self.next_chunk_offset = None
+        self.chunk = None
+        self.index = 0
+
+    def read_chunk(self):
+        # Columns of the chunk at chunk_offset as lists, None at the end
+        # of the trace
+        import numpy
+        with open(self.filename, 'rb') as trace_file:
+            trace_file.seek(self.chunk_offset)
+            data = trace_file.read(chunk_header.size)
+            if len(data) == 0:
+                return None
+            try:
+                count, = chunk_header.unpack(data)
+            except struct.error:
+                raise InvalidTrace(self.filename)
+            chunk = [numpy.fromfile(trace_file, dtype, count).tolist()
+                     for key, dtype in columns]
+            if any(len(column) != count for column in chunk):
+                raise InvalidTrace(self.filename)
+            self.next_chunk_offset = trace_file.tell()
+        return chunk
+
+    def next_arrival(self):
+        # (time, source, destination, duration) or None
+        if self.chunk is None:
+            self.chunk = self.read_chunk()
+            if self.chunk is None:
+                return None
+        if self.index == len(self.chunk[0]):
+            self.chunk_offset = self.next_chunk_offset
+            self.index = 0
+            self.chunk = self.read_chunk()
+            if self.chunk is None:
+                return None
+        index = self.index
+        self.index += 1
+        return (self.chunk[0][index], self.chunk[1][index],
+                self.chunk[2][index], self.chunk[3][index])
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['chunk'] = None  # Read again from chunk_offset
+        return state
+
+    def __iter__(self):
+        arrival = self.next_arrival()
+        while arrival is not None:
+            yield arrival
+            arrival = self.next_arrival()
+
+
+class Trace_replay(object):
+    # Drives the arrivals of an Event_manager from a trace: a single
+    # Trace_arrival_Event is pending, it schedules the next one when
+    # handled
+
+    def __init__(self, filename, topology):
+        self.reader = Trace_reader(filename)
+        self.nodes = dict((node.number, node) for node in topology.nodes())
+        self.event_manager = None
+
+    def start(self, event_manager):
+        self.event_manager = event_manager
+        self.schedule_next_arrival()
+
+    def schedule_next_arrival(self):
+        arrival = self.reader.next_arrival()
+        if arrival is None:
+            return
+        time, source, destination, duration = arrival
+        # Scheduled at the recorded time itself: current_time + (time -
+        # current_time) may differ from it in the last bit
+        event_manager = self.event_manager
+        event_manager.schedule_event(event_manager.new_event(
+            Trace_arrival_Event, self.nodes[source],
+            delay=time - event_manager.current_time,
+            destination=self.nodes[destination], duration=duration), time)
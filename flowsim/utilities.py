@@ -0,0 +1,15 @@
+import contextlib
+import gc
+
+
+@contextlib.contextmanager
+def gc_disabled():
+    # Cyclic GC passes triggered by the millions of objects created at once
+    # (pickling, bulk topology builds) would otherwise take most of the time
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()